@@ -0,0 +1,6 @@
+"""Headless entry point: ``python -m graphmigrate``.
+
+Runs migrations from the command line or from JSON/YAML job specs with the
+same engine as the GUI, without importing Qt, matplotlib or pandas. Only
+the drivers of the databases a job touches are imported.
+"""
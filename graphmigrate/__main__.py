@@ -0,0 +1,5 @@
+import sys
+
+from graphmigrate.cli import main
+
+sys.exit(main())
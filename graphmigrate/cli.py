@@ -0,0 +1,183 @@
+import argparse
+import configparser
+import json
+import logging
+import os
+import time
+from collections import namedtuple
+
+from migration.adaptive import create_controllers
+from migration.checkpoints import CheckpointStore
+from migration.databases import Databases
+from migration.runner import Migration
+from migration.scheduler import DEFAULT_CONCURRENCY, BackendLimits, MigrationJob, failed_job_item, run_jobs
+
+DEFAULT_CONFIG_PATH = os.path.join('conf', 'db.ini')
+
+# A MigrationJob plus its position in the spec file
+SpecJob = namedtuple("SpecJob", MigrationJob._fields + ("index",))
+
+EXAMPLES = """examples:
+  python -m graphmigrate migrate --source postgresql:orders --target neo4j:Order
+  python -m graphmigrate migrate --source mongodb:users --target postgresql:users --columns name,email
+  python -m graphmigrate run jobs.yaml
+
+job spec (JSON or YAML):
+  {"max_workers": 4,
+   "jobs": [{"source": "postgresql:orders", "target": "neo4j:Order",
+             "columns": ["id", "total"], "target_columns": ["id", "amount"],
+             "watermark": "updated_at", "upsert_key": "id", "resume": false}]}
+"""
+
+
+def log_message(category, message, level="INFO"):
+    formatted_message = f"{level} - {category}: {message}"
+    if level == "ERROR":
+        logging.error(formatted_message)
+    elif level == "WARN":
+        logging.warning(formatted_message)
+    elif level == "DEBUG":
+        logging.debug(formatted_message)
+    else:
+        logging.info(formatted_message)
+
+
+def parse_endpoint(text):
+    """Split "postgresql:orders" into ("postgresql", "orders")."""
+    db_name, sep, item = text.partition(':')
+    if not sep or not item:
+        raise ValueError(f"Expected <database>:<table/collection/label>, got {text!r}")
+    return db_name.lower(), item
+
+
+def load_config(path):
+    config = configparser.ConfigParser()
+    if not config.read(path) or not config.sections():
+        raise ValueError(f"No sections found in {path}")
+    return config
+
+
+def load_job_spec(path):
+    with open(path, encoding='utf-8') as f:
+        if path.endswith(('.yaml', '.yml')):
+            import yaml  # Only needed for YAML specs
+            spec = yaml.safe_load(f)
+        else:
+            spec = json.load(f)
+    if isinstance(spec, list):
+        spec = {'jobs': spec}
+    return spec
+
+
+def run_job(config, checkpoints, spec, controllers=None):
+    """Run one job spec entry on its own connections and return its report row."""
+    source_db, source_item = parse_endpoint(spec['source'])
+    target_db, target_item = parse_endpoint(spec['target'])
+    databases = Databases(config)
+    try:
+        start_time = time.time()
+        columns = spec.get('columns') or [col for col, _ in databases.get_schema(source_db, source_item)]
+        target_columns = spec.get('target_columns') or columns
+        if len(target_columns) != len(columns):
+            raise ValueError("columns and target_columns must have the same length")
+        watermark = spec.get('watermark')
+        upsert_key = spec.get('upsert_key')
+        if watermark is not None and upsert_key not in columns:
+            raise ValueError("Incremental jobs need an upsert_key among the migrated columns")
+
+        migration = Migration(databases, source_db, target_db, source_item, target_item, columns, target_columns,
+                              checkpoints=checkpoints, resume=spec.get('resume', False),
+                              watermark_column=watermark, upsert_key=upsert_key, log=log_message,
+                              controller=(controllers or {}).get(target_db.lower()))
+        migration.run()
+        return migration.report(time.time() - start_time)
+    finally:
+        databases.close()
+
+
+def run_specs(config, specs, max_workers, checkpoint_path):
+    """Run job specs concurrently under the per-backend limits; returns the report rows in spec order."""
+    checkpoints = CheckpointStore(checkpoint_path)
+    databases = Databases(config)
+    limits = {db: databases.get_setting(db, 'concurrency', DEFAULT_CONCURRENCY[db]) for db in DEFAULT_CONCURRENCY}
+    # Keyed by position too: two specs may name the same source and target (say with different columns)
+    jobs = []
+    for index, spec in enumerate(specs):
+        source_db, source_item = parse_endpoint(spec['source'])
+        target_db, target_item = parse_endpoint(spec['target'])
+        jobs.append(SpecJob(source_db, target_db, source_item, target_item, index))
+    backend_limits = BackendLimits(limits)
+    controllers = create_controllers(databases, jobs, backend_limits, log_message)
+
+    results = {}
+    try:
+        for job, item, error in run_jobs(jobs, lambda job: run_job(config, checkpoints, specs[job.index], controllers),
+                                         max(1, min(max_workers, len(jobs))), backend_limits):
+            if error is not None:
+                log_message("Migration", f"Error migrating {job.source_item}: {str(error)}", "ERROR")
+                item = failed_job_item(job, error)
+            results[job] = item
+            log_message("Migration", f"Finished {job.source_item} ({len(results)}/{len(jobs)}): {item['result']}", "INFO")
+    finally:
+        checkpoints.close()
+    return [results[job] for job in jobs]
+
+
+def print_report(items):
+    for item in items:
+        print(f"{item['name']}\t{item['result']}\t{item['migrated']}/{'unknown' if item['records'] is None else item['records']} rows\t{item['time']:.2f}s"
+              + (f"\t{item['rows_per_second']:.0f} rows/s" if 'rows_per_second' in item else "")
+              + (f"\t{item['error']}" if item['error'] else "")
+              + (f"\trejected rows: {item['dead_letters']}" if item.get('dead_letters') else "")
+              + (f"\tbatch size {item['batch_size']}, writers {item['concurrency']}" if item.get('batch_size') else ""))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m graphmigrate", description="Run Graph Migrate migrations without the GUI.",
+                                     epilog=EXAMPLES, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config', default=DEFAULT_CONFIG_PATH, help="db.ini to read connections from (default: %(default)s)")
+    parser.add_argument('--checkpoints', help="checkpoint store (default: checkpoints.db next to --config)")
+    parser.add_argument('--quiet', action='store_true', help="only log warnings and errors")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    migrate = commands.add_parser('migrate', help="migrate one table/collection/label")
+    migrate.add_argument('--source', required=True, help="<database>:<table/collection/label>, e.g. postgresql:orders")
+    migrate.add_argument('--target', required=True, help="<database>:<table/collection/label>, e.g. neo4j:Order")
+    migrate.add_argument('--columns', help="comma-separated source columns (default: all)")
+    migrate.add_argument('--target-columns', help="comma-separated target names for --columns (default: the same)")
+    migrate.add_argument('--watermark', help="run incrementally on this watermark column")
+    migrate.add_argument('--upsert-key', help="column to upsert on in incremental mode")
+    migrate.add_argument('--resume', action='store_true', help="continue from the last checkpoint")
+
+    run = commands.add_parser('run', help="run the jobs of a JSON or YAML job spec")
+    run.add_argument('spec', help="job spec file (.json, .yaml or .yml)")
+    run.add_argument('--max-workers', type=int, help="jobs to run at once (overrides the spec)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.WARNING if args.quiet else logging.INFO,
+                        format='%(asctime)s %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    try:
+        config = load_config(args.config)
+        if args.command == 'migrate':
+            spec = {'source': args.source, 'target': args.target, 'resume': args.resume,
+                    'watermark': args.watermark, 'upsert_key': args.upsert_key}
+            if args.columns:
+                spec['columns'] = args.columns.split(',')
+            if args.target_columns:
+                spec['target_columns'] = args.target_columns.split(',')
+            specs, max_workers = [spec], 1
+        else:
+            job_spec = load_job_spec(args.spec)
+            specs = job_spec.get('jobs', [])
+            max_workers = args.max_workers or job_spec.get('max_workers', len(specs) or 1)
+        checkpoint_path = args.checkpoints or os.path.join(os.path.dirname(args.config), 'checkpoints.db')
+        items = run_specs(config, specs, max_workers, checkpoint_path)
+    except Exception as e:
+        log_message("Config", str(e), "ERROR")
+        return 2
+
+    print_report(items)
+    return 0 if all(item['result'] == "OK" for item in items) else 1
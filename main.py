@@ -1,24 +1,24 @@
 # Standard library imports
+import time
+STARTUP_TIME = time.perf_counter()  # Startup is measured from here, before any heavy import
+
+import asyncio
 import sys
 import os
 import configparser
 import csv
-import urllib.parse
 import logging
-from datetime import date, datetime, timedelta
+from datetime import datetime, timedelta
 import locale
-import time
 from decimal import Decimal
 
 # Third-party library imports
-import psycopg2
-from neo4j import GraphDatabase
-import neo4j.exceptions
-import pymongo
-import pandas as pd
-import networkx as nx
-import pytz
-from neo4j.time import DateTime, Date
+# pandas, networkx, matplotlib and the database drivers are imported on first use to keep startup fast
+
+try:
+    import qasync  # Drives the Qt event loop from asyncio for the async engine
+except ImportError:
+    qasync = None
 
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QComboBox, QTableWidget, 
@@ -33,18 +33,18 @@ from PyQt6.QtGui import (
     QAction, QColor, QBrush, QFont, QTextCharFormat, QSyntaxHighlighter, QPalette
 )
 from PyQt6.QtCore import (
-    Qt, QRegularExpression, QRect, QSize, QThread, pyqtSignal
+    Qt, QRegularExpression, QRect, QSize, QThread, QTimer, pyqtSignal
 )
 import os
 os.environ['QT_API'] = 'pyqt6'
 
-import matplotlib
-matplotlib.use('QtAgg')
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
-
 # Local imports
-from util import DraggableGraph, CypherHighlighter, DbConfigEditor, MigrationReport, MigrationWorker, CsvHighlighter, CsvViewerDialog
+from util import DraggableGraph, CypherHighlighter, DbConfigEditor, MigrationReport, MigrationWorker, MigrateAllWorker, AsyncMigrationRunner, ReplicationWorker, ConnectWorker, LogModel, LogPanel, LogViewerDialog, CsvHighlighter, CsvViewerDialog
+from migration.batching import chunked
+from migration.checkpoints import CheckpointStore
+from migration.databases import Databases
+from migration import get_backend
+from migration.scheduler import DEFAULT_CONCURRENCY, BackendLimits, MigrationJob
 import random
 
 class Migrate(QMainWindow):
@@ -58,6 +58,9 @@ class Migrate(QMainWindow):
                             format='%(asctime)s %(levelname)s - %(message)s',
                             datefmt='%Y-%m-%d %H:%M:%S')
 
+        # Bounded log shared by every panel; created first, as loading the config already logs
+        self.log_model = LogModel(self)
+
         self.db_info_labels = {}
         self.select_combos = {}
         self.download_csv_btns = {}
@@ -76,6 +79,13 @@ class Migrate(QMainWindow):
         self.mongo_db = None  # Add this line
         self.config = None
         self.worker = None
+        self.migrate_all_worker = None
+        self.replication_worker = None
+        self.connect_workers = {}  # db_type -> ConnectWorker still opening that connection
+        self.connect_started = {}
+        self.startup_pending = {"PostgreSQL", "MongoDB", "Neo4j"}
+        # Per-item progress so interrupted migrations can be resumed
+        self.checkpoints = CheckpointStore(os.path.join('conf', 'checkpoints.db'))
         
         self.load_config()  # Load config first
 
@@ -86,6 +96,12 @@ class Migrate(QMainWindow):
         self.load_and_apply_stylesheet("style_light.ini") 
 
 
+    def report_startup_time(self):
+        # Runs on the first event loop pass, i.e. once the window has been shown
+        self.log_message("Startup", f"Window shown {(time.perf_counter() - STARTUP_TIME) * 1000:.0f} ms after startup", "INFO")
+        if os.environ.get('GRAPHMIGRATE_EXIT_AFTER_STARTUP'):
+            QApplication.quit()
+
     def generate_random_color(self):
         return QColor(random.randint(0, 255), random.randint(0, 255), random.randint(0, 255))
 
@@ -98,6 +114,11 @@ class Migrate(QMainWindow):
         self.log_message("UI", f"Applied stylesheet from {style_file}", "INFO")
 
 
+    def log_messages(self, lines):
+        # Batches from a migration worker's Reporter
+        for category, message, level in lines:
+            self.log_message(category, message, level)
+
     def log_message(self, category, message, level="INFO"):
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         formatted_message = f"[{timestamp}] {level} - {category}: {message}"
@@ -105,17 +126,8 @@ class Migrate(QMainWindow):
         # Print to system out
         print(formatted_message, file=sys.stdout)
         
-        # Write to log panel
-        if category in self.log_texts:
-            self.log_texts[category].append(formatted_message)
-        
-        # Write to migrate log panel
-        if hasattr(self, 'migrate_log_text'):
-            self.migrate_log_text.append(formatted_message)
-        
-        # Write to relate log panel
-        if hasattr(self, 'relate_log_text'):
-            self.relate_log_text.append(formatted_message)
+        # The log panels pick the line up from the shared log model on its next refresh
+        self.log_model.append(category, level, formatted_message)
         
         # Log using logging module (similar to log4j)
         if level == "INFO":
@@ -157,6 +169,11 @@ class Migrate(QMainWindow):
             style_menu.addAction(style_action)
             
         
+        # Add "View Log" action
+        view_log_action = QAction("View Log", self)
+        view_log_action.triggered.connect(self.open_log_viewer)
+        file_menu.addAction(view_log_action)
+
         exit_action = QAction("Exit", self)
         exit_action.triggered.connect(self.close)
         file_menu.addAction(exit_action)
@@ -203,6 +220,12 @@ class Migrate(QMainWindow):
         self.status_bar = QStatusBar()
         self.setStatusBar(self.status_bar)
 
+    def open_log_viewer(self):
+        self.log_model.flush()
+        log_viewer = LogViewerDialog(self.log_model, self)
+        log_viewer.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        log_viewer.show()
+
     def open_db_config_editor(self):
         self.log_message("UI", "Opening database configuration editor", "INFO")
         db_config_editor = DbConfigEditor()
@@ -260,16 +283,11 @@ class Migrate(QMainWindow):
         # Re-read the db.ini file
         self.load_config()
         
-        # Reconnect to databases
+        # Reconnect to databases; the tabs refill as each connection comes up
         self.connect_to_databases()
         
-        # Refresh all tab contents
-        self.refresh_postgresql_tab()
-        self.refresh_mongodb_tab()
-        self.refresh_neo4j_tab()
-        
-        QMessageBox.information(self, "Reload Complete", "All database connections and tabs have been reloaded.")
-        self.log_message("UI", "All database connections and tabs reloaded", "INFO")
+        QMessageBox.information(self, "Reload Started", "The configuration has been re-read; databases are reconnecting in the background.")
+        self.log_message("UI", "Configuration reloaded, reconnecting to all databases", "INFO")
 
     def load_config(self):
         self.config = configparser.ConfigParser()
@@ -285,20 +303,61 @@ class Migrate(QMainWindow):
             self.config = None
 
     def connect_to_databases(self):
-        self.connect_postgresql()
-        self.connect_mongodb()
-        self.connect_neo4j()
+        # Every backend connects on its own worker so a slow or unreachable one doesn't hold up the window
+        if self.config is None:
+            return
+        for db_type in ("PostgreSQL", "MongoDB", "Neo4j"):
+            worker = ConnectWorker(self, self.config, db_type)
+            worker.connected.connect(self.database_connected)
+            worker.failed.connect(self.database_connection_failed)
+            self.connect_workers[db_type] = worker
+            self.connect_started[db_type] = time.perf_counter()
+            self.db_info_labels[db_type].setText("Database: Connecting…")
+            self.log_message(db_type, f"Connecting to {db_type}...", "INFO")
+            worker.start()
+
+    def database_connected(self, db_type, conn, items):
+        if self.sender() is not self.connect_workers.get(db_type):
+            conn.close()  # Superseded by a later reload
+            return
+        del self.connect_workers[db_type]
+        if db_type == "PostgreSQL":
+            self.disconnect_postgresql()
+            self.pg_conn = conn
+            self.pg_cur = conn.cursor()
+        elif db_type == "MongoDB":
+            self.disconnect_mongodb()
+            self.mongo_client = conn
+            self.mongo_db = conn[self.config['mongodb']['database']]
+        else:  # Neo4j
+            self.disconnect_neo4j()
+            self.neo4j_driver = conn
+        self.update_db_info(db_type)
+        elapsed = (time.perf_counter() - self.connect_started.pop(db_type)) * 1000
+        self.log_message(db_type, f"Connected to {db_type} successfully in {elapsed:.0f} ms", "INFO")
+        self.show_items(db_type, items)
+        self.connection_settled(db_type)
+
+    def database_connection_failed(self, db_type, error):
+        if self.sender() is not self.connect_workers.get(db_type):
+            return
+        del self.connect_workers[db_type]
+        self.connect_started.pop(db_type, None)
+        self.update_db_info(db_type)
+        self.log_message(db_type, f"Error connecting to {db_type}: {error}", "ERROR")
+        self.connection_settled(db_type)
+
+    def connection_settled(self, db_type):
+        if self.startup_pending is None:
+            return
+        self.startup_pending.discard(db_type)
+        if not self.startup_pending:
+            self.startup_pending = None
+            self.log_message("Startup", f"All database connections settled {(time.perf_counter() - STARTUP_TIME) * 1000:.0f} ms after startup", "INFO")
 
     def connect_postgresql(self):
         try:
-            self.pg_conn = psycopg2.connect(
-                host=self.config['postgresql']['host'],
-                port=self.config['postgresql']['port'],
-                database=self.config['postgresql']['database'],
-                user=self.config['postgresql']['user'],
-                password=self.config['postgresql']['password'],
-                client_encoding='utf8'
-            )
+            self.pg_conn = get_backend("postgresql").open_connection(self.config['postgresql'])
             self.pg_cur = self.pg_conn.cursor()
             self.update_db_info("PostgreSQL")
             self.log_message("PostgreSQL", "Connected to PostgreSQL successfully", "INFO")
@@ -308,13 +367,7 @@ class Migrate(QMainWindow):
 
     def connect_mongodb(self):
         try:
-            if self.config['mongodb']['host'] == 'localhost' or self.config['mongodb']['host'].startswith('127.0.0.1'):
-                # Local connection
-                mongodb_url = f"mongodb://{self.config['mongodb']['host']}:{self.config['mongodb']['port']}/{self.config['mongodb']['database']}"
-            else:
-                # Remote connection
-                mongodb_url = f"mongodb+srv://{self.config['mongodb']['user']}:{urllib.parse.quote_plus(self.config['mongodb']['password'])}@{self.config['mongodb']['host']}/{self.config['mongodb']['database']}?retryWrites=true&w=majority"
-            self.mongo_client = pymongo.MongoClient(mongodb_url)
+            self.mongo_client = get_backend("mongodb").open_connection(self.config['mongodb'])
             self.mongo_db = self.mongo_client[self.config['mongodb']['database']]
             self.update_db_info("MongoDB")
             self.log_message("MongoDB", "Connected to MongoDB successfully", "INFO")
@@ -325,10 +378,7 @@ class Migrate(QMainWindow):
 
     def connect_neo4j(self):
         try:
-            self.neo4j_driver = GraphDatabase.driver(
-                self.config['neo4j']['url'],
-                auth=(self.config['neo4j']['user'], self.config['neo4j']['password'])
-            )
+            self.neo4j_driver = get_backend("neo4j").open_connection(self.config['neo4j'])
             # Test the connection
             with self.neo4j_driver.session() as session:
                 session.run("RETURN 1")
@@ -551,8 +601,7 @@ class Migrate(QMainWindow):
         layout.addWidget(self.table_widgets[db_type])
 
         # Log messages
-        self.log_texts[db_type] = QTextEdit()
-        self.log_texts[db_type].setReadOnly(True)
+        self.log_texts[db_type] = LogPanel(self.log_model, categories={db_type})
         self.log_texts[db_type].setMaximumHeight(100)
         layout.addWidget(self.log_texts[db_type])
 
@@ -599,6 +648,19 @@ class Migrate(QMainWindow):
         self.source_columns_selected_label = QLabel("Number of columns selected: 0")
         source_layout.addWidget(self.source_columns_selected_label)
 
+        # Incremental mode: only rows past the last run's high-water mark, upserted on a key
+        incremental_layout = QHBoxLayout()
+        self.incremental_checkbox = QCheckBox("Incremental")
+        self.incremental_checkbox.stateChanged.connect(lambda state: self.log_message("UI", f"Incremental mode {'enabled' if self.incremental_checkbox.isChecked() else 'disabled'}", "INFO"))
+        incremental_layout.addWidget(self.incremental_checkbox)
+        incremental_layout.addWidget(QLabel("Watermark:"))
+        self.watermark_combo = QComboBox()
+        incremental_layout.addWidget(self.watermark_combo)
+        incremental_layout.addWidget(QLabel("Upsert key:"))
+        self.upsert_key_combo = QComboBox()
+        incremental_layout.addWidget(self.upsert_key_combo)
+        source_layout.addLayout(incremental_layout)
+
         panels_layout.addWidget(source_panel)
 
         # Target Database panel
@@ -643,14 +705,33 @@ class Migrate(QMainWindow):
         # Add Migrate and Migrate All buttons
         button_layout = QHBoxLayout()
         self.migrate_button = QPushButton("Migrate")
-        self.migrate_button.clicked.connect(self.start_migration)
+        self.migrate_button.clicked.connect(lambda: self.start_migration())
         self.migrate_button.clicked.connect(lambda: self.log_message("UI", "Migrate button clicked", "INFO"))
         button_layout.addWidget(self.migrate_button)
 
+        self.resume_button = QPushButton("Resume")
+        self.resume_button.clicked.connect(lambda: self.start_migration(resume=True))
+        self.resume_button.clicked.connect(lambda: self.log_message("UI", "Resume button clicked", "INFO"))
+        button_layout.addWidget(self.resume_button)
+
         self.migrate_all_button = QPushButton("Migrate All")
-        self.migrate_all_button.clicked.connect(self.start_migrate_all)
+        self.migrate_all_button.clicked.connect(lambda: self.start_migrate_all())
         self.migrate_all_button.clicked.connect(lambda: self.log_message("UI", "Migrate All button clicked", "INFO"))
         button_layout.addWidget(self.migrate_all_button)
+
+        self.resume_all_button = QPushButton("Resume All")
+        self.resume_all_button.clicked.connect(lambda: self.start_migrate_all(resume=True))
+        self.resume_all_button.clicked.connect(lambda: self.log_message("UI", "Resume All button clicked", "INFO"))
+        button_layout.addWidget(self.resume_all_button)
+
+        self.async_engine_checkbox = QCheckBox("Async engine")
+        self.async_engine_checkbox.setToolTip("Run migrations on asyncio with asyncpg and the async MongoDB/Neo4j drivers (needs qasync)")
+        self.async_engine_checkbox.setEnabled(qasync is not None)
+        button_layout.addWidget(self.async_engine_checkbox)
+
+        self.replicate_button = QPushButton("Start Replication")
+        self.replicate_button.clicked.connect(self.toggle_replication)
+        button_layout.addWidget(self.replicate_button)
         main_layout.addLayout(button_layout)
 
         # Add Progress bar
@@ -658,34 +739,12 @@ class Migrate(QMainWindow):
         main_layout.addWidget(self.progress_bar)
 
         # Add log message box below the panels
-        self.migrate_log_text = QTextEdit()
-        self.migrate_log_text.setReadOnly(True)
+        self.migrate_log_text = LogPanel(self.log_model)
         self.migrate_log_text.setMaximumHeight(100)
         main_layout.addWidget(self.migrate_log_text)
 
         parent.setLayout(main_layout)
 
-    def update_migration_ui(self, source_db, target_db, source_item, target_item):
-        # Update source combobox and schema
-        self.source_db_combo.setCurrentText(source_db)
-        self.source_table_combo.setCurrentText(source_item)
-        self.update_source_schema(source_item)
-
-        # Update target name and schema
-        self.target_db_combo.setCurrentText(target_db)
-        self.target_table_name.setText(target_item)
-        self.update_target_schema(source_db, target_db, source_item)
-
-        # Update row and column counts
-        source_schema = self.get_schema(source_db, source_item)
-        row_count = self.get_row_count(source_db, source_item)
-        self.source_row_count_label.setText(f"Number of rows: {row_count}")
-        self.source_columns_selected_label.setText(f"Number of columns selected: {len(source_schema)}")
-        self.target_columns_selected_label.setText(f"Number of columns selected: {len(source_schema)}")
-
-        # Update the application to process events and refresh the UI
-        QApplication.processEvents()
-        
     def update_selected_columns_count(self):
         selected_count = 0
         for i in range(self.source_schema_table.rowCount()):
@@ -790,16 +849,7 @@ class Migrate(QMainWindow):
         }
         return type_mapping.get(data_type.lower(), 'String')
 
-    def start_migration(self):
-        source_db = self.source_db_combo.currentText()
-        target_db = self.target_db_combo.currentText()
-        source_table = self.source_table_combo.currentText()
-        target_table = self.target_table_name.text()
-        
-        if source_db == "Select a database" or target_db == "Select a database" or not source_table or not target_table:
-            self.log_message("Migration", "Please select source and target databases and specify table names.", "WARN")
-            return
-
+    def get_selected_columns(self):
         selected_columns = []
         target_columns = []
         for i in range(self.source_schema_table.rowCount()):
@@ -809,25 +859,108 @@ class Migrate(QMainWindow):
                 target_column = self.target_schema_table.item(i, 0).text()
                 selected_columns.append(source_column)
                 target_columns.append(target_column)
+        return selected_columns, target_columns
+
+    def toggle_replication(self):
+        if self.replication_worker is not None and self.replication_worker.isRunning():
+            release = False
+            if self.replication_worker.source_db.lower() == "postgresql":
+                # The slot keeps WAL on the source until dropped; keeping it is what lets replication resume
+                reply = QMessageBox.question(self, "Stop Replication",
+                                             "Drop the replication slot as well?\n\n"
+                                             "Keep it (No) to resume later without missing changes; the server then "
+                                             "retains WAL until replication resumes. Drop it (Yes) to release the WAL "
+                                             "if this replication is not coming back.",
+                                             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+                                             | QMessageBox.StandardButton.Cancel, QMessageBox.StandardButton.No)
+                if reply == QMessageBox.StandardButton.Cancel:
+                    return
+                release = reply == QMessageBox.StandardButton.Yes
+            self.log_message("Replication", "Stopping replication after the current micro-batch", "INFO")
+            self.replicate_button.setEnabled(False)
+            self.replication_worker.stop(release)
+            return
 
+        source_db = self.source_db_combo.currentText()
+        target_db = self.target_db_combo.currentText()
+        source_table = self.source_table_combo.currentText()
+        target_table = self.target_table_name.text()
+        if source_db == "Select a database" or target_db == "Select a database" or not source_table or not target_table:
+            self.log_message("Replication", "Please select source and target databases and specify table names.", "WARN")
+            return
+        if source_db.lower() == target_db.lower() or source_db.lower() not in ("mongodb", "postgresql"):
+            self.log_message("Replication", "Replication runs from MongoDB or PostgreSQL into another database type.", "WARN")
+            return
+
+        selected_columns, target_columns = self.get_selected_columns()
+        if not selected_columns:
+            self.log_message("Replication", "Please select at least one column to replicate.", "WARN")
+            return
+
+        self.replication_worker = ReplicationWorker(self, self.config, source_db, target_db, source_table, target_table,
+                                                    selected_columns, target_columns, self.checkpoints)
+        self.replication_worker.log.connect(self.log_message)
+        self.replication_worker.finished.connect(self.replication_finished)
+        self.replication_worker.start()
+        self.replicate_button.setText("Stop Replication")
+
+    def replication_finished(self):
+        self.replicate_button.setText("Start Replication")
+        self.replicate_button.setEnabled(True)
+
+    def start_migration(self, resume=False):
+        source_db = self.source_db_combo.currentText()
+        target_db = self.target_db_combo.currentText()
+        source_table = self.source_table_combo.currentText()
+        target_table = self.target_table_name.text()
+        
+        if source_db == "Select a database" or target_db == "Select a database" or not source_table or not target_table:
+            self.log_message("Migration", "Please select source and target databases and specify table names.", "WARN")
+            return
+
+        selected_columns, target_columns = self.get_selected_columns()
         if not selected_columns:
             self.log_message("Migration", "Please select at least one column to migrate.", "WARN")
             return
 
+        watermark_column = upsert_key = None
+        if self.incremental_checkbox.isChecked():
+            watermark_column = self.watermark_combo.currentText()
+            upsert_key = self.upsert_key_combo.currentText()
+            if not watermark_column or upsert_key not in selected_columns:
+                self.log_message("Migration", "Incremental mode needs a watermark column and a selected upsert key column.", "WARN")
+                return
+
         self.log_message("Migration", f"Migration started from source [{source_db}] to target [{target_db}]", "INFO")
         self.log_message("Migration", f"Source table/collection/label: {source_table}", "INFO")
         self.log_message("Migration", f"Target table/collection/label: {target_table}", "INFO")
         self.log_message("Migration", f"Columns: {', '.join(selected_columns)}", "INFO")
+        if watermark_column is not None:
+            self.log_message("Migration", f"Incremental on {watermark_column}, upserting on {upsert_key}", "INFO")
+
+        if self.async_engine_checkbox.isChecked():
+            if resume or watermark_column is not None:
+                self.log_message("Migration", "The async engine runs full migrations only; use the default engine to resume or run incrementally.", "WARN")
+                return
+            self.worker = AsyncMigrationRunner(self, self.config)
+            self.worker.progress.connect(self.update_progress)
+            self.worker.logs.connect(self.log_messages)
+            self.worker.finished.connect(self.migration_finished)
+            self.worker.start_migration(MigrationJob(source_db, target_db, source_table, target_table), selected_columns, target_columns)
+            self.set_migrate_buttons_enabled(False)
+            return
 
-        self.worker = MigrationWorker(self, source_db, target_db, source_table, target_table, selected_columns, target_columns)
+        self.worker = MigrationWorker(self, source_db, target_db, source_table, target_table, selected_columns, target_columns,
+                                      checkpoints=self.checkpoints, resume=resume,
+                                      watermark_column=watermark_column, upsert_key=upsert_key)
         self.worker.progress.connect(self.update_progress)
-        self.worker.log.connect(self.log_message)
+        self.worker.logs.connect(self.log_messages)
         self.worker.finished.connect(self.migration_finished)
         self.worker.start()
 
-        self.migrate_button.setEnabled(False)
+        self.set_migrate_buttons_enabled(False)
 
-    def start_migrate_all(self):
+    def start_migrate_all(self, resume=False):
         source_db = self.source_db_combo.currentText()
         target_db = self.target_db_combo.currentText()
 
@@ -853,93 +986,51 @@ class Migrate(QMainWindow):
             self.log_message("Migration", f"Unsupported source database type: {source_db}", "ERROR")
             return
 
-        # Prepare report data
-        report_data = {
-            'total_items': len(items),
-            'total_time': 0,
-            'items': []
-        }
+        # Every item runs on its own pool thread with its own connections
+        jobs = [MigrationJob(source_db, target_db, item, item) for item in items]
+        limits = {db: self.databases().get_setting(db, 'concurrency', DEFAULT_CONCURRENCY[db]) for db in DEFAULT_CONCURRENCY}
+        max_workers = max(1, min(len(jobs), limits[source_db.lower()], limits[target_db.lower()]))
+        self.log_message("Migration", f"Migrating {len(jobs)} items with {max_workers} workers", "INFO")
 
-        # Start migration for each item
-        total_items = len(items)
-        start_time = time.time()
-        for i, item in enumerate(items):
-            self.log_message("Migration", f"Starting migration for {item} ({i+1}/{total_items})", "INFO")
-            
-            # Update UI for current migration
-            self.update_migration_ui(source_db, target_db, item, item)
-            
-            # Perform the migration
-            item_start_time = time.time()
-            result, migrated, failed, error = self.migrate_item(source_db, target_db, item, item)
-            item_time = time.time() - item_start_time
-
-            # Collect report data
-            report_data['items'].append({
-                'name': item,
-                'records': self.get_row_count(source_db, item),
-                'result': result,
-                'migrated': migrated,
-                'failed': failed,
-                'time': item_time,
-                'error': error
-            })
-
-            # Update progress
-            progress = int((i + 1) / total_items * 100)
-            self.progress_bar.setValue(progress)
-
-        report_data['total_time'] = time.time() - start_time
+        self.progress_bar.setValue(0)
+        if self.async_engine_checkbox.isChecked():
+            if resume:
+                self.log_message("Migration", "The async engine cannot resume; use the default engine for Resume All.", "WARN")
+                return
+            self.migrate_all_worker = AsyncMigrationRunner(self, self.config)
+            self.migrate_all_worker.progress.connect(self.update_progress)
+            self.migrate_all_worker.logs.connect(self.log_messages)
+            self.migrate_all_worker.completed.connect(self.migrate_all_finished)
+            self.migrate_all_worker.start_migrate_all(jobs, max_workers, limits)
+        else:
+            self.migrate_all_worker = MigrateAllWorker(self, self.config, jobs, max_workers, BackendLimits(limits),
+                                                       checkpoints=self.checkpoints, resume=resume)
+            self.migrate_all_worker.progress.connect(self.update_progress)
+            self.migrate_all_worker.logs.connect(self.log_messages)
+            self.migrate_all_worker.completed.connect(self.migrate_all_finished)
+            self.migrate_all_worker.start()
+
+        self.set_migrate_buttons_enabled(False)
+
+    def set_migrate_buttons_enabled(self, enabled):
+        for button in (self.migrate_button, self.resume_button, self.migrate_all_button, self.resume_all_button):
+            button.setEnabled(enabled)
+
+    def migrate_all_finished(self, report_data):
         self.log_message("Migration", "All migrations completed.", "INFO")
+        self.set_migrate_buttons_enabled(True)
 
         # Show migration report
         report_dialog = MigrationReport(report_data)
         report_dialog.exec()
 
-    def migrate_item(self, source_db, target_db, source_item, target_item):
-        try:
-            # Get schema for the source item
-            source_schema = self.get_schema(source_db, source_item)
-            source_columns = [col for col, _ in source_schema]
-            
-            # Get the target schema (which may have different column names)
-            target_schema = self.convert_schema(source_db, target_db, source_schema)
-            target_columns = [col for col, _ in target_schema]
-
-            # Create MigrationWorker
-            worker = MigrationWorker(self, source_db, target_db, source_item, target_item, source_columns, target_columns)
-            worker.progress.connect(self.update_progress)
-            worker.log.connect(self.log_message)
-
-            # Start migration
-            worker.run()  # Run synchronously to ensure sequential migration
-
-            # Get migration results
-            total_rows = worker.total_rows
-            migrated_rows = worker.migrated_rows
-            failed_rows = total_rows - migrated_rows
-
-            if failed_rows == 0:
-                result = "OK"
-            elif migrated_rows == 0:
-                result = "Fail"
-            else:
-                result = f"Partially migrated ({migrated_rows}/{total_rows})"
-
-            return result, migrated_rows, failed_rows, worker.error_message
-
-        except Exception as e:
-            error_message = str(e)
-            self.log_message("Migration", f"Error migrating {source_item}: {error_message}", "ERROR")
-            return "Fail", 0, self.get_row_count(source_db, source_item), error_message
-
     def update_progress(self, current, total):
         self.progress_bar.setMaximum(total)
         self.progress_bar.setValue(current)
 
     def migration_finished(self):
         self.log_message("Migration", "Migration completed.", "INFO")
-        self.migrate_button.setEnabled(True)
+        self.set_migrate_buttons_enabled(True)
 
     def get_db_info(self, db_name):
         if db_name not in self.config:
@@ -961,43 +1052,16 @@ class Migrate(QMainWindow):
             return (f"Connection: {connection}\n"
                     f"User: {config.get('user', 'N/A')}")
 
-    def get_schema(self, db_name, table_name):
-        if db_name.lower() == "postgresql":
-            return self.get_postgresql_schema(table_name)
-        elif db_name.lower() == "mongodb":
-            return self.get_mongodb_schema(table_name)
-        else:  # Neo4j
-            return self.get_neo4j_schema(table_name)
-
-    def get_postgresql_schema(self, table_name):
-        self.pg_cur.execute(f"""
-            SELECT column_name, data_type
-            FROM information_schema.columns
-            WHERE table_name = '{table_name}'
-        """)
-        return self.pg_cur.fetchall()
-
-    def get_mongodb_schema(self, collection_name):
-        collection = self.mongo_db[collection_name]
-        sample_doc = collection.find_one()
-        return [(key, type(value).__name__) for key, value in sample_doc.items()]
+    def databases(self):
+        # Wrap the shared GUI connections; Migrate All workers open their own instead.
+        # Nothing is opened here, as these short-lived wrappers are never closed.
+        return Databases(self.config, self.pg_conn, self.mongo_client, self.neo4j_driver, connect=False)
 
-    def get_neo4j_schema(self, label):
-        with self.neo4j_driver.session() as session:
-            result = session.run(f"MATCH (n:`{label}`) RETURN n LIMIT 1")
-            sample_node = result.single()['n']
-            return [(key, type(value).__name__) for key, value in sample_node.items()]
+    def get_schema(self, db_name, table_name):
+        return self.databases().get_schema(db_name, table_name)
 
     def get_row_count(self, db_name, table_name):
-        if db_name.lower() == "postgresql":
-            self.pg_cur.execute(f'SELECT COUNT(*) FROM "{table_name}"')
-            return self.pg_cur.fetchone()[0]
-        elif db_name.lower() == "mongodb":
-            return self.mongo_db[table_name].count_documents({})
-        else:  # Neo4j
-            with self.neo4j_driver.session() as session:
-                result = session.run(f"MATCH (n:`{table_name}`) RETURN COUNT(n) AS count")
-                return result.single()['count']
+        return self.databases().get_row_count(db_name, table_name)
 
     def update_source_schema(self, table_name):
         if not table_name:
@@ -1009,6 +1073,7 @@ class Migrate(QMainWindow):
 
         self.populate_schema_table(self.source_schema_table, schema, with_checkbox=True)
         self.source_row_count_label.setText(f"Number of rows: {row_count}")
+        self.update_incremental_columns([col for col, _ in schema])
         self.update_selected_columns_count()
 
         # Update target table name and schema
@@ -1016,6 +1081,11 @@ class Migrate(QMainWindow):
         target_db = self.target_db_combo.currentText()
         self.update_target_schema(source_db, target_db, table_name)
 
+    def update_incremental_columns(self, columns):
+        for combo in (self.watermark_combo, self.upsert_key_combo):
+            combo.clear()
+            combo.addItems(columns)
+
     def populate_schema_table(self, table_widget, schema, editable=False, with_checkbox=False, is_target=False):
         table_widget.blockSignals(True)  # Block signals temporarily
         
@@ -1094,27 +1164,21 @@ class Migrate(QMainWindow):
     def load_tables(self, db_type):
         if self.pg_cur:
             try:
-                self.pg_cur.execute("SELECT table_name FROM information_schema.tables WHERE table_schema = 'public' ORDER BY table_name ASC")
-                tables = [table[0] for table in self.pg_cur.fetchall()]
-                self.select_combos[db_type].clear()
-                self.select_combos[db_type].addItems(tables)
-                self.log_message(db_type, f"Loaded tables: {', '.join(tables)}", "INFO")
+                self.show_items(db_type, get_backend("postgresql").list_tables(self.pg_conn))
             except Exception as e:
                 self.log_message(db_type, f"Error loading tables: {str(e)}", "ERROR")
                     
     def load_labels(self, db_type):
-        with self.neo4j_driver.session() as session:
-            result = session.run("CALL db.labels()")
-            labels = sorted([record["label"] for record in result])
-            self.select_combos[db_type].clear()
-            self.select_combos[db_type].addItems(labels)
-            self.log_message(db_type, f"Loaded labels: {', '.join(labels)}", "INFO")
+        self.show_items(db_type, get_backend("neo4j").list_labels(self.neo4j_driver))
 
     def load_collections(self, db_type):
-        collections = sorted(self.mongo_db.list_collection_names())
+        self.show_items(db_type, get_backend("mongodb").list_collections(self.mongo_db))
+
+    def show_items(self, db_type, items):
+        kind = {"PostgreSQL": "tables", "MongoDB": "collections", "Neo4j": "labels"}[db_type]
         self.select_combos[db_type].clear()
-        self.select_combos[db_type].addItems(collections)
-        self.log_message(db_type, f"Loaded collections: {', '.join(collections)}", "INFO")
+        self.select_combos[db_type].addItems(items)
+        self.log_message(db_type, f"Loaded {kind}: {', '.join(items)}", "INFO")
         
     def load_data(self, db_type):
         selected_item = self.select_combos[db_type].currentText()
@@ -1153,15 +1217,16 @@ class Migrate(QMainWindow):
             self.log_message("MongoDB", f"Error loading data: {str(e)}", "ERROR")
 
     def load_neo4j_data(self, label):
-        with self.neo4j_driver.session() as session:
-            result = session.run(f"MATCH (n:`{label}`) RETURN n")
-            records = list(result)
-            if records:
-                columns = list(records[0]['n'].keys())
-                rows = [[str(record['n'].get(col, '')) for col in columns] for record in records]
-                self.populate_table_widget("Neo4j", columns, rows)
-            else:
-                self.log_message("Neo4j", f"No nodes found with label: {label}", "WARN")
+        columns = None
+        rows = []
+        for batch in self.stream_data("Neo4j", label, None, get_backend("neo4j").DEFAULT_FETCH_SIZE):
+            if columns is None:
+                columns = list(batch[0].keys())
+            rows.extend([str(node.get(col, '')) for col in columns] for node in batch)
+        if rows:
+            self.populate_table_widget("Neo4j", columns, rows)
+        else:
+            self.log_message("Neo4j", f"No nodes found with label: {label}", "WARN")
 
     def populate_table_widget(self, db_type, columns, rows):
         table_widget = self.table_widgets[db_type]
@@ -1207,29 +1272,33 @@ class Migrate(QMainWindow):
         rows = self.pg_cur.fetchall()
         columns = [desc[0] for desc in self.pg_cur.description]
         
+        import pandas as pd
         df = pd.DataFrame(rows, columns=columns)
         df.to_csv(file_name, index=False, encoding='utf-8-sig')
 
     def download_mongodb_csv(self, collection_name, file_name):
-        collection = self.mongo_db[collection_name]
-        documents = list(collection.find())
-        
-        if not documents:
+        columns = get_backend("mongodb").get_field_names(self.mongo_db[collection_name])
+        if not columns:
             raise ValueError("No documents found in the collection")
-        
-        df = pd.DataFrame(documents)
-        df.to_csv(file_name, index=False, encoding='utf-8-sig')
+
+        # Write batch by batch; read_partitions in db.ini reads _id ranges in parallel
+        with open(file_name, 'w', newline='', encoding='utf-8-sig') as file:
+            writer = csv.DictWriter(file, fieldnames=columns)
+            writer.writeheader()
+            for batch in self.stream_data("MongoDB", collection_name, None, get_backend("mongodb").DEFAULT_CURSOR_BATCH_SIZE):
+                writer.writerows(batch)
 
     def download_neo4j_csv(self, label, file_name):
-        with self.neo4j_driver.session() as session:
-            result = session.run(f"MATCH (n:`{label}`) RETURN n")
-            records = [dict(record['n']) for record in result]
-            
-            if not records:
-                raise ValueError(f"No nodes found with label: {label}")
-            
-            df = pd.DataFrame(records)
-            df.to_csv(file_name, index=False, encoding='utf-8-sig')
+        columns = get_backend("neo4j").get_property_keys(self.neo4j_driver, label)
+        if not columns:
+            raise ValueError(f"No nodes found with label: {label}")
+
+        # Write page by page so the label never has to fit in memory
+        with open(file_name, 'w', newline='', encoding='utf-8-sig') as file:
+            writer = csv.DictWriter(file, fieldnames=columns)
+            writer.writeheader()
+            for batch in self.stream_data("Neo4j", label, None, get_backend("neo4j").DEFAULT_FETCH_SIZE):
+                writer.writerows(batch)
 
     def download_all(self, db_type):
         if db_type == "PostgreSQL":
@@ -1284,6 +1353,7 @@ class Migrate(QMainWindow):
                 break
 
             try:
+                import pandas as pd
                 df = pd.read_csv(file_name, encoding='utf-8-sig')
                 item_name = os.path.splitext(os.path.basename(file_name))[0]
 
@@ -1347,6 +1417,7 @@ class Migrate(QMainWindow):
             return
 
         try:
+            import pandas as pd
             # Try different encodings
             encodings = ['utf-8-sig', 'cp949', 'euc-kr']
             df = None
@@ -1414,12 +1485,11 @@ class Migrate(QMainWindow):
         with self.neo4j_driver.session() as session:
             # Clear existing nodes with this label
             session.run(f"MATCH (n:`{label}`) DETACH DELETE n")
-            
-            # Create new nodes
-            for _, row in df.iterrows():
-                properties = ', '.join([f"`{col}`: ${col}" for col in df.columns])
-                cypher_query = f"CREATE (:`{label}` {{{properties}}})"
-                session.run(cypher_query, **row.to_dict())
+
+        # Create new nodes
+        writer = self.create_writer("Neo4j", label, list(df.columns))
+        for batch in chunked(df.itertuples(index=False, name=None), writer.batch_size):
+            writer.write(batch)
 
 
 
@@ -1467,6 +1537,7 @@ class Migrate(QMainWindow):
         self.source_schema_table.setRowCount(0)
         self.source_row_count_label.setText("")
         self.source_columns_selected_label.setText("Number of columns selected: 0")
+        self.update_incremental_columns([])
         self.target_table_name.clear()
         self.clear_target_schema()
 
@@ -1477,156 +1548,20 @@ class Migrate(QMainWindow):
         self.target_columns_selected_label.setText("Number of columns selected: 0")
         
     def closeEvent(self, event):
+        if self.replication_worker is not None and self.replication_worker.isRunning():
+            self.replication_worker.stop()
+            self.replication_worker.wait()
+        for worker in self.connect_workers.values():
+            worker.wait()
+        self.connect_workers = {}
         self.disconnect_databases()
         event.accept()
 
-    def get_postgresql_data(self, table_name, columns):
-        columns_str = ", ".join(f'"{col}"' for col in columns)
-        query = f'SELECT {columns_str} FROM "{table_name}"'
-        self.log_message("PostgreSQL", f"Executing query: {query}", "DEBUG")
-        self.pg_cur.execute(query)
-        return self.pg_cur.fetchall()
+    def stream_data(self, db_name, table_name, columns, batch_size):
+        return self.databases().stream_data(db_name, table_name, columns, batch_size)
 
-    def get_mongodb_data(self, collection_name, columns):
-        collection = self.mongo_db[collection_name]
-        projection = {col: 1 for col in columns}
-        projection['_id'] = 0  # Exclude the _id field
-        query = f"db.{collection_name}.find({{}}, {projection})"
-        self.log_message("MongoDB", f"Executing query: {query}", "DEBUG")
-        return list(collection.find({}, projection))
-
-    def get_neo4j_data(self, label, columns):
-        query = f"MATCH (n:`{label}`) RETURN {', '.join(f'n.{col} AS {col}' for col in columns)}"
-        self.log_message("Neo4j", f"Executing query: {query}", "DEBUG")
-        with self.neo4j_driver.session() as session:
-            result = session.run(query)
-            return [dict(record) for record in result]
-
-
-    def create_postgresql_table(self, table_name, columns):
-        columns_def = []
-        for col in columns:
-            if isinstance(col, tuple) and len(col) == 2:
-                col_name, data_type = col
-            elif isinstance(col, str):
-                col_name = col
-                data_type = 'TEXT'  # Default to TEXT if type is not specified
-            else:
-                raise ValueError(f"Unexpected column format: {col}")
-
-            if data_type == 'DateTime':
-                col_type = 'TIMESTAMP WITH TIME ZONE'
-            elif data_type == 'float':
-                col_type = 'DOUBLE PRECISION'
-            elif data_type == 'int':
-                col_type = 'INTEGER'
-            else:
-                col_type = 'TEXT'
-            
-            columns_def.append(f'"{col_name}" {col_type}')
-        
-        query = f'CREATE TABLE IF NOT EXISTS "{table_name}" ({", ".join(columns_def)})'
-        self.log_message("PostgreSQL", f"Creating table: {query}", "DEBUG")
-        self.pg_cur.execute(query)
-        self.pg_conn.commit()
-
-    def create_mongodb_collection(self, collection_name):
-        self.log_message("MongoDB", f"Creating collection: {collection_name}", "DEBUG")
-        self.mongo_db.create_collection(collection_name)
-
-    def create_neo4j_label(self, label):
-        # Neo4j doesn't require explicit label creation
-        self.log_message("Neo4j", f"Label '{label}' will be created automatically during data insertion", "DEBUG")
-
-    def get_data(self, db_name, table_name, columns):
-        db_name = db_name.lower()
-        if db_name == "postgresql":
-            return self.get_postgresql_data(table_name, columns)
-        elif db_name == "mongodb":
-            return self.get_mongodb_data(table_name, columns)
-        elif db_name == "neo4j":
-            return self.get_neo4j_data(table_name, columns)
-        else:
-            raise ValueError(f"Unsupported database type: {db_name}")
-        
-    def create_target_table(self, db_name, table_name, columns):
-        db_name = db_name.lower()
-        if db_name == "postgresql":
-            self.create_postgresql_table(table_name, columns)
-        elif db_name == "mongodb":
-            self.create_mongodb_collection(table_name)
-        elif db_name == "neo4j":
-            self.create_neo4j_label(table_name)
-        else:
-            raise ValueError(f"Unsupported database type: {db_name}")
-
-    def insert_row(self, db_name, table_name, columns, row):
-        db_name = db_name.lower()
-        if db_name == "postgresql":
-            self.insert_postgresql_row(table_name, columns, row)
-        elif db_name == "mongodb":
-            self.insert_mongodb_row(table_name, columns, row)
-        elif db_name == "neo4j":
-            self.insert_neo4j_row(table_name, columns, row)
-        else:
-            raise ValueError(f"Unsupported database type: {db_name}")
-
-
-    @staticmethod
-    def convert_for_postgresql(obj):
-        if isinstance(obj, DateTime):
-            # Convert Neo4j DateTime to Python datetime
-            py_datetime = obj.to_native()
-            # Make it timezone-aware if it's not
-            if py_datetime.tzinfo is None:
-                py_datetime = py_datetime.replace(tzinfo=pytz.UTC)
-            return py_datetime
-        elif isinstance(obj, Date):
-            # Convert Neo4j Date to Python date
-            return date(obj.year, obj.month, obj.day)
-        elif isinstance(obj, date):
-            return obj
-        elif isinstance(obj, Decimal):
-            return float(obj)
-        return obj
-
-    def insert_postgresql_row(self, table_name, columns, row):
-        columns_str = ", ".join(f'"{col}"' for col in columns)
-        placeholders = ", ".join(["%s"] * len(columns))
-        query = f'INSERT INTO "{table_name}" ({columns_str}) VALUES ({placeholders})'
-        if self.pg_cur.rowcount == 0:  # Log only the first insert
-            self.log_message("PostgreSQL", f"Inserting data: {query}", "DEBUG")
-        
-        # Convert row to a list if it's a dictionary
-        if isinstance(row, dict):
-            row = [self.convert_for_postgresql(row.get(col, None)) for col in columns]
-        else:
-            row = [self.convert_for_postgresql(val) for val in row]
-        
-        self.pg_cur.execute(query, row)
-        self.pg_conn.commit()
-        
-
-
-    @staticmethod
-    def convert_for_mongodb(obj):
-        if isinstance(obj, Decimal):
-            return float(obj)
-        elif isinstance(obj, date):
-            return datetime.combine(obj, datetime.min.time())
-        return obj
-
-    def insert_mongodb_row(self, collection_name, columns, row):
-        if isinstance(row, dict):
-            document = {k: self.convert_for_mongodb(v) for k, v in row.items()}
-        else:
-            document = {col: self.convert_for_mongodb(val) for col, val in zip(columns, row)}
-        
-        query = f"db.{collection_name}.insertOne({document})"
-        if self.mongo_db[collection_name].count_documents({}) == 0:  # Log only the first insert
-            self.log_message("MongoDB", f"Inserting data: {query}", "DEBUG")
-        self.mongo_db[collection_name].insert_one(document)
-        
+    def create_writer(self, db_name, table_name, columns):
+        return self.databases().create_writer(db_name, table_name, columns)
 
     def decimal_to_float(value):
         if isinstance(value, Decimal):
@@ -1638,28 +1573,6 @@ class Migrate(QMainWindow):
             return str(value)
         return value
 
-    @staticmethod
-    def custom_decimal_conversion(value):
-        if isinstance(value, Decimal):
-            if value.as_tuple().exponent >= 0:  # It's an integer
-                return int(value)
-            else:
-                return float(value)
-        return value
-
-    def insert_neo4j_row(self, label, columns, row):
-        if isinstance(row, dict):
-            properties = ", ".join(f"`{col}`: ${col}" for col in row.keys())
-            params = {k: self.custom_decimal_conversion(v) for k, v in row.items()}
-        else:
-            properties = ", ".join(f"`{col}`: ${col}" for col in columns)
-            params = {col: self.custom_decimal_conversion(val) for col, val in zip(columns, row)}
-        
-        query = f"CREATE (:`{label}` {{{properties}}})"
-        with self.neo4j_driver.session() as session:
-            session.run(query, params)
-
-
     def setup_relate_tab_ui(self, parent):
         layout = QVBoxLayout()
 
@@ -1754,8 +1667,7 @@ class Migrate(QMainWindow):
         layout.addWidget(self.relate_progress_bar)
 
         # Log area
-        self.relate_log_text = QTextEdit()
-        self.relate_log_text.setReadOnly(True)
+        self.relate_log_text = LogPanel(self.log_model)
         self.relate_log_text.setMaximumHeight(100)  # Set a maximum height
         layout.addWidget(QLabel("Log Messages:"))
         layout.addWidget(self.relate_log_text)
@@ -1780,6 +1692,13 @@ class Migrate(QMainWindow):
             self.log_message("Relate", "Please select a relationship name", "ERROR")
             return
 
+        # The plotting stack takes seconds to import, so it is only loaded once a graph is shown
+        import matplotlib
+        matplotlib.use('QtAgg')
+        import matplotlib.pyplot as plt
+        import networkx as nx
+        from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
+
         node_limit = 20  # Initial node limit
 
         # Base query template
@@ -2314,7 +2233,21 @@ if __name__ == "__main__":
     app.setApplicationDisplayName("Graph Migrate")
     app.setApplicationVersion("1.0")
     
+    if qasync is not None:
+        # Run Qt under an asyncio loop so the async engine's coroutines share the GUI thread
+        loop = qasync.QEventLoop(app)
+        asyncio.set_event_loop(loop)
+        app_closed = asyncio.Event()
+        app.aboutToQuit.connect(app_closed.set)
+        m = Migrate()
+        m.show()
+        QTimer.singleShot(0, m.report_startup_time)
+        with loop:
+            loop.run_until_complete(app_closed.wait())
+        sys.exit(0)
+
     m = Migrate()
     m.show()
+    QTimer.singleShot(0, m.report_startup_time)
     sys.exit(app.exec())                 
                                          
\ No newline at end of file
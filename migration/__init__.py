@@ -0,0 +1,15 @@
+"""Qt-free data access used by the migration workers.
+
+Each backend lives in its own module and only imports its own driver, so
+pulling in one backend does not load the others.
+"""
+import importlib
+
+BACKENDS = ("postgresql", "mongodb", "neo4j")
+
+
+def get_backend(db_name):
+    db_name = db_name.lower()
+    if db_name not in BACKENDS:
+        raise ValueError(f"Unsupported database type: {db_name}")
+    return importlib.import_module(f"migration.{db_name}")
@@ -0,0 +1,122 @@
+import threading
+
+DEFAULT_TARGET_BATCH_MS = 2000
+DEFAULT_MIN_BATCH_SIZE = 100
+# Batches on target in a row before one more concurrent writer is allowed
+CONCURRENCY_INCREASE_AFTER = 10
+
+
+class AdaptiveController:
+    """AIMD control of one target backend's write batch size and writer concurrency.
+
+    Every write reports its row count, duration and error through
+    record(). A write that finishes within ``target_batch_ms`` grows the
+    batch size by a quarter of the starting size; a slower one halves it.
+    A transient error (the writer's ``connection_errors`` or
+    ``retry_errors``) halves both the batch size and the concurrency, and
+    a run of on-target writes adds one writer back. Both stay within the configured bounds. Concurrency is
+    applied through ``limits`` (BackendLimits), so it counts the jobs
+    writing to this backend at once. Shared by every job writing to the
+    backend, so it is thread-safe; the first writer passed to start() sets
+    the starting batch size.
+    """
+
+    def __init__(self, db_name, min_batch_size=DEFAULT_MIN_BATCH_SIZE, max_batch_size=None, concurrency=1,
+                 target_batch_ms=DEFAULT_TARGET_BATCH_MS, limits=None, log=None):
+        self.db_name = db_name.lower()
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.batch_size = None
+        self.step = None
+        self.max_concurrency = concurrency
+        self.concurrency = concurrency
+        self.target_seconds = target_batch_ms / 1000
+        self.limits = limits
+        self.log = log
+        self.lock = threading.Lock()
+        self.on_target = 0
+        self.rows = 0
+        self.seconds = 0.0
+        self.transient_errors = 0
+
+    def start(self, writer):
+        with self.lock:
+            if self.batch_size is None:
+                batch_size = writer.batch_size
+                self.min_batch_size = max(1, min(self.min_batch_size, batch_size))
+                self.max_batch_size = max(batch_size, self.max_batch_size or batch_size * 4)
+                self.batch_size = batch_size
+                self.step = max(1, batch_size // 4)
+
+    def record(self, rows, seconds, error=None, transient=False):
+        with self.lock:
+            self.seconds += seconds
+            if error is None:
+                self.rows += rows
+            if transient:
+                self.transient_errors += 1
+                self.on_target = 0
+                self.resize(self.batch_size // 2, self.concurrency // 2, f"transient error: {error}")
+            elif error is not None:
+                return  # Data errors say nothing about the load the target can take
+            elif seconds > self.target_seconds:
+                self.on_target = 0
+                self.resize(self.batch_size // 2, self.concurrency, f"{rows} rows took {seconds:.2f}s")
+            else:
+                self.on_target += 1
+                concurrency = self.concurrency
+                if self.on_target >= CONCURRENCY_INCREASE_AFTER:
+                    self.on_target = 0
+                    concurrency += 1
+                self.resize(self.batch_size + self.step, concurrency, None)
+
+    def resize(self, batch_size, concurrency, reason):
+        batch_size = min(self.max_batch_size, max(self.min_batch_size, batch_size))
+        concurrency = min(self.max_concurrency, max(1, concurrency))
+        if concurrency != self.concurrency and self.limits is not None:
+            self.limits.resize(self.db_name, concurrency)
+        # Growth happens on nearly every write, so only decreases and concurrency changes are logged
+        if self.log is not None and (reason is not None or concurrency != self.concurrency) \
+                and (batch_size, concurrency) != (self.batch_size, self.concurrency):
+            because = f" ({reason})" if reason else ""
+            self.log("Adaptive", f"{self.db_name}: batch size {self.batch_size} -> {batch_size}, "
+                                 f"writers {self.concurrency} -> {concurrency}{because}", "INFO")
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+
+    def throughput(self):
+        with self.lock:
+            return self.rows / self.seconds if self.seconds else 0.0
+
+    def summary(self):
+        return (f"{self.db_name}: batch size {self.batch_size} (bounds {self.min_batch_size}-{self.max_batch_size}), "
+                f"writers {self.concurrency}/{self.max_concurrency}, {self.throughput():.0f} rows/s while writing, "
+                f"{self.transient_errors} transient errors")
+
+
+def create_controller(databases, db_name, concurrency=1, limits=None, log=None):
+    """The controller for db_name when ``adaptive = true`` in its db.ini section, else None.
+
+    Bounds come from min_batch_size/max_batch_size (default: down to 100,
+    up to four times the writer's batch size) and target_batch_ms.
+    """
+    if not databases.get_setting(db_name, 'adaptive', False):
+        return None
+    return AdaptiveController(db_name, databases.get_setting(db_name, 'min_batch_size', DEFAULT_MIN_BATCH_SIZE),
+                              databases.get_setting(db_name, 'max_batch_size', 0) or None, concurrency,
+                              databases.get_setting(db_name, 'target_batch_ms', DEFAULT_TARGET_BATCH_MS), limits, log)
+
+
+def create_controllers(databases, jobs, limits=None, log=None):
+    """One controller per adaptive target of jobs, shared by all the jobs writing to it.
+
+    The starting concurrency is the target's slot count in limits, which the
+    controller then resizes.
+    """
+    controllers = {}
+    for db_name in {job.target_db.lower() for job in jobs}:
+        concurrency = limits.limit(db_name) if limits is not None else 1
+        controller = create_controller(databases, db_name, concurrency, limits, log)
+        if controller is not None:
+            controllers[db_name] = controller
+    return controllers
@@ -0,0 +1,17 @@
+"""asyncio counterparts of the migration backends.
+
+Every backend module here mirrors the synchronous one next to it but uses
+an async driver (asyncpg, pymongo's AsyncMongoClient, the Neo4j async
+driver), so many migrations can share one event loop thread. Value
+conversion is shared with the synchronous backends.
+"""
+import importlib
+
+from migration import BACKENDS
+
+
+def get_backend(db_name):
+    db_name = db_name.lower()
+    if db_name not in BACKENDS:
+        raise ValueError(f"Unsupported database type: {db_name}")
+    return importlib.import_module(f"migration.aio.{db_name}")
@@ -0,0 +1,233 @@
+import asyncio
+import time
+from functools import partial
+
+from migration.aio import get_backend
+from migration.batching import STREAM_DONE, BatchWriteError
+from migration.metrics import PeakMemory, estimate_bytes, item_metrics
+from migration.pipeline import DEFAULT_PIPELINE_DEPTH
+from migration.scheduler import DEFAULT_CONCURRENCY, failed_job_item, result_label
+
+
+class AsyncDatabases:
+    """Async connections to the databases configured in db.ini.
+
+    Unlike Databases, one instance is shared by every job on the event loop:
+    the PostgreSQL pool, the Mongo client and the Neo4j driver all multiplex
+    concurrent operations themselves.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.connections = {}
+        self.lock = asyncio.Lock()
+
+    def get_setting(self, db_name, key, fallback):
+        section = db_name.lower()
+        if self.config and self.config.has_section(section):
+            return self.config.getint(section, key, fallback=fallback)
+        return fallback
+
+    async def connection(self, db_name):
+        """Return the asyncpg pool, async Mongo database or async Neo4j driver for db_name."""
+        db_name = db_name.lower()
+        async with self.lock:
+            if db_name not in self.connections:
+                backend = get_backend(db_name)
+                if db_name == "postgresql":
+                    max_size = self.get_setting(db_name, 'concurrency', DEFAULT_CONCURRENCY[db_name]) * 2
+                    self.connections[db_name] = await backend.open_connection(self.config['postgresql'], max_size)
+                else:
+                    self.connections[db_name] = await backend.open_connection(self.config[db_name])
+        if db_name == "mongodb":
+            return self.connections[db_name][self.config['mongodb']['database']]
+        return self.connections[db_name]
+
+    async def close(self):
+        for conn in self.connections.values():
+            await conn.close()
+        self.connections = {}
+
+    async def get_schema(self, db_name, table_name):
+        return await get_backend(db_name).get_schema(await self.connection(db_name), table_name)
+
+    async def get_row_count(self, db_name, table_name):
+        return await get_backend(db_name).get_row_count(await self.connection(db_name), table_name)
+
+    async def create_target_table(self, db_name, table_name, columns):
+        db_name = db_name.lower()
+        if db_name == "postgresql":
+            await get_backend(db_name).create_table(await self.connection(db_name), table_name, columns)
+        elif db_name == "mongodb":
+            await get_backend(db_name).create_collection(await self.connection(db_name), table_name)
+        elif db_name == "neo4j":
+            pass  # Neo4j doesn't require explicit label creation
+        else:
+            raise ValueError(f"Unsupported database type: {db_name}")
+
+    async def create_writer(self, db_name, table_name, columns):
+        db_name = db_name.lower()
+        backend = get_backend(db_name)
+        batch_size = self.get_setting(db_name, 'batch_size', None)
+        if db_name == "postgresql":
+            writer = backend.AsyncPostgresBatchWriter(await self.connection(db_name), table_name, columns, batch_size=batch_size)
+            await writer.setup()
+            return writer
+        elif db_name == "mongodb":
+            return backend.AsyncMongoBatchWriter((await self.connection(db_name))[table_name], columns, batch_size=batch_size)
+        else:  # Neo4j
+            return backend.AsyncNeo4jBatchWriter(await self.connection(db_name), table_name, columns, batch_size=batch_size)
+
+    async def stream_data(self, db_name, table_name, columns, batch_size):
+        db_name = db_name.lower()
+        backend = get_backend(db_name)
+        conn = await self.connection(db_name)
+        if db_name == "postgresql":
+            batches = backend.stream_rows(conn, table_name, columns, batch_size,
+                                          self.get_setting(db_name, 'itersize', backend.DEFAULT_ITERSIZE))
+        elif db_name == "mongodb":
+            batches = backend.stream_documents(conn[table_name], columns, batch_size,
+                                               self.get_setting(db_name, 'cursor_batch_size', backend.DEFAULT_CURSOR_BATCH_SIZE))
+        else:  # Neo4j
+            batches = backend.stream_nodes(conn, table_name, columns, batch_size,
+                                           self.get_setting(db_name, 'fetch_size', backend.DEFAULT_FETCH_SIZE))
+        async for batch in batches:
+            yield batch
+
+
+def _ignore(*args):
+    pass
+
+
+async def migrate(databases, job, source_columns, target_columns, progress=_ignore, log=_ignore, status=None):
+    """Migrate one item and return its report row (the dict MigrationReport shows).
+
+    The source is read by a separate task into a bounded queue, so the next
+    batch is fetched while the current one is written. progress(done, total)
+    and log(category, message, level) match the worker signals;
+    status(category, message) gets the per-batch progress lines, as in
+    Migration, and defaults to log.
+    """
+    if status is None:
+        status = lambda category, message: log(category, message, "INFO")
+    start_time = time.time()
+    total_rows = migrated_rows = failed_rows = 0
+    error_message = ""
+    timings = {'read': 0.0, 'transform': 0.0, 'write': 0.0}
+    size = round_trips = 0
+    memory = PeakMemory()
+    try:
+        total_rows = await databases.get_row_count(job.source_db, job.source_item)
+        log("Migration", f"Starting migration of {total_rows} rows from {job.source_db} to {job.target_db}", "INFO")
+        await databases.create_target_table(job.target_db, job.target_item, target_columns)
+        writer = await databases.create_writer(job.target_db, job.target_item, target_columns)
+
+        batches = asyncio.Queue(maxsize=databases.get_setting(job.source_db, 'pipeline_depth', DEFAULT_PIPELINE_DEPTH))
+
+        async def read():
+            nonlocal round_trips
+            try:
+                started = time.perf_counter()
+                async for batch in databases.stream_data(job.source_db, job.source_item, source_columns, writer.batch_size):
+                    timings['read'] += time.perf_counter() - started
+                    round_trips += 1
+                    await batches.put(batch)
+                    started = time.perf_counter()
+                await batches.put(STREAM_DONE)
+            except Exception as e:
+                await batches.put(e)
+
+        reader = asyncio.create_task(read())
+        try:
+            done = 0
+            while True:
+                batch = await batches.get()
+                if batch is STREAM_DONE:
+                    break
+                if isinstance(batch, Exception):
+                    raise batch
+                started = time.perf_counter()
+                stage = 'transform'
+                rows = [tuple(map(row.get, source_columns)) if isinstance(row, dict) else tuple(row) for row in batch]
+                size += estimate_bytes(rows)
+                try:
+                    payload = writer.prepare(rows)
+                    timings[stage] += time.perf_counter() - started
+                    started = time.perf_counter()
+                    stage = 'write'
+                    round_trips += 1
+                    migrated_rows += await writer.write_prepared(payload)
+                except BatchWriteError as e:
+                    migrated_rows += e.written
+                    failed_rows += len(rows) - e.written
+                    for index, message in e.errors:
+                        log("Migration", f"Error migrating row {done + index + 1}: {message}", "ERROR")
+                except Exception as e:
+                    failed_rows += len(rows)
+                    log("Migration", f"Error migrating rows {done + 1}-{done + len(rows)}: {str(e)}", "ERROR")
+                # A batch that failed to convert is charged to the transform stage
+                timings[stage] += time.perf_counter() - started
+                memory.sample()
+                done += len(rows)
+                progress(done, total_rows)
+                status("Migration", f"Migrated {done}/{total_rows} rows of {job.source_item}")
+        finally:
+            reader.cancel()
+            await asyncio.gather(reader, return_exceptions=True)
+        log("Migration", f"Migration from {job.source_db} to {job.target_db} completed successfully", "INFO")
+    except Exception as e:
+        error_message = str(e)
+        failed_rows = total_rows - migrated_rows
+        log("Migration", f"Error during migration: {error_message}", "ERROR")
+
+    elapsed = time.time() - start_time
+    return {
+        'name': job.source_item,
+        'records': total_rows,
+        'result': result_label(total_rows, migrated_rows, failed_rows, error_message),
+        'migrated': migrated_rows,
+        'failed': failed_rows,
+        'time': elapsed,
+        'error': error_message,
+        **item_metrics(elapsed, migrated_rows, size, timings, round_trips, memory.peak)
+    }
+
+
+async def migrate_all(databases, jobs, max_workers, limits, progress=_ignore, log=_ignore, status=None):
+    """Migrate every job concurrently on the running loop; returns the report dict.
+
+    max_workers bounds the jobs in flight and limits caps the jobs per
+    backend, as with the threaded scheduler. status(category, message, key)
+    gets the per-batch lines, keyed by job.
+    """
+    start_time = time.time()
+    workers = asyncio.Semaphore(max_workers)
+    semaphores = {name.lower(): asyncio.Semaphore(limit) for name, limit in limits.items()}
+    results = {}
+
+    async def run(job):
+        async with workers:
+            names = sorted({job.source_db.lower(), job.target_db.lower()} & semaphores.keys())
+            for name in names:
+                await semaphores[name].acquire()
+            try:
+                log("Migration", f"Starting migration for {job.source_item}", "INFO")
+                columns = [col for col, _ in await databases.get_schema(job.source_db, job.source_item)]
+                item = await migrate(databases, job, columns, columns, log=log,
+                                     status=partial(status, key=job) if status is not None else None)
+            except Exception as e:
+                log("Migration", f"Error migrating {job.source_item}: {str(e)}", "ERROR")
+                item = failed_job_item(job, e)
+            finally:
+                for name in reversed(names):
+                    semaphores[name].release()
+        results[job] = item
+        progress(len(results), len(jobs))
+        log("Migration", f"Finished {job.source_item} ({len(results)}/{len(jobs)}): {item['result']}", "INFO")
+
+    await asyncio.gather(*(run(job) for job in jobs))
+    return {
+        'total_items': len(jobs),
+        'total_time': time.time() - start_time,
+        'items': [results[job] for job in jobs]
+    }
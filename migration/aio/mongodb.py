@@ -0,0 +1,66 @@
+from pymongo import AsyncMongoClient
+from pymongo.errors import BulkWriteError
+
+from migration.batching import BatchWriter
+from migration.conversion import ConversionPlan, documents
+from migration.mongodb import DEFAULT_CURSOR_BATCH_SIZE, batch_write_error, connection_url, mongodb_converter
+
+
+async def open_connection(section):
+    return AsyncMongoClient(connection_url(section))
+
+
+async def get_schema(db, collection_name):
+    sample_doc = await db[collection_name].find_one()
+    return [(key, type(value).__name__) for key, value in sample_doc.items()]
+
+
+async def get_row_count(db, collection_name):
+    return await db[collection_name].count_documents({})
+
+
+async def create_collection(db, collection_name):
+    if collection_name not in await db.list_collection_names():
+        await db.create_collection(collection_name)
+
+
+class AsyncMongoBatchWriter(BatchWriter):
+    """Inserts each batch with one unordered insert_many."""
+
+    def __init__(self, collection, columns, batch_size=None):
+        super().__init__(collection.name, columns, batch_size)
+        self.collection = collection
+        self.plan = ConversionPlan(self.columns, mongodb_converter)
+
+    def prepare(self, rows):
+        return documents(self.columns, self.plan, rows)
+
+    async def write_prepared(self, documents):
+        if not documents:
+            return 0
+        try:
+            result = await self.collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            raise batch_write_error(e, len(documents)) from e
+        return len(result.inserted_ids)
+
+    async def write(self, rows):
+        return await self.write_prepared(self.prepare(rows))
+
+
+async def stream_documents(collection, columns, batch_size, cursor_batch_size=DEFAULT_CURSOR_BATCH_SIZE):
+    """Yield lists of up to batch_size documents from one find() cursor."""
+    projection = {col: 1 for col in columns}
+    projection['_id'] = 0  # Exclude the _id field
+    cursor = collection.find({}, projection, batch_size=cursor_batch_size)
+    try:
+        batch = []
+        async for document in cursor:
+            batch.append(document)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        await cursor.close()
@@ -0,0 +1,75 @@
+from neo4j import AsyncGraphDatabase, READ_ACCESS
+
+from migration.batching import BatchWriter
+from migration.conversion import ConversionPlan, documents
+from migration.neo4j import DEFAULT_FETCH_SIZE, neo4j_converter
+
+
+async def open_connection(section):
+    return AsyncGraphDatabase.driver(section['url'], auth=(section['user'], section['password']))
+
+
+async def get_schema(driver, label):
+    async with driver.session() as session:
+        result = await session.run(f"MATCH (n:`{label}`) RETURN n LIMIT 1")
+        sample_node = (await result.single())['n']
+        return [(key, type(value).__name__) for key, value in sample_node.items()]
+
+
+async def get_row_count(driver, label):
+    async with driver.session() as session:
+        result = await session.run(f"MATCH (n:`{label}`) RETURN COUNT(n) AS count")
+        return (await result.single())['count']
+
+
+class AsyncNeo4jBatchWriter(BatchWriter):
+    """Creates one node per row with UNWIND inside a managed write transaction."""
+
+    default_batch_size = 1000
+
+    def __init__(self, driver, label, columns, batch_size=None):
+        super().__init__(label, columns, batch_size)
+        self.driver = driver
+        self.query = f"UNWIND $rows AS row CREATE (n:`{label}`) SET n = row"
+        self.plan = ConversionPlan(self.columns, neo4j_converter)
+
+    def prepare(self, rows):
+        return documents(self.columns, self.plan, rows)
+
+    async def write_prepared(self, params):
+        if not params:
+            return 0
+        async with self.driver.session() as session:
+            await session.execute_write(self.create_nodes, params)
+        return len(params)
+
+    async def write(self, rows):
+        return await self.write_prepared(self.prepare(rows))
+
+    async def create_nodes(self, tx, rows):
+        result = await tx.run(self.query, rows=rows)
+        await result.consume()
+
+
+async def stream_nodes(driver, label, columns, batch_size, fetch_size=DEFAULT_FETCH_SIZE):
+    """Yield pages of node property dicts, paging by id(n) like the synchronous reader."""
+    props = "n {" + ", ".join(f".`{col}`" for col in columns) + "}"
+    query = (f"MATCH (n:`{label}`) WHERE id(n) > $last_id "
+             f"RETURN id(n) AS node_id, {props} AS props "
+             f"ORDER BY id(n) LIMIT $limit")
+
+    last_id = -1
+    async with driver.session(fetch_size=fetch_size, default_access_mode=READ_ACCESS) as session:
+        while True:
+            records = await session.execute_read(read_page, query, last_id, batch_size)
+            if not records:
+                break
+            last_id = records[-1][0]
+            yield [props for _, props in records]
+            if len(records) < batch_size:
+                break
+
+
+async def read_page(tx, query, last_id, limit):
+    result = await tx.run(query, last_id=last_id, limit=limit)
+    return [(record['node_id'], record['props']) async for record in result]
@@ -0,0 +1,95 @@
+import asyncpg
+
+from migration.batching import BatchWriter
+from migration.conversion import ConversionPlan
+from migration.postgresql import DEFAULT_ITERSIZE, postgresql_converter, table_definition, text_value
+
+TEXT_TYPES = ('text', 'character varying', 'character')
+
+
+async def open_connection(section, max_size=10):
+    return await asyncpg.create_pool(
+        host=section['host'],
+        port=int(section['port']),
+        database=section['database'],
+        user=section['user'],
+        password=section['password'],
+        min_size=1,
+        max_size=max_size
+    )
+
+
+async def get_schema(pool, table_name):
+    rows = await pool.fetch("""
+        SELECT column_name, data_type
+        FROM information_schema.columns
+        WHERE table_name = $1
+        ORDER BY ordinal_position
+    """, table_name)
+    return [(row['column_name'], row['data_type']) for row in rows]
+
+
+async def get_row_count(pool, table_name):
+    return await pool.fetchval(f'SELECT COUNT(*) FROM "{table_name}"')
+
+
+async def create_table(pool, table_name, columns):
+    await pool.execute(table_definition(table_name, columns))
+
+
+class AsyncPostgresBatchWriter(BatchWriter):
+    """Loads batches with asyncpg's binary COPY, one implicit transaction per batch.
+
+    Binary COPY needs values of the column's own type, so values headed for
+    text columns are turned into the strings the other write paths store
+    (text_value); call setup() once before writing to look the column
+    types up.
+    """
+
+    def __init__(self, pool, table_name, columns, batch_size=None):
+        super().__init__(table_name, columns, batch_size)
+        self.pool = pool
+        self.text_columns = set()
+        self.plan = ConversionPlan(self.columns, self.converter_for)
+
+    async def setup(self):
+        schema = dict(await get_schema(self.pool, self.table_name))
+        self.text_columns = {col for col in self.columns if schema.get(col) in TEXT_TYPES}
+
+    def converter_for(self, column, value_type):
+        convert = postgresql_converter(column, value_type)
+        if column not in self.text_columns or value_type in (str, type(None)):
+            return convert
+        if convert is None:
+            return text_value
+        return lambda value: text_value(convert(value))
+
+    def prepare(self, rows):
+        return self.plan.apply(rows)
+
+    async def write_prepared(self, rows):
+        if not rows:
+            return 0
+        async with self.pool.acquire() as conn:
+            await conn.copy_records_to_table(self.table_name, records=rows, columns=self.columns)
+        return len(rows)
+
+    async def write(self, rows):
+        return await self.write_prepared(self.prepare(rows))
+
+
+async def stream_rows(pool, table_name, columns, batch_size, itersize=DEFAULT_ITERSIZE):
+    """Yield lists of up to batch_size row tuples from a server-side cursor."""
+    columns_str = ", ".join(f'"{col}"' for col in columns)
+    query = f'SELECT {columns_str} FROM "{table_name}"'
+    async with pool.acquire() as conn:
+        # asyncpg cursors only live inside a transaction
+        async with conn.transaction(readonly=True):
+            batch = []
+            async for record in conn.cursor(query, prefetch=itersize):
+                batch.append(tuple(record))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
@@ -0,0 +1,137 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_BATCH_SIZE = 5000
+
+# Raised by any writer whose connection drops, whatever its driver
+CONNECTION_ERRORS = (ConnectionError, TimeoutError)
+
+# Ends a stream of batches passed through a queue
+STREAM_DONE = object()
+
+
+class BatchWriteError(Exception):
+    """Raised by a writer when only part of a batch could be written.
+
+    ``written`` is the number of rows that did land in the target and
+    ``errors`` is a list of ``(index_in_batch, message)`` tuples for the
+    rows that were rejected.
+    """
+
+    def __init__(self, message, written=0, errors=None):
+        super().__init__(message)
+        self.written = written
+        self.errors = errors or []
+
+
+class BatchWriter:
+    """Base class for the per-backend batch writers.
+
+    ``write(rows)`` takes a list of row tuples ordered like ``columns``,
+    writes them in one round trip, commits, and returns the number of rows
+    written. It is split into ``prepare(rows)``, which converts the rows to
+    the backend's payload without touching the database, and
+    ``write_prepared(payload)``, so a pipeline can convert one batch while
+    the previous one is written. Writers created with an upsert key also
+    take ``delete(keys)``. Subclasses override ``default_batch_size`` when
+    their backend prefers smaller or larger transactions.
+
+    Writers whose prepare() needs no connection also set ``preparer``, a
+    picklable callable doing the same work, so batches can be converted in
+    other processes.
+
+    ``connection_errors`` lists the exceptions that signal a lost or
+    unavailable backend rather than bad data: they fail the run instead of
+    sending the batch's rows to the dead-letter file. ``retry_errors`` lists
+    the ones a rolled-back write can simply be repeated after (deadlocks,
+    serialization failures); the runner retries those a few times with
+    backoff. The adaptive controller backs off on both.
+    """
+
+    default_batch_size = DEFAULT_BATCH_SIZE
+    preparer = None
+    connection_errors = CONNECTION_ERRORS
+    retry_errors = ()
+
+    def __init__(self, table_name, columns, batch_size=None):
+        self.table_name = table_name
+        self.columns = list(columns)
+        self.batch_size = batch_size or self.default_batch_size
+
+    def prepare(self, rows):
+        return rows
+
+    def write_prepared(self, payload):
+        raise NotImplementedError
+
+    def write(self, rows):
+        return self.write_prepared(self.prepare(rows))
+
+    def delete(self, keys):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def chunked(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def merge_streams(streams, max_workers):
+    """Read several batch streams concurrently and yield their batches.
+
+    ``streams`` are zero-argument generator functions; each one runs on a
+    pool thread and feeds a bounded queue, so readers block once the
+    consumer falls behind. Batches come out in arrival order. The first
+    reader exception is re-raised here, and closing this generator stops
+    the remaining readers.
+    """
+    results = queue.Queue(maxsize=max_workers * 2)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def drain(stream):
+        batches = stream()
+        try:
+            for batch in batches:
+                if not put(batch):
+                    return
+            put(STREAM_DONE)
+        except Exception as e:
+            put(e)
+        finally:
+            batches.close()
+
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    for stream in streams:
+        pool.submit(drain, stream)
+    try:
+        remaining = len(streams)
+        while remaining:
+            item = results.get()
+            if item is STREAM_DONE:
+                remaining -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield item
+    finally:
+        stop.set()
+        pool.shutdown(wait=True, cancel_futures=True)
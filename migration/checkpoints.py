@@ -0,0 +1,149 @@
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+from datetime import datetime
+
+DEFAULT_CHECKPOINT_PATH = os.path.join('conf', 'checkpoints.db')
+
+Checkpoint = namedtuple('Checkpoint', ['last_key', 'rows_written', 'done'])
+
+
+class CheckpointStore:
+    """Per-job migration progress kept in a local SQLite file.
+
+    A row is saved after every committed batch with the last source key it
+    contained (serialized by the source backend's dump_key), so an
+    interrupted migration can restart reading right after it. Incremental
+    runs keep their high-water mark per job and watermark column in a
+    second table, and replication jobs the stream position (resume token)
+    of the last applied micro-batch in a third. The store is shared by the
+    Migrate All workers, so every access goes through a lock.
+    """
+
+    def __init__(self, path=DEFAULT_CHECKPOINT_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.lock:
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS checkpoints (
+                    source_db TEXT NOT NULL,
+                    source_item TEXT NOT NULL,
+                    target_db TEXT NOT NULL,
+                    target_item TEXT NOT NULL,
+                    last_key TEXT,
+                    rows_written INTEGER NOT NULL DEFAULT 0,
+                    done INTEGER NOT NULL DEFAULT 0,
+                    updated_at TEXT,
+                    PRIMARY KEY (source_db, source_item, target_db, target_item)
+                )
+            ''')
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS watermarks (
+                    source_db TEXT NOT NULL,
+                    source_item TEXT NOT NULL,
+                    target_db TEXT NOT NULL,
+                    target_item TEXT NOT NULL,
+                    watermark_column TEXT NOT NULL,
+                    high_water TEXT NOT NULL,
+                    updated_at TEXT,
+                    PRIMARY KEY (source_db, source_item, target_db, target_item, watermark_column)
+                )
+            ''')
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS stream_positions (
+                    source_db TEXT NOT NULL,
+                    source_item TEXT NOT NULL,
+                    target_db TEXT NOT NULL,
+                    target_item TEXT NOT NULL,
+                    position TEXT NOT NULL,
+                    updated_at TEXT,
+                    PRIMARY KEY (source_db, source_item, target_db, target_item)
+                )
+            ''')
+            self.conn.commit()
+
+    @staticmethod
+    def job_key(job):
+        return (job.source_db.lower(), job.source_item, job.target_db.lower(), job.target_item)
+
+    def load(self, job):
+        """Return the job's Checkpoint, or None if it has none."""
+        with self.lock:
+            row = self.conn.execute('''
+                SELECT last_key, rows_written, done FROM checkpoints
+                WHERE source_db = ? AND source_item = ? AND target_db = ? AND target_item = ?
+            ''', self.job_key(job)).fetchone()
+        if row is None:
+            return None
+        return Checkpoint(row[0], row[1], bool(row[2]))
+
+    def save(self, job, last_key, rows_written, done=False):
+        with self.lock:
+            self.conn.execute('''
+                INSERT OR REPLACE INTO checkpoints
+                    (source_db, source_item, target_db, target_item, last_key, rows_written, done, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', self.job_key(job) + (last_key, rows_written, int(done), datetime.now().isoformat()))
+            self.conn.commit()
+
+    def finish(self, job, rows_written):
+        self.save(job, None, rows_written, done=True)
+
+    def clear(self, job):
+        with self.lock:
+            self.conn.execute('''
+                DELETE FROM checkpoints
+                WHERE source_db = ? AND source_item = ? AND target_db = ? AND target_item = ?
+            ''', self.job_key(job))
+            self.conn.commit()
+
+    def load_watermark(self, job, column):
+        """Return the serialized high-water mark of column for job, or None before the first run."""
+        with self.lock:
+            row = self.conn.execute('''
+                SELECT high_water FROM watermarks
+                WHERE source_db = ? AND source_item = ? AND target_db = ? AND target_item = ? AND watermark_column = ?
+            ''', self.job_key(job) + (column,)).fetchone()
+        return row[0] if row else None
+
+    def save_watermark(self, job, column, high_water):
+        with self.lock:
+            self.conn.execute('''
+                INSERT OR REPLACE INTO watermarks
+                    (source_db, source_item, target_db, target_item, watermark_column, high_water, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', self.job_key(job) + (column, high_water, datetime.now().isoformat()))
+            self.conn.commit()
+
+    def load_position(self, job):
+        """Return the serialized stream position of a replication job, or None."""
+        with self.lock:
+            row = self.conn.execute('''
+                SELECT position FROM stream_positions
+                WHERE source_db = ? AND source_item = ? AND target_db = ? AND target_item = ?
+            ''', self.job_key(job)).fetchone()
+        return row[0] if row else None
+
+    def save_position(self, job, position):
+        with self.lock:
+            self.conn.execute('''
+                INSERT OR REPLACE INTO stream_positions
+                    (source_db, source_item, target_db, target_item, position, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', self.job_key(job) + (position, datetime.now().isoformat()))
+            self.conn.commit()
+
+    def clear_position(self, job):
+        with self.lock:
+            self.conn.execute('''
+                DELETE FROM stream_positions
+                WHERE source_db = ? AND source_item = ? AND target_db = ? AND target_item = ?
+            ''', self.job_key(job))
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
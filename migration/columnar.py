@@ -0,0 +1,116 @@
+from functools import partial
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv
+
+from migration.batching import BatchWriter
+
+CSV_WRITE_OPTIONS = pyarrow.csv.WriteOptions(include_header=False, quoting_style='all_valid')
+
+
+def record_batch(rows, columns):
+    """Build a RecordBatch from row tuples ordered like columns.
+
+    Returns None, so the batch stays rows, when a column holds values Arrow
+    has no type for (ObjectIds, Neo4j temporals), integers beyond int64,
+    values of mixed types (Arrow would turn ints among floats into floats)
+    or nested documents and lists (the row path writes those as JSON or
+    arrays; Arrow has no CSV form for them).
+    """
+    if not rows:
+        return None
+    arrays = []
+    for values in zip(*rows):
+        if len({type(value) for value in values if value is not None}) > 1:
+            return None
+        try:
+            array = pa.array(values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError, OverflowError):
+            return None
+        if pa.types.is_nested(array.type):
+            return None
+        arrays.append(array)
+    return pa.RecordBatch.from_arrays(arrays, names=list(columns))
+
+
+def target_type(arrow_type):
+    """The type a column of arrow_type is cast to, or None to keep it.
+
+    This is convert_for_postgresql's rule, per column instead of per value.
+    """
+    if pa.types.is_decimal(arrow_type):
+        return pa.float64()
+    return None
+
+
+def convert_batch(batch):
+    """Cast the batch's columns; None if this Arrow build can't cast one of them."""
+    arrays = []
+    for array in batch.columns:
+        cast_to = target_type(array.type)
+        try:
+            arrays.append(array if cast_to is None else pc.cast(array, cast_to, safe=False))
+        except pa.ArrowNotImplementedError:
+            return None
+    return pa.RecordBatch.from_arrays(arrays, names=batch.schema.names)
+
+
+def prepare_batch(columns, prepare_rows, rows):
+    """A converted RecordBatch of rows, or prepare_rows(rows) for batches Arrow can't type or cast."""
+    batch = record_batch(rows, columns)
+    if batch is not None:
+        batch = convert_batch(batch)
+    if batch is None:
+        return prepare_rows(rows)
+    return batch
+
+
+def batch_rows(batch):
+    return list(zip(*(array.to_pylist() for array in batch.columns)))
+
+
+def csv_data(batch):
+    # NULLs come out as unquoted empty fields, which COPY's CSV format reads as NULL
+    sink = pa.BufferOutputStream()
+    pyarrow.csv.write_csv(batch, sink, write_options=CSV_WRITE_OPTIONS)
+    return sink.getvalue().to_pybytes()
+
+
+class ColumnarWriter(BatchWriter):
+    """Loads batches into PostgreSQL as Arrow RecordBatches instead of rows.
+
+    prepare() turns the rows into one RecordBatch and casts whole columns
+    (Decimals) with Arrow compute; write_prepared() has Arrow render the
+    batch as CSV and COPYs it. Batches Arrow can't type or render, and
+    batches COPY rejects, go through the PostgresBatchWriter's own row
+    path. MongoDB and Neo4j take lists of dicts, which an Arrow batch
+    would only have to be turned back into, so they keep their row
+    writers.
+    """
+
+    def __init__(self, writer):
+        super().__init__(writer.table_name, writer.columns, writer.batch_size)
+        self.writer = writer
+        self.connection_errors = writer.connection_errors
+        self.retry_errors = writer.retry_errors
+        if writer.preparer is not None:
+            # RecordBatches pickle as Arrow IPC buffers, so they cross to and from transform processes cheaply
+            self.preparer = partial(prepare_batch, self.columns, writer.preparer)
+
+    def prepare(self, rows):
+        return prepare_batch(self.columns, self.writer.prepare, rows)
+
+    def write_prepared(self, payload):
+        if not isinstance(payload, pa.RecordBatch):
+            return self.writer.write_prepared(payload)
+        try:
+            data = csv_data(payload)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            data = None  # Binary columns have no CSV form
+        if data is not None and self.writer.copy_csv(data):
+            return payload.num_rows
+        return self.writer.write_prepared(batch_rows(payload))
+
+    def delete(self, keys):
+        return self.writer.delete(keys)
@@ -0,0 +1,60 @@
+from functools import partial
+
+
+def documents(columns, plan, rows):
+    """Rows converted by plan as dicts keyed by columns: the MongoDB and Neo4j writers' payload."""
+    return [dict(zip(columns, row)) for row in plan.apply(rows)]
+
+
+def _dispatch(converters, value):
+    convert = converters.get(type(value))
+    return value if convert is None else convert(value)
+
+
+class ConversionPlan:
+    """Per-column value conversion for a writer, compiled once instead of decided per value.
+
+    ``converter_for(column, value_type)`` returns the callable that converts
+    values of that type for the target, or None when they pass through
+    unchanged. The first batch fixes a converter per column; columns whose
+    values never need one are left alone entirely, and the others are
+    converted a whole column at a time with map(). Each batch only checks
+    which types every column holds, so a type showing up later (say after a
+    run of NULLs) recompiles just that column.
+    """
+
+    def __init__(self, columns, converter_for):
+        self.columns = list(columns)
+        self.converter_for = converter_for
+        self.types = [set() for _ in self.columns]
+        self.converters = [None] * len(self.columns)
+
+    def compile_column(self, index, value_types):
+        self.types[index] |= value_types
+        column = self.columns[index]
+        converters = {value_type: self.converter_for(column, value_type) for value_type in self.types[index]}
+        active = {value_type: convert for value_type, convert in converters.items() if convert is not None}
+        if not active:
+            self.converters[index] = None
+        elif len(converters) == 1:
+            self.converters[index] = next(iter(active.values()))
+        else:
+            self.converters[index] = partial(_dispatch, active)
+
+    def apply(self, rows):
+        """Return rows (tuples ordered like columns) with every value converted; rows come back as tuples."""
+        if not rows:
+            return rows
+        values = list(zip(*rows))
+        for index, column_values in enumerate(values):
+            value_types = set(map(type, column_values))
+            if not value_types <= self.types[index]:
+                self.compile_column(index, value_types)
+        converted = False
+        for index, convert in enumerate(self.converters):
+            if convert is not None:
+                values[index] = map(convert, values[index])
+                converted = True
+        if not converted:
+            return rows
+        return list(zip(*values))
@@ -0,0 +1,254 @@
+from functools import partial
+
+from migration import get_backend
+from migration.batching import merge_streams
+
+
+class Databases:
+    """Connections to the databases configured in db.ini.
+
+    Connections are opened on first use, so a job only connects to the
+    backends it touches. Connections passed in are borrowed: close() leaves
+    them open for their owner. With ``connect=False`` only borrowed
+    connections are used, and a backend without one raises
+    ConnectionError, so nothing is left open for the caller to close. One
+    instance must not be shared between threads; give every worker its own.
+    """
+
+    def __init__(self, config, pg_conn=None, mongo_client=None, neo4j_driver=None, connect=True):
+        self.config = config
+        self.pg_conn = pg_conn
+        self.mongo_client = mongo_client
+        self.neo4j_driver = neo4j_driver
+        self.connect = connect
+        self.owned = []
+
+    def get_setting(self, db_name, key, fallback):
+        # Optional tuning keys (batch_size, ...) live in the db.ini section of each database
+        section = db_name.lower()
+        if self.config and self.config.has_section(section):
+            if isinstance(fallback, bool):
+                return self.config.getboolean(section, key, fallback=fallback)
+            if isinstance(fallback, str):
+                return self.config.get(section, key, fallback=fallback)
+            return self.config.getint(section, key, fallback=fallback)
+        return fallback
+
+    def connection(self, db_name):
+        """Return the pg connection, Mongo database or Neo4j driver for db_name."""
+        db_name = db_name.lower()
+        backend = get_backend(db_name)
+        if not self.connect and self.current_connection(db_name) is None:
+            raise ConnectionError(f"{db_name} is not connected")
+        if db_name == "postgresql":
+            if self.pg_conn is None:
+                self.pg_conn = backend.open_connection(self.config['postgresql'])
+                self.owned.append(self.pg_conn)
+            return self.pg_conn
+        elif db_name == "mongodb":
+            if self.mongo_client is None:
+                self.mongo_client = backend.open_connection(self.config['mongodb'])
+                self.owned.append(self.mongo_client)
+            return self.mongo_client[self.config['mongodb']['database']]
+        else:  # Neo4j
+            if self.neo4j_driver is None:
+                self.neo4j_driver = backend.open_connection(self.config['neo4j'])
+                self.owned.append(self.neo4j_driver)
+            return self.neo4j_driver
+
+    def current_connection(self, db_name):
+        if db_name == "postgresql":
+            return self.pg_conn
+        elif db_name == "mongodb":
+            return self.mongo_client
+        else:  # Neo4j
+            return self.neo4j_driver
+
+    def close(self):
+        for conn in self.owned:
+            conn.close()
+        self.owned = []
+
+    def get_schema(self, db_name, table_name):
+        return get_backend(db_name).get_schema(self.connection(db_name), table_name)
+
+    def get_row_count(self, db_name, table_name, key=None, after_key=None):
+        # after_key comes serialized, as stored by the checkpoint store
+        backend = get_backend(db_name)
+        if after_key is not None:
+            after_key = backend.load_key(after_key)
+        return backend.get_row_count(self.connection(db_name), table_name, key, after_key)
+
+    def create_target_table(self, db_name, table_name, columns):
+        db_name = db_name.lower()
+        if db_name == "postgresql":
+            get_backend(db_name).create_table(self.connection(db_name), table_name, columns)
+        elif db_name == "mongodb":
+            get_backend(db_name).create_collection(self.connection(db_name), table_name)
+        elif db_name == "neo4j":
+            pass  # Neo4j doesn't require explicit label creation
+        else:
+            raise ValueError(f"Unsupported database type: {db_name}")
+
+    def create_upsert_index(self, db_name, table_name, key):
+        get_backend(db_name).create_upsert_index(self.connection(db_name), table_name, key)
+
+    def create_writer(self, db_name, table_name, columns, upsert_key=None):
+        db_name = db_name.lower()
+        backend = get_backend(db_name)
+        batch_size = self.get_setting(db_name, 'batch_size', None)
+        if db_name == "postgresql":
+            writer = backend.PostgresBatchWriter(self.connection(db_name), table_name, columns, batch_size=batch_size,
+                                                 upsert_key=upsert_key)
+        elif db_name == "mongodb":
+            writer = backend.MongoBatchWriter(self.connection(db_name)[table_name], columns, batch_size=batch_size,
+                                              upsert_key=upsert_key)
+        else:  # Neo4j
+            writer = backend.Neo4jBatchWriter(self.connection(db_name), table_name, columns, batch_size=batch_size,
+                                              upsert_key=upsert_key)
+        if db_name == "postgresql" and self.get_setting(db_name, 'columnar', False):
+            # Needs pyarrow, so it is only imported when enabled
+            from migration.columnar import ColumnarWriter
+            writer = ColumnarWriter(writer)
+        return writer
+
+    def stream_data(self, db_name, table_name, columns, batch_size):
+        db_name = db_name.lower()
+        if db_name == "postgresql":
+            return self.stream_postgresql_data(table_name, columns, batch_size)
+        elif db_name == "mongodb":
+            return self.stream_mongodb_data(table_name, columns, batch_size)
+        elif db_name == "neo4j":
+            backend = get_backend(db_name)
+            fetch_size = self.get_setting(db_name, 'fetch_size', backend.DEFAULT_FETCH_SIZE)
+            return backend.stream_nodes(self.connection(db_name), table_name, columns, batch_size, fetch_size)
+        else:
+            raise ValueError(f"Unsupported database type: {db_name}")
+
+    def get_change_key(self, db_name, table_name):
+        """Return the source column that identifies a row in its change events."""
+        db_name = db_name.lower()
+        if db_name == "mongodb":
+            return '_id'
+        elif db_name == "postgresql":
+            key = get_backend(db_name).get_primary_key(self.connection(db_name), table_name)
+            if key is None:
+                raise ValueError(f"{table_name} needs a single-column primary key for change capture")
+            return key[0]
+        raise ValueError(f"Change capture is not supported for {db_name} sources")
+
+    def stream_changes(self, db_name, table_name, position=None):
+        """Yield ``(changes, position)`` micro-batches of source changes, starting after position.
+
+        Positions come and go serialized with the backend's dump_key.
+        """
+        db_name = db_name.lower()
+        backend = get_backend(db_name)
+        if position is not None:
+            position = backend.load_key(position)
+        max_batch = self.get_setting(db_name, 'cdc_batch_size', backend.DEFAULT_CHANGE_BATCH_SIZE)
+        max_wait_ms = self.get_setting(db_name, 'cdc_max_wait_ms', backend.DEFAULT_CHANGE_WAIT_MS)
+        replication_conn = None
+        if db_name == "mongodb":
+            changes = backend.stream_changes(self.connection(db_name)[table_name], position, max_batch, max_wait_ms)
+        elif db_name == "postgresql":
+            # Logical decoding runs on its own replication connection; the slot is created on the regular one
+            key = self.get_change_key(db_name, table_name)
+            backend.check_replica_identity(self.connection(db_name), table_name)
+            slot_name = self.get_setting(db_name, 'replication_slot', backend.replication_slot_name(table_name))
+            backend.create_replication_slot(self.connection(db_name), slot_name)
+            replication_conn = backend.open_replication_connection(self.config['postgresql'])
+            changes = backend.stream_changes(replication_conn, table_name, key, slot_name, position, max_batch, max_wait_ms)
+        else:
+            raise ValueError(f"Change capture is not supported for {db_name} sources")
+        try:
+            for batch, position in changes:
+                yield batch, backend.dump_key(position) if position is not None else None
+        finally:
+            changes.close()
+            if replication_conn is not None:
+                replication_conn.close()
+
+    def drop_change_capture(self, db_name, table_name):
+        """Release what change capture keeps on the source: PostgreSQL's replication slot.
+
+        MongoDB change streams hold nothing on the server between runs.
+        """
+        db_name = db_name.lower()
+        if db_name == "postgresql":
+            backend = get_backend(db_name)
+            slot_name = self.get_setting(db_name, 'replication_slot', backend.replication_slot_name(table_name))
+            backend.drop_replication_slot(self.connection(db_name), slot_name)
+
+    def stream_mongodb_data(self, collection_name, columns, batch_size):
+        # read_partitions > 1 reads _id ranges through parallel cursors
+        backend = get_backend("mongodb")
+        collection = self.connection("mongodb")[collection_name]
+        cursor_batch_size = self.get_setting("mongodb", 'cursor_batch_size', backend.DEFAULT_CURSOR_BATCH_SIZE)
+        no_cursor_timeout = self.get_setting("mongodb", 'no_cursor_timeout', True)
+        partitions = self.get_setting("mongodb", 'read_partitions', 1)
+        ranges = backend.plan_id_ranges(collection, partitions) if partitions > 1 else [{}]
+        streams = [partial(backend.stream_documents, collection, columns, batch_size,
+                           cursor_batch_size, no_cursor_timeout, query) for query in ranges]
+        if len(streams) > 1:
+            return merge_streams(streams, partitions)
+        return streams[0]()
+
+    def stream_postgresql_data(self, table_name, columns, batch_size):
+        # read_partitions > 1 reads key/ctid ranges or partitions on parallel connections
+        partitions = self.get_setting("postgresql", 'read_partitions', 1)
+        if partitions > 1:
+            ranges = get_backend("postgresql").plan_read_ranges(self.connection("postgresql"), table_name, partitions)
+            if len(ranges) > 1:
+                streams = [partial(self.stream_postgresql_range, relation, columns, batch_size, where, params)
+                           for relation, where, params in ranges]
+                yield from merge_streams(streams, partitions)
+                return
+        yield from self.stream_postgresql_range(table_name, columns, batch_size)
+
+    def stream_postgresql_range(self, table_name, columns, batch_size, where=None, params=None, key=None, after_key=None):
+        # Stream on a dedicated connection so writer commits on pg_conn can't close the cursor
+        backend = get_backend("postgresql")
+        itersize = self.get_setting("postgresql", 'itersize', backend.DEFAULT_ITERSIZE)
+        conn = backend.open_connection(self.config['postgresql'])
+        try:
+            yield from backend.stream_rows(conn, table_name, columns, batch_size, itersize, where, params, key, after_key)
+        finally:
+            conn.close()
+
+    def stream_keyed(self, db_name, table_name, columns, batch_size, after_key=None, key=None):
+        """Stream in key order as ``(last_key, batch)`` pairs, resuming after after_key.
+
+        The key is the source's natural key (primary key, _id or node id)
+        unless a ``key`` column is given, as incremental runs do with their
+        watermark column. Keys are handed out already serialized with the
+        backend's dump_key. Returns None when the source can't be read in
+        natural key order: PostgreSQL tables without a single-column
+        primary key, or a source configured for parallel reads.
+        """
+        db_name = db_name.lower()
+        backend = get_backend(db_name)
+        if key is None and self.get_setting(db_name, 'read_partitions', 1) > 1:
+            return None
+        if after_key is not None:
+            after_key = backend.load_key(after_key)
+        if db_name == "postgresql":
+            if key is None:
+                primary_key = backend.get_primary_key(self.connection(db_name), table_name)
+                if primary_key is None:
+                    return None
+                key = primary_key[0]
+            batches = self.stream_postgresql_range(table_name, columns, batch_size, key=key, after_key=after_key)
+        elif db_name == "mongodb":
+            cursor_batch_size = self.get_setting(db_name, 'cursor_batch_size', backend.DEFAULT_CURSOR_BATCH_SIZE)
+            no_cursor_timeout = self.get_setting(db_name, 'no_cursor_timeout', True)
+            batches = backend.stream_documents(self.connection(db_name)[table_name], columns, batch_size,
+                                               cursor_batch_size, no_cursor_timeout, key=key or '_id', after_key=after_key)
+        elif db_name == "neo4j":
+            fetch_size = self.get_setting(db_name, 'fetch_size', backend.DEFAULT_FETCH_SIZE)
+            batches = backend.stream_nodes(self.connection(db_name), table_name, columns, batch_size, fetch_size,
+                                           key=key, keyed=True, after_key=after_key)
+        else:
+            raise ValueError(f"Unsupported database type: {db_name}")
+        # A batch holding only NULL keys has no key to resume from
+        return ((backend.dump_key(last_key) if last_key is not None else None, batch) for last_key, batch in batches)
@@ -0,0 +1,75 @@
+import json
+import os
+import re
+from datetime import datetime
+
+from migration.batching import BatchWriteError
+
+DEFAULT_DEAD_LETTER_DIR = 'dead_letters'
+
+
+def write_isolating(write, rows, offset=0, fatal=()):
+    """Write rows with write(rows), halving the batch on failure until the bad rows are isolated.
+
+    Returns ``(written, rejected)`` with rejected a list of ``(index, message)``
+    tuples. A failed write is expected to have rolled back; a
+    BatchWriteError already names the rejected rows of a write that kept
+    the others, so those are not retried. Exceptions in ``fatal`` (the
+    writer's connection_errors and retry_errors once retries are spent)
+    say nothing about the rows and are raised as they are. rows may be any
+    sliceable batch (lists, Arrow RecordBatches).
+    """
+    try:
+        return write(rows), []
+    except BatchWriteError as e:
+        return e.written, [(offset + index, message) for index, message in e.errors]
+    except fatal:
+        raise
+    except Exception as e:
+        if len(rows) <= 1:
+            return 0, [(offset + index, str(e)) for index in range(len(rows))]
+    middle = len(rows) // 2
+    written, rejected = write_isolating(write, rows[:middle], offset, fatal)
+    more_written, more_rejected = write_isolating(write, rows[middle:], offset + middle, fatal)
+    return written + more_written, rejected + more_rejected
+
+
+def row_at(columns, rows, index):
+    row = rows.slice(index, 1).to_pylist()[0] if hasattr(rows, 'slice') else rows[index]
+    return row if isinstance(row, dict) else dict(zip(columns, row))
+
+
+class DeadLetterFile:
+    """JSON Lines file of the rows a migration could not write, with their errors.
+
+    Each line holds the target, the row keyed by target column and the
+    error, so the rows can be fixed and replayed later. The file is only
+    created once the first row is rejected.
+    """
+
+    def __init__(self, directory, job):
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        name = f"{job.source_db}_{job.source_item}_to_{job.target_db}_{job.target_item}_{stamp}.jsonl"
+        self.path = os.path.abspath(os.path.join(directory, re.sub(r'[^\w.-]', '_', name)))
+        self.job = job
+        self.count = 0
+        self.file = None
+
+    def write(self, columns, rows, rejected):
+        if not rejected:
+            return
+        if self.file is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.file = open(self.path, 'a', encoding='utf-8')
+        for index, message in rejected:
+            record = {'target_db': self.job.target_db, 'target': self.job.target_item,
+                      'row': row_at(columns, rows, index), 'error': message}
+            # Values without a JSON form (datetimes, Decimals, ObjectIds) are written as strings
+            self.file.write(json.dumps(record, default=str) + '\n')
+        self.file.flush()
+        self.count += len(rejected)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
@@ -0,0 +1,81 @@
+import os
+
+try:
+    import psutil  # Optional: current memory on platforms without /proc
+except ImportError:
+    psutil = None
+
+# Rows per batch whose size is measured; the rest of the batch is extrapolated from them
+SIZE_SAMPLE_ROWS = 100
+
+
+def estimate_bytes(rows):
+    """Approximate size of a batch: its values as text, measured on a sample of rows.
+
+    RecordBatches report their Arrow buffer size instead.
+    """
+    if hasattr(rows, 'nbytes'):
+        return rows.nbytes
+    if not rows:
+        return 0
+    sample = rows[::max(1, len(rows) // SIZE_SAMPLE_ROWS)]
+    size = sum(len(str(value)) for row in sample for value in (row.values() if isinstance(row, dict) else row)
+               if value is not None)
+    return size * len(rows) // len(sample)
+
+
+def current_rss():
+    """Resident memory of this process in bytes now, or None where it can't be read."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def process_memory():
+    # What a transform process reports with every batch it converts
+    return os.getpid(), current_rss()
+
+
+class PeakMemory:
+    """Highest resident memory seen while one item runs, sampled once per batch.
+
+    The sample is this process's RSS plus the latest RSS reported by each
+    transform process. It is process memory during the item, not memory
+    owned by it: items migrated concurrently share the process, so each
+    one's peak includes the others'.
+    """
+
+    def __init__(self):
+        self.workers = {}
+        self.peak = None
+        self.sample()
+
+    def sample(self, worker=None):
+        if worker is not None and worker[0] != os.getpid() and worker[1] is not None:
+            self.workers[worker[0]] = worker[1]
+        rss = current_rss()
+        if rss is not None:
+            self.peak = max(self.peak or 0, rss + sum(self.workers.values()))
+
+
+def item_metrics(elapsed, rows, size, timings, round_trips, peak_memory):
+    """The throughput and stage-timing fields of a MigrationReport row.
+
+    timings maps the read/transform/write stages to seconds; round_trips
+    counts the batches read plus every write call, retries included;
+    peak_memory is PeakMemory.peak.
+    """
+    return {
+        'rows_per_second': rows / elapsed if elapsed else 0.0,
+        'bytes': size,
+        'bytes_per_second': size / elapsed if elapsed else 0.0,
+        'extract_time': timings.get('read', 0.0),
+        'convert_time': timings.get('transform', 0.0),
+        'load_time': timings.get('write', 0.0),
+        'round_trips': round_trips,
+        'peak_memory': peak_memory
+    }
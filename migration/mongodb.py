@@ -0,0 +1,301 @@
+import json
+import time
+import urllib.parse
+from datetime import date, datetime
+from decimal import Decimal
+from functools import partial
+
+import pymongo
+from bson import Decimal128, ObjectId, json_util
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError, ConnectionFailure
+
+from migration.batching import CONNECTION_ERRORS, BatchWriter, BatchWriteError, chunked
+from migration.conversion import ConversionPlan, documents
+from migration.replication import Change
+
+DEFAULT_CURSOR_BATCH_SIZE = 1000
+# Server sessions expire after 30 idle minutes even for no-timeout cursors
+SESSION_REFRESH_INTERVAL = 5 * 60
+DEFAULT_CHANGE_BATCH_SIZE = 1000
+DEFAULT_CHANGE_WAIT_MS = 1000
+
+
+def connection_url(section):
+    if section['host'] == 'localhost' or section['host'].startswith('127.0.0.1'):
+        # Local connection
+        return f"mongodb://{section['host']}:{section['port']}/{section['database']}"
+    # Remote connection
+    return f"mongodb+srv://{section['user']}:{urllib.parse.quote_plus(section['password'])}@{section['host']}/{section['database']}?retryWrites=true&w=majority"
+
+
+def open_connection(section):
+    return pymongo.MongoClient(connection_url(section))
+
+
+def list_collections(db):
+    return sorted(db.list_collection_names())
+
+
+def get_schema(db, collection_name):
+    sample_doc = db[collection_name].find_one()
+    return [(key, type(value).__name__) for key, value in sample_doc.items()]
+
+
+def get_row_count(db, collection_name, key=None, after_key=None):
+    if key is not None and after_key is not None:
+        return db[collection_name].count_documents({key: {'$gt': after_key}})
+    return db[collection_name].count_documents({})
+
+
+def create_collection(db, collection_name):
+    if collection_name not in db.list_collection_names():
+        db.create_collection(collection_name)
+
+
+def create_upsert_index(db, collection_name, key):
+    if key != '_id':
+        db[collection_name].create_index([(key, pymongo.ASCENDING)], unique=True)
+
+
+def convert_for_mongodb(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    elif isinstance(obj, datetime):
+        return obj
+    elif isinstance(obj, date):
+        return date_to_datetime(obj)
+    return obj
+
+
+def date_to_datetime(value):
+    # BSON has no date-only type
+    return datetime.combine(value, datetime.min.time())
+
+
+def mongodb_converter(column, value_type):
+    """ConversionPlan converter for values of value_type: convert_for_mongodb's rules, decided per type."""
+    if issubclass(value_type, Decimal):
+        return float
+    if issubclass(value_type, date) and not issubclass(value_type, datetime):
+        return date_to_datetime
+    return None
+
+
+def batch_write_error(error, count):
+    """Translate a pymongo BulkWriteError into a BatchWriteError."""
+    details = error.details
+    errors = [(write_error['index'], write_error.get('errmsg', '')) for write_error in details.get('writeErrors', [])]
+    written = details.get('nInserted', 0) + details.get('nMatched', 0) + details.get('nUpserted', 0)
+    return BatchWriteError(f"{len(errors)} of {count} documents rejected", written=written, errors=errors)
+
+
+class MongoBatchWriter(BatchWriter):
+    """Inserts each batch with one unordered insert_many.
+
+    Unordered inserts keep going past rejected documents; those are
+    reported back through BatchWriteError with their index in the batch.
+    With an ``upsert_key`` every document replaces the one with the same key
+    through an unordered bulk_write instead.
+    """
+
+    # ConnectionFailure covers AutoReconnect, NetworkTimeout and server selection timeouts
+    connection_errors = CONNECTION_ERRORS + (ConnectionFailure,)
+
+    def __init__(self, collection, columns, batch_size=None, upsert_key=None):
+        super().__init__(collection.name, columns, batch_size)
+        self.collection = collection
+        self.upsert_key = upsert_key
+        self.plan = ConversionPlan(self.columns, mongodb_converter)
+        self.preparer = partial(documents, self.columns, self.plan)
+
+    def prepare(self, rows):
+        return self.preparer(rows)
+
+    def write_prepared(self, documents):
+        if not documents:
+            return 0
+
+        try:
+            if self.upsert_key is not None:
+                requests = [ReplaceOne({self.upsert_key: doc.get(self.upsert_key)}, doc, upsert=True) for doc in documents]
+                result = self.collection.bulk_write(requests, ordered=False)
+                return result.matched_count + result.upserted_count
+            result = self.collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            raise batch_write_error(e, len(documents)) from e
+        return len(result.inserted_ids)
+
+    def delete(self, keys):
+        if not keys:
+            return 0
+        return self.collection.delete_many({self.upsert_key: {'$in': list(keys)}}).deleted_count
+
+
+def dump_key(key):
+    return json_util.dumps(key)
+
+
+def load_key(text):
+    return json_util.loads(text)
+
+
+def stream_documents(collection, columns, batch_size, cursor_batch_size=DEFAULT_CURSOR_BATCH_SIZE, no_cursor_timeout=True,
+                     query=None, key=None, after_key=None):
+    """Yield lists of up to batch_size documents from one find() cursor.
+
+    With no_cursor_timeout the cursor survives slow writers, but its server
+    session still expires, so the session is refreshed while streaming and
+    the cursor is always closed explicitly. Atlas shared tiers reject
+    no_cursor_timeout; set it to false in db.ini there. columns=None returns
+    whole documents, _id included; ``query`` restricts the scan to one range
+    from plan_id_ranges.
+
+    With a ``key`` field the scan runs in key order, starts after
+    ``after_key`` and yields ``(last_key, documents)`` pairs instead.
+    Range queries only match one BSON type, so the key's values should
+    share one.
+    """
+    query = dict(query or {})
+    if key is not None and after_key is not None:
+        query[key] = {'$gt': after_key}
+    if columns is None:
+        projection = None
+    else:
+        projection = {col: 1 for col in columns}
+        projection['_id'] = 0  # Exclude the _id field
+        if key is not None:
+            projection[key] = 1
+    client = collection.database.client
+    with client.start_session() as session:
+        cursor = collection.find(query, projection, batch_size=cursor_batch_size,
+                                 no_cursor_timeout=no_cursor_timeout, session=session)
+        if key is not None:
+            cursor = cursor.sort(key, pymongo.ASCENDING)
+            if key != '_id':
+                # Without an index on key the server sorts in memory, which fails past 100MB
+                cursor = cursor.allow_disk_use(True)
+        last_refresh = time.monotonic()
+        try:
+            for batch in chunked(cursor, batch_size):
+                if key is None:
+                    yield batch
+                else:
+                    keys = [document[key] for document in batch if document.get(key) is not None]
+                    # Hand out the same documents as an unkeyed scan
+                    if columns is not None and (key not in columns or key == '_id'):
+                        for document in batch:
+                            document.pop(key, None)
+                    yield (keys[-1] if keys else None), batch
+                if no_cursor_timeout and time.monotonic() - last_refresh > SESSION_REFRESH_INTERVAL:
+                    client.admin.command('refreshSessions', [session.session_id])
+                    last_refresh = time.monotonic()
+        finally:
+            cursor.close()
+
+
+def change_key_value(value):
+    # ObjectIds have no equivalent in the other backends; they're keyed by their hex string there
+    return str(value) if isinstance(value, ObjectId) else value
+
+
+def change_value(value):
+    """A change document's field value in a form the PostgreSQL and Neo4j writers take.
+
+    ObjectIds become their hex string, as COPY writes them in a full
+    migration, and embedded documents become JSON text; lists keep their
+    items, converted the same way.
+    """
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, dict):
+        return json.dumps(value, default=str)
+    if isinstance(value, list):
+        return [change_value(item) for item in value]
+    if isinstance(value, Decimal128):
+        return value.to_decimal()
+    return value
+
+
+def stream_changes(collection, resume_token=None, max_batch=DEFAULT_CHANGE_BATCH_SIZE, max_wait_ms=DEFAULT_CHANGE_WAIT_MS):
+    """Tail a collection's change stream and yield ``(changes, resume_token)`` micro-batches.
+
+    A batch closes after max_batch events or once max_wait_ms passed since
+    its first event. While the collection is idle an empty batch is still
+    yielded every max_wait_ms, so the caller can stop and keep the advancing
+    resume token. Updates carry the document as looked up after the change;
+    a document deleted in the meantime is left to its own delete event.
+    The stream ends when it is invalidated (collection dropped or renamed).
+    Change streams need a replica set; a single-node one works.
+    """
+    with collection.watch(full_document='updateLookup', resume_after=resume_token,
+                          max_await_time_ms=max_wait_ms) as stream:
+        invalidated = False
+        while stream.alive and not invalidated:
+            changes = []
+            deadline = None
+            while len(changes) < max_batch:
+                event = stream.try_next()
+                if event is None:
+                    if deadline is None or time.monotonic() >= deadline:
+                        break
+                    continue
+                if deadline is None:
+                    deadline = time.monotonic() + max_wait_ms / 1000
+                operation = event['operationType']
+                if operation in ('insert', 'update', 'replace'):
+                    document = event.get('fullDocument')
+                    if document is not None:
+                        key = change_key_value(event['documentKey']['_id'])
+                        document = {field: change_value(value) for field, value in document.items()}
+                        changes.append(Change('upsert', key, dict(document, _id=key)))
+                elif operation == 'delete':
+                    changes.append(Change('delete', change_key_value(event['documentKey']['_id']), None))
+                elif operation == 'invalidate':
+                    invalidated = True
+                    break
+                if time.monotonic() >= deadline:
+                    break
+            yield changes, stream.resume_token
+
+
+def plan_id_ranges(collection, parts, samples_per_part=100):
+    """Split a collection into _id ranges that can be read concurrently.
+
+    Split points are quantiles of a $sample of _ids. Query operators only
+    match _ids of the split points' BSON type, so the first range is written
+    as "not >= first split point". That range also catches every _id of
+    another type, and the ranges together still cover the collection once.
+    Returns a list of find() filters.
+    """
+    pipeline = [{'$sample': {'size': parts * samples_per_part}}, {'$project': {'_id': 1}}, {'$sort': {'_id': 1}}]
+    sample = [doc['_id'] for doc in collection.aggregate(pipeline)]
+    points = []
+    for i in range(1, parts):
+        point = sample[len(sample) * i // parts] if sample else None
+        if point is not None and (not points or point != points[-1]):
+            points.append(point)
+    if not points or len({type(point) for point in points}) > 1:
+        return [{}]
+
+    ranges = [{'_id': {'$not': {'$gte': points[0]}}}]
+    for low, high in zip(points, points[1:]):
+        ranges.append({'_id': {'$gte': low, '$lt': high}})
+    ranges.append({'_id': {'$gte': points[-1]}})
+    return ranges
+
+
+def get_field_names(collection):
+    """Return every top-level field name used in the collection.
+
+    Fields of the first document come first, in document order, followed
+    by the rest sorted by name.
+    """
+    first = collection.find_one()
+    if first is None:
+        return []
+    pipeline = [{'$project': {'fields': {'$objectToArray': '$$ROOT'}}},
+                {'$unwind': '$fields'},
+                {'$group': {'_id': '$fields.k'}}]
+    fields = {doc['_id'] for doc in collection.aggregate(pipeline, allowDiskUse=True)}
+    return list(first.keys()) + sorted(fields - set(first.keys()))
@@ -0,0 +1,206 @@
+import json
+from decimal import Decimal
+from functools import partial
+
+import neo4j.time
+from neo4j import GraphDatabase, READ_ACCESS
+from neo4j.exceptions import ServiceUnavailable, SessionExpired, TransientError
+
+from migration.batching import CONNECTION_ERRORS, BatchWriter
+from migration.conversion import ConversionPlan, documents
+
+DEFAULT_FETCH_SIZE = 1000
+
+
+def open_connection(section):
+    return GraphDatabase.driver(section['url'], auth=(section['user'], section['password']))
+
+
+def list_labels(driver):
+    with driver.session(default_access_mode=READ_ACCESS) as session:
+        return sorted(record["label"] for record in session.run("CALL db.labels()"))
+
+
+def get_schema(driver, label):
+    with driver.session() as session:
+        result = session.run(f"MATCH (n:`{label}`) RETURN n LIMIT 1")
+        sample_node = result.single()['n']
+        return [(key, type(value).__name__) for key, value in sample_node.items()]
+
+
+def get_row_count(driver, label, key=None, after_key=None):
+    with driver.session() as session:
+        if key is not None and isinstance(after_key, list):
+            # A [value, id(n)] key from stream_nodes: nodes sharing the value continue past the id
+            after_key, after_id = after_key
+            result = session.run(f"MATCH (n:`{label}`) WHERE n.`{key}` >= $after AND (n.`{key}` > $after OR id(n) > $after_id) "
+                                 f"RETURN COUNT(n) AS count", after=after_key, after_id=after_id)
+        elif key is not None and after_key is not None:
+            result = session.run(f"MATCH (n:`{label}`) WHERE n.`{key}` > $after RETURN COUNT(n) AS count", after=after_key)
+        else:
+            result = session.run(f"MATCH (n:`{label}`) RETURN COUNT(n) AS count")
+        return result.single()['count']
+
+
+def create_upsert_index(driver, label, key):
+    # MERGE on an unindexed property scans the whole label for every row
+    with driver.session() as session:
+        session.run(f"CREATE INDEX IF NOT EXISTS FOR (n:`{label}`) ON (n.`{key}`)").consume()
+
+
+def custom_decimal_conversion(value):
+    if isinstance(value, Decimal):
+        return decimal_to_number(value)
+    return value
+
+
+def decimal_to_number(value):
+    if value.as_tuple().exponent >= 0:  # It's an integer
+        return int(value)
+    else:
+        return float(value)
+
+
+def neo4j_converter(column, value_type):
+    """ConversionPlan converter for values of value_type: only Decimals need one."""
+    return decimal_to_number if issubclass(value_type, Decimal) else None
+
+
+class Neo4jBatchWriter(BatchWriter):
+    """Creates one node per row with UNWIND inside a managed write transaction.
+
+    Neo4j holds the whole transaction state in heap, so it defaults to much
+    smaller batches than the other writers. With an ``upsert_key`` nodes are
+    MERGEd on that property instead of created.
+    """
+
+    default_batch_size = 1000
+    connection_errors = CONNECTION_ERRORS + (ServiceUnavailable, SessionExpired)
+    retry_errors = (TransientError,)
+
+    def __init__(self, driver, label, columns, batch_size=None, upsert_key=None):
+        super().__init__(label, columns, batch_size)
+        self.driver = driver
+        self.upsert_key = upsert_key
+        self.plan = ConversionPlan(self.columns, neo4j_converter)
+        self.preparer = partial(documents, self.columns, self.plan)
+        if upsert_key is None:
+            self.query = f"UNWIND $rows AS row CREATE (n:`{label}`) SET n = row"
+        else:
+            self.query = f"UNWIND $rows AS row MERGE (n:`{label}` {{`{upsert_key}`: row.`{upsert_key}`}}) SET n = row"
+
+    def prepare(self, rows):
+        return self.preparer(rows)
+
+    def write_prepared(self, params):
+        if not params:
+            return 0
+
+        with self.driver.session() as session:
+            session.execute_write(self.create_nodes, params)
+        return len(params)
+
+    def create_nodes(self, tx, rows):
+        tx.run(self.query, rows=rows).consume()
+
+    def delete(self, keys):
+        if not keys:
+            return 0
+        query = (f"UNWIND $keys AS key MATCH (n:`{self.table_name}` {{`{self.upsert_key}`: key}}) "
+                 f"DETACH DELETE n RETURN count(n) AS deleted")
+        with self.driver.session() as session:
+            return session.execute_write(self.delete_nodes, query, [custom_decimal_conversion(key) for key in keys])
+
+    def delete_nodes(self, tx, query, keys):
+        return tx.run(query, keys=keys).single()['deleted']
+
+
+def dump_key(key):
+    return json.dumps([key_json(part) for part in key] if isinstance(key, list) else key_json(key))
+
+
+def key_json(key):
+    # Temporal property values are not JSON; keep their type so load_key can rebuild them
+    if hasattr(key, 'iso_format'):
+        return {'$neo4j': type(key).__name__, 'value': key.iso_format()}
+    return key
+
+
+def load_key(text):
+    key = json.loads(text)
+    return [json_key(part) for part in key] if isinstance(key, list) else json_key(key)
+
+
+def json_key(key):
+    if isinstance(key, dict) and '$neo4j' in key:
+        return getattr(neo4j.time, key['$neo4j']).from_iso_format(key['value'])
+    return key
+
+
+def stream_nodes(driver, label, columns, batch_size, fetch_size=DEFAULT_FETCH_SIZE, key=None, keyed=False, after_key=None):
+    """Yield pages of node property dicts, paging by id(n) instead of SKIP.
+
+    Each page runs in its own short read transaction, so no transaction
+    has to stay open for the whole label. With columns=None the full
+    property map of every node is returned.
+
+    With keyed=True pages yield ``(last_key, nodes)`` pairs and start after
+    ``after_key``. The key is id(n), or with a ``key`` property the list
+    ``[value, id(n)]``: nodes are paged by (property, id(n)), so resuming
+    from it continues among the nodes sharing that value instead of
+    skipping them. A bare value is accepted as after_key too (keys saved
+    before the id was kept) and resumes after every node holding it.
+    Nodes whose property is NULL or missing are never returned with a
+    ``key``; they have no place in its order.
+
+    Supports Neo4j 4.x and 5.x. id() is deprecated in 5.x but still
+    returned and comparable there; it is used because elementId() strings
+    have no usable range order. Both paging modes rely on id() (key paging
+    breaks ties with it), so a release without id() is not supported.
+    """
+    if columns is None:
+        props = "properties(n)"
+    else:
+        props = "n {" + ", ".join(f".`{col}`" for col in columns) + "}"
+    if key is None:
+        query = (f"MATCH (n:`{label}`) WHERE id(n) > $last_id "
+                 f"RETURN id(n) AS node_id, id(n) AS key, {props} AS props "
+                 f"ORDER BY id(n) LIMIT $limit")
+        last_id = -1 if after_key is None else after_key
+        last_key = after_key
+    else:
+        # One query per paging state, so every WHERE is a plain range the property index can seek on
+        returns = f"RETURN id(n) AS node_id, n.`{key}` AS key, {props} AS props ORDER BY n.`{key}`, id(n) LIMIT $limit"
+        first_query = f"MATCH (n:`{label}`) WHERE n.`{key}` IS NOT NULL {returns}"
+        after_query = f"MATCH (n:`{label}`) WHERE n.`{key}` > $last_key {returns}"
+        # Ties on the property continue by id(n)
+        next_query = (f"MATCH (n:`{label}`) WHERE n.`{key}` >= $last_key "
+                      f"AND (n.`{key}` > $last_key OR id(n) > $last_id) {returns}")
+        last_key, last_id = after_key if isinstance(after_key, list) else (after_key, None)
+
+    with driver.session(fetch_size=fetch_size, default_access_mode=READ_ACCESS) as session:
+        while True:
+            if key is not None:
+                query = first_query if last_key is None else after_query if last_id is None else next_query
+            records = session.execute_read(read_page, query, last_id, last_key, batch_size)
+            if not records:
+                break
+            last_id, last_key, _ = records[-1]
+            batch = [props for _, _, props in records]
+            if keyed:
+                yield (last_key if key is None else [last_key, last_id]), batch
+            else:
+                yield batch
+            if len(records) < batch_size:
+                break
+
+
+def read_page(tx, query, last_id, last_key, limit):
+    result = tx.run(query, last_id=last_id, last_key=last_key, limit=limit)
+    return [(record['node_id'], record['key'], record['props']) for record in result]
+
+
+def get_property_keys(driver, label):
+    with driver.session(default_access_mode=READ_ACCESS) as session:
+        result = session.run(f"MATCH (n:`{label}`) UNWIND keys(n) AS key RETURN DISTINCT key")
+        return [record['key'] for record in result]
@@ -0,0 +1,154 @@
+import queue
+import threading
+import time
+from collections import deque
+
+from migration.batching import STREAM_DONE
+
+DEFAULT_PIPELINE_DEPTH = 4
+
+STAGES = ("read", "transform", "write")
+
+
+class Pipeline:
+    """Overlaps reading, transforming and writing batches.
+
+    The reader and the transform stage each run on their own thread and
+    hand batches on through bounded queues, so the source is read ahead by
+    at most ``depth`` batches per queue while the consumer of ``batches()``
+    (the write stage) is busy. Every stage accumulates the time spent in
+    its own work; stats() also reports how many batches are waiting in
+    front of the transform and write stages. Exceptions in the reader or
+    the transform are re-raised in the consumer.
+
+    With a ``pool`` (a ProcessPoolExecutor) the transform runs there
+    instead, on up to ``depth`` batches at once; each batch travels as one
+    pickle, and results are still passed on in source order. transform
+    must then be picklable.
+    """
+
+    def __init__(self, source, transform, depth=DEFAULT_PIPELINE_DEPTH, pool=None):
+        self.source = source
+        self.transform = transform
+        self.depth = depth
+        self.pool = pool
+        self.read_queue = queue.Queue(maxsize=depth)
+        self.transform_queue = queue.Queue(maxsize=depth)
+        self.timings = dict.fromkeys(STAGES, 0.0)
+        self.counts = dict.fromkeys(STAGES, 0)
+        self.stop = threading.Event()
+
+    def stats(self):
+        return {
+            'queued': {'transform': self.read_queue.qsize(), 'write': self.transform_queue.qsize()},
+            'timings': dict(self.timings),
+            'batches': dict(self.counts),
+        }
+
+    def put(self, target, item):
+        while not self.stop.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def get(self, source):
+        while not self.stop.is_set():
+            try:
+                return source.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return STREAM_DONE
+
+    def read(self):
+        batches = iter(self.source)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    batch = next(batches)
+                except StopIteration:
+                    break
+                self.timings['read'] += time.perf_counter() - start
+                self.counts['read'] += 1
+                if not self.put(self.read_queue, batch):
+                    return
+            self.put(self.read_queue, STREAM_DONE)
+        except Exception as e:
+            self.put(self.read_queue, e)
+        finally:
+            close = getattr(batches, 'close', None)
+            if close is not None:
+                close()
+
+    def run_transform(self):
+        while True:
+            item = self.get(self.read_queue)
+            if item is STREAM_DONE or isinstance(item, Exception):
+                self.put(self.transform_queue, item)
+                return
+            start = time.perf_counter()
+            try:
+                item = self.transform(item)
+            except Exception as e:
+                self.put(self.transform_queue, e)
+                return
+            self.timings['transform'] += time.perf_counter() - start
+            self.counts['transform'] += 1
+            if not self.put(self.transform_queue, item):
+                return
+
+    def run_pool_transform(self):
+        pending = deque()
+        try:
+            while True:
+                item = self.get(self.read_queue)
+                if item is STREAM_DONE or isinstance(item, Exception):
+                    break
+                pending.append(self.pool.submit(self.transform, item))
+                if len(pending) >= self.depth and not self.forward(pending.popleft()):
+                    return
+            while pending:
+                if not self.forward(pending.popleft()):
+                    return
+            self.put(self.transform_queue, item)
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def forward(self, future):
+        # Transform time here is the time spent waiting on the pool
+        start = time.perf_counter()
+        try:
+            item = future.result()
+        except Exception as e:
+            self.put(self.transform_queue, e)
+            return False
+        self.timings['transform'] += time.perf_counter() - start
+        self.counts['transform'] += 1
+        return self.put(self.transform_queue, item)
+
+    def batches(self):
+        """Yield transformed batches; the time until the next one is requested counts as write time."""
+        transform = self.run_transform if self.pool is None else self.run_pool_transform
+        threads = [threading.Thread(target=self.read, daemon=True),
+                   threading.Thread(target=transform, daemon=True)]
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                item = self.transform_queue.get()
+                if item is STREAM_DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                start = time.perf_counter()
+                yield item
+                self.timings['write'] += time.perf_counter() - start
+                self.counts['write'] += 1
+        finally:
+            self.stop.set()
+            for thread in threads:
+                thread.join()
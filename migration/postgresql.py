@@ -0,0 +1,539 @@
+import io
+import json
+import re
+import select
+import time
+import uuid
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+import psycopg2
+import psycopg2.extras
+
+from migration.batching import CONNECTION_ERRORS, BatchWriter, chunked
+from migration.conversion import ConversionPlan
+from migration.replication import Change
+
+DEFAULT_ITERSIZE = 2000
+DEFAULT_CHANGE_BATCH_SIZE = 1000
+DEFAULT_CHANGE_WAIT_MS = 1000
+
+
+def open_connection(section):
+    return psycopg2.connect(
+        host=section['host'],
+        port=section['port'],
+        database=section['database'],
+        user=section['user'],
+        password=section['password'],
+        client_encoding='utf8'
+    )
+
+
+def open_replication_connection(section):
+    return psycopg2.connect(
+        host=section['host'],
+        port=section['port'],
+        database=section['database'],
+        user=section['user'],
+        password=section['password'],
+        connection_factory=psycopg2.extras.LogicalReplicationConnection
+    )
+
+
+def list_tables(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT table_name FROM information_schema.tables WHERE table_schema = 'public' ORDER BY table_name ASC")
+        return [row[0] for row in cur.fetchall()]
+
+
+def get_schema(conn, table_name):
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT column_name, data_type
+            FROM information_schema.columns
+            WHERE table_name = %s
+            ORDER BY ordinal_position
+        """, (table_name,))
+        return cur.fetchall()
+
+
+def get_primary_key(conn, table_name):
+    """Return (column, data_type) of the table's single-column primary key, or None."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT kcu.column_name, c.data_type
+            FROM information_schema.table_constraints tc
+            JOIN information_schema.key_column_usage kcu
+              ON kcu.constraint_name = tc.constraint_name
+             AND kcu.table_schema = tc.table_schema
+             AND kcu.table_name = tc.table_name
+            JOIN information_schema.columns c
+              ON c.table_schema = kcu.table_schema
+             AND c.table_name = kcu.table_name
+             AND c.column_name = kcu.column_name
+            WHERE tc.table_name = %s AND tc.constraint_type = 'PRIMARY KEY'
+        """, (table_name,))
+        key_columns = cur.fetchall()
+    if len(key_columns) == 1:
+        return key_columns[0]
+    return None
+
+
+def get_split_key(conn, table_name):
+    """Return the table's single-column integer primary key, or None."""
+    key = get_primary_key(conn, table_name)
+    if key is not None and key[1] in ('smallint', 'integer', 'bigint'):
+        return key[0]
+    return None
+
+
+def get_child_tables(conn, table_name):
+    """Return the partitions of a declaratively partitioned table."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s AND parent.relkind = 'p'
+            ORDER BY child.relname
+        """, (table_name,))
+        return [row[0] for row in cur.fetchall()]
+
+
+def plan_read_ranges(conn, table_name, parts):
+    """Split a table into ranges that can be read concurrently.
+
+    Returns a list of ``(relation, where, params)``. Partitions of a
+    partitioned table are used as they are; otherwise the table is cut on
+    its integer primary key, or on ctid block ranges when it has none. The
+    last key or block range is left open so rows added meanwhile are read.
+    ctid ranges need PostgreSQL 14's TID range scans; on older servers each
+    range would scan the whole table, so such tables are read as one range.
+    """
+    try:
+        return split_table(conn, table_name, parts)
+    finally:
+        # Planning only reads; don't leave the (possibly shared) connection idle in a transaction
+        conn.rollback()
+
+
+def split_table(conn, table_name, parts):
+    children = get_child_tables(conn, table_name)
+    if children:
+        return [(child, None, None) for child in children]
+
+    with conn.cursor() as cur:
+        split_key = get_split_key(conn, table_name)
+        if split_key is not None:
+            cur.execute(f'SELECT MIN("{split_key}"), MAX("{split_key}") FROM "{table_name}"')
+            low, high = cur.fetchone()
+            column = f'"{split_key}"'
+        elif conn.server_version < 140000:
+            return [(table_name, None, None)]
+        else:
+            cur.execute("SELECT pg_relation_size(quote_ident(%s)::regclass) / current_setting('block_size')::bigint",
+                        (table_name,))
+            low, high = 0, cur.fetchone()[0]
+            column = 'ctid'
+    if low is None or high - low < parts:
+        return [(table_name, None, None)]
+
+    step = -(-(high - low + 1) // parts)
+    bounds = [low + i * step for i in range(parts)]
+    if column == 'ctid':
+        bounds = [f"({block},0)" for block in bounds]
+        condition = "ctid >= %s::tid"
+        upper = "ctid < %s::tid"
+    else:
+        condition = f"{column} >= %s"
+        upper = f"{column} < %s"
+
+    ranges = []
+    for i, start in enumerate(bounds):
+        if i + 1 < len(bounds):
+            ranges.append((table_name, f"{condition} AND {upper}", (start, bounds[i + 1])))
+        else:
+            ranges.append((table_name, condition, (start,)))
+    return ranges
+
+
+def get_row_count(conn, table_name, key=None, after_key=None):
+    # With key/after_key only rows past that key are counted (incremental runs)
+    with conn.cursor() as cur:
+        if key is not None and after_key is not None:
+            cur.execute(f'SELECT COUNT(*) FROM "{table_name}" WHERE "{key}" > %s', (after_key,))
+        else:
+            cur.execute(f'SELECT COUNT(*) FROM "{table_name}"')
+        return cur.fetchone()[0]
+
+
+def table_definition(table_name, columns):
+    columns_def = []
+    for col in columns:
+        if isinstance(col, tuple) and len(col) == 2:
+            col_name, data_type = col
+        elif isinstance(col, str):
+            col_name = col
+            data_type = 'TEXT'  # Default to TEXT if type is not specified
+        else:
+            raise ValueError(f"Unexpected column format: {col}")
+
+        if data_type == 'DateTime':
+            col_type = 'TIMESTAMP WITH TIME ZONE'
+        elif data_type == 'float':
+            col_type = 'DOUBLE PRECISION'
+        elif data_type == 'int':
+            col_type = 'INTEGER'
+        else:
+            col_type = 'TEXT'
+
+        columns_def.append(f'"{col_name}" {col_type}')
+    return f'CREATE TABLE IF NOT EXISTS "{table_name}" ({", ".join(columns_def)})'
+
+
+def create_table(conn, table_name, columns):
+    with conn.cursor() as cur:
+        cur.execute(table_definition(table_name, columns))
+    conn.commit()
+
+
+def create_upsert_index(conn, table_name, key):
+    # ON CONFLICT needs a unique index on the upsert key
+    with conn.cursor() as cur:
+        cur.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "{table_name}_{key}_upsert_key" ON "{table_name}" ("{key}")')
+    conn.commit()
+
+
+def convert_for_postgresql(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    # Neo4j temporal types (DateTime, Date, Time) all expose to_native()
+    if hasattr(obj, 'to_native'):
+        return native_value(obj)
+    return obj
+
+
+def native_value(obj):
+    obj = obj.to_native()
+    # Make it timezone-aware if it's not
+    if isinstance(obj, datetime) and obj.tzinfo is None:
+        obj = obj.replace(tzinfo=timezone.utc)
+    return obj
+
+
+def json_text(value):
+    # Nested documents land in TEXT/json/jsonb columns as JSON, never as a Python repr
+    return json.dumps(value, default=str)
+
+
+def postgresql_converter(column, value_type):
+    """ConversionPlan converter for values of value_type: convert_for_postgresql's rules, decided per type."""
+    if issubclass(value_type, Decimal):
+        return float
+    if issubclass(value_type, dict):
+        return json_text
+    if hasattr(value_type, 'to_native'):
+        return native_value
+    return None
+
+
+def text_value(value):
+    """The text PostgreSQL stores for a non-null value written to a TEXT column.
+
+    It reads the way execute_values' literals do, so every write path
+    gives a TEXT column the same contents (true/false for booleans). Lists
+    raise ValueError: whether they are arrays or JSON depends on the
+    target column.
+    """
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return '\\x' + bytes(value).hex()
+    if isinstance(value, dict):
+        return json_text(value)
+    if isinstance(value, (list, tuple)):
+        raise ValueError("PostgreSQL text has no form for lists")
+    return str(value)
+
+
+def copy_text_value(value):
+    """Format a value for COPY ... FROM STDIN in PostgreSQL text format.
+
+    A list's ValueError sends its batch through execute_values instead.
+    """
+    if value is None:
+        return '\\N'
+    text = text_value(value)
+    return (text.replace('\\', '\\\\')
+                .replace('\t', '\\t')
+                .replace('\n', '\\n')
+                .replace('\r', '\\r'))
+
+
+class PostgresBatchWriter(BatchWriter):
+    """Loads batches through COPY FROM STDIN, one commit per batch.
+
+    If COPY rejects a batch that execute_values then accepts, the data holds
+    values the text format cannot express and COPY is switched off for the
+    rest of the run. With an ``upsert_key`` rows go through INSERT ... ON
+    CONFLICT instead, which needs the unique index from create_upsert_index.
+    """
+
+    connection_errors = CONNECTION_ERRORS + (psycopg2.OperationalError, psycopg2.InterfaceError)
+    # Deadlocks and serialization failures; checked before connection_errors, as they subclass OperationalError
+    retry_errors = (psycopg2.extensions.TransactionRollbackError,)
+
+    def __init__(self, conn, table_name, columns, batch_size=None, use_copy=True, upsert_key=None):
+        super().__init__(table_name, columns, batch_size)
+        self.conn = conn
+        self.upsert_key = upsert_key
+        self.use_copy = use_copy and upsert_key is None
+        self.plan = ConversionPlan(self.columns, postgresql_converter)
+        self.preparer = self.plan.apply
+        columns_str = ", ".join(f'"{col}"' for col in self.columns)
+        self.copy_query = f'COPY "{table_name}" ({columns_str}) FROM STDIN'
+        self.insert_query = f'INSERT INTO "{table_name}" ({columns_str}) VALUES %s'
+        if upsert_key is not None:
+            updates = ", ".join(f'"{col}" = EXCLUDED."{col}"' for col in self.columns if col != upsert_key)
+            action = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+            self.insert_query += f' ON CONFLICT ("{upsert_key}") {action}'
+
+    def prepare(self, rows):
+        return self.plan.apply(rows)
+
+    def write_prepared(self, rows):
+        if not rows:
+            return 0
+
+        if self.use_copy:
+            try:
+                self.copy_rows(rows)
+                self.conn.commit()
+                return len(rows)
+            except (psycopg2.Error, ValueError):
+                self.conn.rollback()
+
+        try:
+            self.insert_rows(rows)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        self.use_copy = False
+        return len(rows)
+
+    def delete(self, keys):
+        if not keys:
+            return 0
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute(f'DELETE FROM "{self.table_name}" WHERE "{self.upsert_key}" = ANY(%s)',
+                            ([convert_for_postgresql(key) for key in keys],))
+                deleted = cur.rowcount
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return deleted
+
+    def copy_csv(self, data):
+        """COPY one batch already rendered as header-less CSV bytes; False if COPY is off or rejected it."""
+        if not self.use_copy:
+            return False
+        try:
+            with self.conn.cursor() as cur:
+                cur.copy_expert(self.copy_query + " WITH (FORMAT csv)", io.BytesIO(data))
+            self.conn.commit()
+            return True
+        except psycopg2.Error:
+            self.conn.rollback()
+            return False
+
+    def copy_rows(self, rows):
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write('\t'.join(copy_text_value(val) for val in row))
+            buffer.write('\n')
+        buffer.seek(0)
+        with self.conn.cursor() as cur:
+            cur.copy_expert(self.copy_query, buffer)
+
+    def insert_rows(self, rows):
+        with self.conn.cursor() as cur:
+            psycopg2.extras.execute_values(cur, self.insert_query, rows, page_size=len(rows))
+
+
+def dump_key(key):
+    return json.dumps(key, default=str)
+
+
+def load_key(text):
+    return json.loads(text)
+
+
+def stream_rows(conn, table_name, columns, batch_size, itersize=DEFAULT_ITERSIZE, where=None, params=None,
+                key=None, after_key=None):
+    """Yield lists of up to batch_size rows from a server-side cursor.
+
+    The named cursor pulls itersize rows per round trip, so client memory
+    stays bounded by the batch size whatever the table size. The cursor
+    lives in its own transaction, so conn should not be shared with a writer
+    that commits. ``where``/``params`` restrict the scan to one range from
+    plan_read_ranges.
+
+    With a ``key`` column the scan runs in key order, starts after
+    ``after_key`` and yields ``(last_key, rows)`` pairs instead; last_key is
+    the batch's last non-NULL key.
+    """
+    conditions = [where] if where else []
+    params = list(params or [])
+    select_columns = list(columns)
+    if key is not None:
+        select_columns.append(key)
+        if after_key is not None:
+            conditions.append(f'"{key}" > %s')
+            params.append(after_key)
+
+    columns_str = ", ".join(f'"{col}"' for col in select_columns)
+    query = f'SELECT {columns_str} FROM "{table_name}"'
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    if key is not None:
+        query += f' ORDER BY "{key}"'
+
+    cur = conn.cursor(name=f"graphmigrate_{uuid.uuid4().hex}")
+    cur.itersize = itersize
+    try:
+        cur.execute(query, params)
+        for batch in chunked(cur, batch_size):
+            if key is None:
+                yield batch
+            else:
+                keys = [row[-1] for row in batch if row[-1] is not None]
+                yield (keys[-1] if keys else None), [row[:-1] for row in batch]
+    finally:
+        cur.close()
+        conn.rollback()
+
+
+def replication_slot_name(table_name):
+    # Slot names only allow lower-case letters, digits and underscores
+    return re.sub(r'[^a-z0-9_]', '_', f"graphmigrate_{table_name}".lower())[:63]
+
+
+def create_replication_slot(conn, slot_name):
+    """Create a wal2json logical replication slot unless it already exists.
+
+    The slot is permanent: the server keeps WAL for it until it is dropped
+    with drop_replication_slot, even while replication is stopped.
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1 FROM pg_replication_slots WHERE slot_name = %s", (slot_name,))
+        if cur.fetchone() is None:
+            cur.execute("SELECT pg_create_logical_replication_slot(%s, 'wal2json')", (slot_name,))
+    conn.commit()
+
+
+def drop_replication_slot(conn, slot_name, wait_seconds=5):
+    """Drop the slot if it exists, releasing the WAL kept for it.
+
+    A just-closed replication connection can hold the slot for a moment
+    longer, so this waits up to wait_seconds for it to become inactive.
+    """
+    deadline = time.monotonic() + wait_seconds
+    with conn.cursor() as cur:
+        while True:
+            cur.execute("SELECT active FROM pg_replication_slots WHERE slot_name = %s", (slot_name,))
+            row = cur.fetchone()
+            conn.rollback()
+            if row is None:
+                return
+            if not row[0] or time.monotonic() >= deadline:
+                break
+            time.sleep(0.1)
+        cur.execute("SELECT pg_drop_replication_slot(%s)", (slot_name,))
+    conn.commit()
+
+
+def check_replica_identity(conn, table_name):
+    # Updates leave unchanged TOASTed columns out of the new row; only REPLICA IDENTITY FULL logs them in the old one
+    with conn.cursor() as cur:
+        cur.execute("SELECT relreplident FROM pg_class WHERE oid = quote_ident(%s)::regclass", (table_name,))
+        identity = cur.fetchone()[0]
+    conn.rollback()
+    if identity != 'f':
+        raise ValueError(f'Replicating {table_name} needs ALTER TABLE "{table_name}" REPLICA IDENTITY FULL, '
+                         f"or updates would overwrite unchanged large values with NULL")
+
+
+def decode_wal2json_value(data_type, value):
+    # wal2json sends numbers and booleans as JSON, decoded with Decimals so numeric keeps its precision;
+    # dates and timestamps arrive as text
+    if isinstance(value, Decimal) and data_type in ('real', 'double precision'):
+        return float(value)
+    if isinstance(value, str):
+        if data_type.startswith('timestamp'):
+            return datetime.fromisoformat(value)
+        if data_type == 'date':
+            return date.fromisoformat(value)
+    return value
+
+
+def decode_wal2json_row(columns):
+    return {column['name']: decode_wal2json_value(column['type'], column['value']) for column in columns}
+
+
+def stream_changes(conn, table_name, key, slot_name, start_lsn=None, max_batch=DEFAULT_CHANGE_BATCH_SIZE,
+                   max_wait_ms=DEFAULT_CHANGE_WAIT_MS):
+    """Consume a wal2json slot and yield ``(changes, lsn)`` micro-batches for one table.
+
+    conn must be a LogicalReplicationConnection. A batch closes after
+    max_batch row changes or max_wait_ms, empty or not. The yielded lsn is
+    the last commit seen so far; it is confirmed to the server when the
+    caller asks for the next batch, i.e. once the batch has been applied, so
+    the slot never drops changes that did not reach the target. Changes of a
+    transaction still open at the batch end are sent again after a restart.
+    Rows are keyed by ``key``, the table's single-column primary key; an
+    update that changes the key becomes a delete plus an upsert. Updates
+    take the columns wal2json leaves out (unchanged TOASTed values) from the
+    old row, so the table needs REPLICA IDENTITY FULL (check_replica_identity).
+    TRUNCATE is not replicated.
+    """
+    escaped_table = re.sub(r'([\\,.* ])', r'\\\1', table_name)
+    cur = conn.cursor()
+    try:
+        cur.start_replication(slot_name=slot_name, decode=True, start_lsn=start_lsn or 0,
+                              options={'format-version': '2', 'add-tables': f'*.{escaped_table}'})
+        last_commit = None
+        while True:
+            changes = []
+            deadline = time.monotonic() + max_wait_ms / 1000
+            while len(changes) < max_batch:
+                message = cur.read_message()
+                if message is None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    select.select([cur], [], [], remaining)
+                    continue
+                change = json.loads(message.payload, parse_float=Decimal)
+                action = change['action']
+                if action == 'C':
+                    last_commit = message.data_start
+                elif action in ('I', 'U'):
+                    row = decode_wal2json_row(change['columns'])
+                    if action == 'U' and change.get('identity'):
+                        old_row = decode_wal2json_row(change['identity'])
+                        if old_row.get(key) != row.get(key):
+                            changes.append(Change('delete', old_row.get(key), None))
+                        row = dict(old_row, **row)
+                    changes.append(Change('upsert', row.get(key), row))
+                elif action == 'D':
+                    changes.append(Change('delete', decode_wal2json_row(change['identity']).get(key), None))
+            yield changes, last_commit
+            if last_commit is not None:
+                cur.send_feedback(flush_lsn=last_commit)
+    finally:
+        cur.close()
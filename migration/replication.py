@@ -0,0 +1,37 @@
+"""Applying captured source changes to a target through the batch writers."""
+from collections import namedtuple
+
+# op is 'upsert' (document holds the full new row as a dict) or 'delete' (document is None)
+Change = namedtuple('Change', ['op', 'key', 'document'])
+
+
+def collapse_changes(changes):
+    """Reduce a micro-batch to the last change per key.
+
+    Returns ``(upserts, deletes)``: the documents to upsert and the keys to
+    delete. Upserts carry whole rows, so only the latest change of a key
+    matters, and the two lists never share a key.
+    """
+    latest = {}
+    for change in changes:
+        latest.pop(change.key, None)
+        latest[change.key] = change
+    upserts = [change.document for change in latest.values() if change.op == 'upsert']
+    deletes = [key for key, change in latest.items() if change.op == 'delete']
+    return upserts, deletes
+
+
+def apply_changes(writer, changes, source_columns):
+    """Write one micro-batch through an upserting writer; returns (upserted, deleted).
+
+    Documents are mapped to row tuples through source_columns, which line
+    up with the writer's columns. Deletes run first; with keys disjoint
+    that order doesn't change the result.
+    """
+    upserts, deletes = collapse_changes(changes)
+    deleted = writer.delete(deletes) if deletes else 0
+    upserted = 0
+    for start in range(0, len(upserts), writer.batch_size):
+        rows = [tuple(document.get(col) for col in source_columns) for document in upserts[start:start + writer.batch_size]]
+        upserted += writer.write(rows)
+    return upserted, deleted
@@ -0,0 +1,113 @@
+import threading
+import time
+from collections import Counter
+
+DEFAULT_REFRESH_RATE = 10  # Hz
+DEFAULT_MAX_ERROR_LINES = 200
+
+
+def _ignore(*args):
+    pass
+
+
+class Reporter:
+    """Coalesces a migration's progress and log callbacks for a slow consumer such as the GUI.
+
+    progress(done, total) keeps only the latest value and log(category,
+    message, level) queues the line; both are passed on at most
+    ``refresh_rate`` times a second, progress through ``on_progress`` and
+    the queued lines as one list through ``on_logs``. status(category,
+    message) is for lines that only matter until the next one (the
+    per-batch "Migrated x/y rows"): just the latest per category and key
+    is kept. Every line is counted by level, and ERROR lines beyond
+    ``max_error_lines`` are only counted, so the consumer's work no longer
+    grows with the number of rows. A line or progress value arriving within
+    the interval arms a timer thread that passes it on once the interval is
+    over, so nothing waits for a later call. Thread-safe; call close() at
+    the end to pass on whatever is still queued.
+    """
+
+    def __init__(self, on_progress=_ignore, on_logs=_ignore, refresh_rate=DEFAULT_REFRESH_RATE,
+                 max_error_lines=DEFAULT_MAX_ERROR_LINES):
+        self.on_progress = on_progress
+        self.on_logs = on_logs
+        self.interval = 1 / refresh_rate
+        self.max_error_lines = max_error_lines
+        self.lock = threading.Lock()
+        self.lines = []
+        self.statuses = {}
+        self.latest_progress = None
+        self.sent_progress = None
+        self.last_flush = 0.0
+        self.counts = Counter()
+        self.suppressed = 0
+        self.timer = None
+        self.closed = False
+
+    def progress(self, done, total):
+        with self.lock:
+            self.latest_progress = (done, total)
+            # The last update always gets through, so bars end at 100%
+            due = done >= total
+        self.flush_if_due(force=due)
+
+    def log(self, category, message, level="INFO"):
+        with self.lock:
+            self.counts[level] += 1
+            if level == "ERROR" and self.counts[level] > self.max_error_lines:
+                self.suppressed += 1
+            else:
+                self.lines.append((category, message, level))
+        self.flush_if_due()
+
+    def status(self, category, message, key=None):
+        # key separates the status lines of jobs sharing one reporter
+        with self.lock:
+            self.counts["INFO"] += 1
+            self.statuses[(category, key)] = (category, message)
+        self.flush_if_due()
+
+    def summary(self):
+        with self.lock:
+            counts = dict(self.counts)
+        return ", ".join(f"{counts.get(level, 0)} {level}" for level in ("ERROR", "WARN", "INFO", "DEBUG"))
+
+    def flush_if_due(self, force=False):
+        with self.lock:
+            wait = self.interval - (time.monotonic() - self.last_flush)
+            if not force and wait > 0:
+                if self.timer is None and not self.closed:
+                    self.timer = threading.Timer(wait, self.flush)
+                    self.timer.daemon = True
+                    self.timer.start()
+                return
+        self.flush()
+
+    def flush(self):
+        with self.lock:
+            if self.timer is not None:
+                # Whatever the timer was armed for goes out now
+                self.timer.cancel()
+                self.timer = None
+            self.last_flush = time.monotonic()
+            lines = [(category, message, "INFO") for category, message in self.statuses.values()] + self.lines
+            self.lines = []
+            self.statuses = {}
+            progress = self.latest_progress if self.latest_progress != self.sent_progress else None
+            self.sent_progress = self.latest_progress
+        # Callbacks run outside the lock so a slow consumer never holds up the other threads
+        if progress is not None:
+            self.on_progress(*progress)
+        if lines:
+            self.on_logs(lines)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            summary = self.summary()
+            with self.lock:
+                if self.suppressed:
+                    self.lines.append(("Migration", f"{self.suppressed} more errors were not shown "
+                                                    f"(only the first {self.max_error_lines} are logged)", "WARN"))
+                self.lines.append(("Migration", f"Log summary: {summary}", "INFO"))
+        self.flush()
@@ -0,0 +1,317 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import time
+from functools import partial
+
+from migration import transform_worker
+from migration.adaptive import create_controller
+from migration.batching import BatchWriteError
+from migration.deadletter import DEFAULT_DEAD_LETTER_DIR, DeadLetterFile, write_isolating
+from migration.metrics import PeakMemory, item_metrics
+from migration.pipeline import DEFAULT_PIPELINE_DEPTH, Pipeline
+from migration.scheduler import MigrationJob, result_label
+from migration.transform_worker import transform_batch
+
+# Times a write failing with one of the writer's retry_errors is repeated, and the pause before the first repeat
+WRITE_RETRIES = 3
+RETRY_BACKOFF_SECONDS = 0.5
+
+
+def _ignore(*args):
+    pass
+
+
+class Migration:
+    """Migrates one table/collection/label; the engine behind MigrationWorker and the CLI.
+
+    progress(done, total) and log(category, message, level) are plain
+    callables, so this runs with or without Qt; status(category, message)
+    gets the per-batch progress lines and defaults to log. run() never
+    raises: errors end up in error_message and the row counters, as the
+    report shows them.
+
+    A batch the target rejects is split in halves until the failing rows
+    are isolated, so the rest still lands in large batches; the failing
+    rows go to a JSON Lines file in dead_letter_dir (dead_letters.path).
+
+    With ``adaptive = true`` for the target, or a shared controller passed
+    in, batches are read at the controller's largest size and written in
+    chunks of its current batch size, so it can tune that size from each
+    write's latency and errors.
+
+    Throughput, stage times, round trips and peak memory are counted as the
+    batches go by and returned by report(), without querying the databases
+    again.
+    """
+
+    def __init__(self, databases, source_db, target_db, source_table, target_table, source_columns, target_columns,
+                 checkpoints=None, resume=False, watermark_column=None, upsert_key=None, progress=_ignore, log=_ignore,
+                 status=None, dead_letter_dir=DEFAULT_DEAD_LETTER_DIR, controller=None):
+        self.databases = databases
+        self.source_db = source_db
+        self.target_db = target_db
+        self.source_table = source_table
+        self.target_table = target_table
+        self.source_columns = source_columns
+        self.target_columns = target_columns
+        self.checkpoints = checkpoints
+        self.resume = resume
+        # Incremental runs read rows past the stored high-water mark of watermark_column and upsert on upsert_key
+        self.watermark_column = watermark_column
+        self.upsert_key = upsert_key
+        self.progress = progress
+        self.log = log
+        self.status = status if status is not None else (lambda category, message: log(category, message, "INFO"))
+        self.job = MigrationJob(source_db, target_db, source_table, target_table)
+        self.dead_letters = DeadLetterFile(dead_letter_dir, self.job)
+        self.controller = controller if controller is not None else create_controller(databases, target_db, log=log)
+        self.last_key = None
+        # Set once a batch lost rows that are not in the dead-letter file; the checkpoint then stays before it
+        self.checkpoint_held = False
+        self.pipeline = None
+        self.total_rows = 0
+        self.migrated_rows = 0
+        self.failed_rows = 0
+        self.error_message = ""
+        # This run's counters for report(); migrated_rows also includes rows a resumed run skips
+        self.rows_written = 0
+        self.bytes_written = 0
+        self.round_trips = 0
+        self.memory = PeakMemory()
+
+    def run(self):
+        try:
+            if self.watermark_column is not None:
+                self.migrate_incremental()
+            else:
+                self.migrate_full()
+        except Exception as e:
+            self.error_message = str(e)
+            self.failed_rows = self.total_rows - self.migrated_rows
+            self.log("Migration", f"Error during migration: {self.error_message}", "ERROR")
+        finally:
+            self.dead_letters.close()
+        if self.dead_letters.count:
+            self.log("Migration", f"{self.dead_letters.count} rejected rows written to {self.dead_letters.path}", "WARN")
+
+    def migrate_full(self):
+        self.total_rows = self.databases.get_row_count(self.source_db, self.source_table)
+        checkpoint = self.load_checkpoint()
+        if checkpoint is not None and checkpoint.done:
+            self.migrated_rows = checkpoint.rows_written
+            self.log("Migration", f"{self.source_db}.{self.source_table} was already migrated, skipping", "INFO")
+            return
+
+        writer = self.databases.create_writer(self.target_db, self.target_table, self.target_columns)
+        read_size = self.read_size(writer)
+        source_batches = None
+        if checkpoint is not None:
+            source_batches = self.databases.stream_keyed(self.source_db, self.source_table, self.source_columns,
+                                                         read_size, checkpoint.last_key)
+            if source_batches is None:
+                self.log("Migration", f"{self.source_db}.{self.source_table} cannot be read in key order, starting over", "WARN")
+            else:
+                self.migrated_rows = checkpoint.rows_written
+                self.log("Migration", f"Resuming migration of {self.source_db}.{self.source_table} after {self.migrated_rows}/{self.total_rows} rows", "INFO")
+
+        if source_batches is None:
+            self.log("Migration", f"Starting migration of {self.total_rows} rows from {self.source_db} to {self.target_db}", "INFO")
+            self.log("Migration", f"Creating target {self.target_db}.{self.target_table}", "INFO")
+            self.databases.create_target_table(self.target_db, self.target_table, self.target_columns)
+
+            self.log("Migration", f"Streaming data from {self.source_db}.{self.source_table}", "INFO")
+            if self.checkpoints is not None:
+                source_batches = self.databases.stream_keyed(self.source_db, self.source_table, self.source_columns, read_size)
+                if source_batches is None:
+                    self.log("Migration", f"No checkpoints for {self.source_db}.{self.source_table}: it cannot be read in key order", "INFO")
+            if source_batches is None:
+                batches = self.databases.stream_data(self.source_db, self.source_table, self.source_columns, read_size)
+                source_batches = ((None, batch) for batch in batches)
+        self.write_batches(writer, source_batches)
+
+        if self.checkpoints is not None and self.failed_rows == 0:
+            self.checkpoints.finish(self.job, self.migrated_rows)
+        self.log("Migration", f"Migration from {self.source_db} to {self.target_db} completed successfully", "INFO")
+
+    def migrate_incremental(self):
+        high_water = self.checkpoints.load_watermark(self.job, self.watermark_column) if self.checkpoints is not None else None
+        self.total_rows = self.databases.get_row_count(self.source_db, self.source_table, self.watermark_column, high_water)
+        if high_water is None:
+            self.log("Migration", f"No high-water mark for {self.source_db}.{self.source_table}.{self.watermark_column} yet, copying all rows", "INFO")
+        else:
+            self.log("Migration", f"Starting incremental migration of {self.total_rows} rows with {self.watermark_column} past {high_water}", "INFO")
+
+        target_key = self.target_columns[self.source_columns.index(self.upsert_key)]
+        self.log("Migration", f"Creating target {self.target_db}.{self.target_table} with upsert key {target_key}", "INFO")
+        self.databases.create_target_table(self.target_db, self.target_table, self.target_columns)
+        self.databases.create_upsert_index(self.target_db, self.target_table, target_key)
+
+        writer = self.databases.create_writer(self.target_db, self.target_table, self.target_columns, upsert_key=target_key)
+        source_batches = self.databases.stream_keyed(self.source_db, self.source_table, self.source_columns, self.read_size(writer),
+                                                     high_water, key=self.watermark_column)
+        self.write_batches(writer, source_batches)
+
+        # Only move the mark once every row up to it has landed, so a failed run is retried in full
+        if self.failed_rows == 0 and self.last_key is not None and self.checkpoints is not None:
+            self.checkpoints.save_watermark(self.job, self.watermark_column, self.last_key)
+            self.log("Migration", f"New high-water mark for {self.watermark_column}: {self.last_key}", "INFO")
+        self.log("Migration", f"Incremental migration from {self.source_db} to {self.target_db} completed successfully", "INFO")
+
+    def read_size(self, writer):
+        if self.controller is None:
+            return writer.batch_size
+        self.controller.start(writer)
+        return self.controller.max_batch_size
+
+    def write_rows(self, write, writer, rows, attempt=0):
+        # One round trip to the target; with a controller it also sees the latency and whether an error was the backend's load.
+        # Deadlocks and the like rolled the write back, so the rows are sent again after a growing pause,
+        # in batches of the size the controller has just cut to.
+        self.round_trips += 1
+        started = time.perf_counter()
+        try:
+            written = write(rows)
+        except writer.retry_errors as e:
+            self.record_write(rows, started, e, True)
+            if attempt >= WRITE_RETRIES:
+                raise
+            self.log("Migration", f"Retrying {len(rows)} rows for {self.target_table} after: {e}", "WARN")
+            time.sleep(RETRY_BACKOFF_SECONDS * 2 ** attempt)
+            return self.retry_rows(write, writer, rows, attempt + 1)
+        except Exception as e:
+            self.record_write(rows, started, e, isinstance(e, writer.connection_errors))
+            raise
+        self.record_write(rows, started)
+        return written
+
+    def retry_rows(self, write, writer, rows, attempt):
+        size = self.controller.batch_size if self.controller is not None else len(rows)
+        if size >= len(rows):
+            return self.write_rows(write, writer, rows, attempt)
+        # Smaller batches: the rows of each are isolated on their own, so rows already written are never sent twice
+        retry = partial(self.write_rows, write, writer, attempt=attempt)
+        fatal = writer.retry_errors + writer.connection_errors
+        written, rejected = 0, []
+        for start in range(0, len(rows), size):
+            batch_written, batch_rejected = write_isolating(retry, rows[start:start + size], start, fatal)
+            written += batch_written
+            rejected += batch_rejected
+        if rejected:
+            raise BatchWriteError(f"{len(rejected)} rows rejected", written, rejected)
+        return written
+
+    def record_write(self, rows, started, error=None, transient=False):
+        if self.controller is not None:
+            self.controller.record(len(rows), time.perf_counter() - started, error, transient)
+
+    def write_batch(self, writer, write, payload):
+        write = partial(self.write_rows, write, writer)
+        fatal = writer.retry_errors + writer.connection_errors
+        if self.controller is None:
+            return write_isolating(write, payload, fatal=fatal)
+        written, rejected, start = 0, [], 0
+        while start < len(payload):
+            size = self.controller.batch_size
+            chunk_written, chunk_rejected = write_isolating(write, payload[start:start + size], start, fatal)
+            written += chunk_written
+            rejected += chunk_rejected
+            start += size
+        return written, rejected
+
+    def load_checkpoint(self):
+        # A fresh run drops the old checkpoint; a resume picks it up
+        if self.checkpoints is None:
+            return None
+        if not self.resume:
+            self.checkpoints.clear(self.job)
+            return None
+        return self.checkpoints.load(self.job)
+
+    def result(self):
+        return result_label(self.total_rows, self.migrated_rows, self.failed_rows, self.error_message)
+
+    def report(self, elapsed):
+        """This run's row for MigrationReport."""
+        return {
+            'name': self.source_table,
+            'records': self.total_rows,
+            'result': self.result(),
+            'migrated': self.migrated_rows,
+            'failed': self.failed_rows,
+            'time': elapsed,
+            'error': self.error_message,
+            'dead_letters': self.dead_letters.path if self.dead_letters.count else "",
+            'batch_size': self.controller.batch_size if self.controller is not None else None,
+            'concurrency': self.controller.concurrency if self.controller is not None else None,
+            **self.metrics(elapsed)
+        }
+
+    def metrics(self, elapsed):
+        self.memory.sample()
+        if self.pipeline is None:
+            return item_metrics(elapsed, self.rows_written, self.bytes_written, {}, self.round_trips, self.memory.peak)
+        stats = self.pipeline.stats()
+        return item_metrics(elapsed, self.rows_written, self.bytes_written, stats['timings'],
+                            stats['batches']['read'] + self.round_trips, self.memory.peak)
+
+    def transform_pool(self, writer):
+        """A process pool for the transform stage when transform_processes is set for the target, else None."""
+        processes = self.databases.get_setting(self.target_db, 'transform_processes', 0)
+        if processes < 1:
+            return None
+        if writer.preparer is None:
+            self.log("Migration", f"The {self.target_db} writer can't convert batches in other processes; converting on a thread", "WARN")
+            return None
+        self.log("Migration", f"Converting batches in {processes} processes", "INFO")
+        # Forking a process that runs Qt and driver threads isn't safe. The plan is sent to each process
+        # once, through the initializer, rather than with every batch.
+        return ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=transform_worker.initialize, initargs=(self.source_columns, writer.preparer))
+
+    def write_batches(self, writer, source_batches):
+        # source_batches yields (last_key, batch); last_key is None when the source isn't read in key order
+        depth = self.databases.get_setting(self.source_db, 'pipeline_depth', DEFAULT_PIPELINE_DEPTH)
+        pool = self.transform_pool(writer)
+        try:
+            if pool is None:
+                self.pipeline = Pipeline(source_batches, partial(transform_batch, self.source_columns, writer.prepare), depth)
+            else:
+                self.pipeline = Pipeline(source_batches, transform_worker.transform, depth, pool)
+            self.write_pipeline(writer)
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+    def write_pipeline(self, writer):
+        done = self.migrated_rows
+        for last_key, count, size, memory, payload, error in self.pipeline.batches():
+            self.memory.sample(memory)
+            # After a conversion error payload holds the mapped rows, which are converted again per half
+            written, rejected = self.write_batch(writer, writer.write if error is not None else writer.write_prepared, payload)
+            self.migrated_rows += written
+            self.failed_rows += count - written
+            self.rows_written += written
+            self.bytes_written += size
+            for index, message in rejected:
+                self.log("Migration", f"Error migrating row {done + index + 1}: {message}", "ERROR")
+            if rejected:
+                self.dead_letters.write(self.target_columns, payload, rejected)
+            if written + len(rejected) < count and not self.checkpoint_held:
+                self.checkpoint_held = True
+                self.log("Migration", "Some failed rows could not be recorded; Resume will restart from the last complete batch", "WARN")
+
+            done += count
+            if last_key is not None:
+                self.last_key = last_key
+                # Only move past a batch whose rows all landed or are in the dead-letter file
+                if self.watermark_column is None and not self.checkpoint_held:
+                    self.checkpoints.save(self.job, last_key, self.migrated_rows)
+            self.progress(done, self.total_rows)
+            queued = self.pipeline.stats()['queued']
+            self.status("Migration", f"Migrated {done}/{self.total_rows} rows "
+                                     f"(queued for transform: {queued['transform']}, for write: {queued['write']})")
+
+        timings = self.pipeline.stats()['timings']
+        self.log("Migration", "Stage times: " + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items()), "INFO")
+        if self.controller is not None:
+            self.log("Adaptive", self.controller.summary(), "INFO")
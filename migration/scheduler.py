@@ -0,0 +1,107 @@
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+
+# Jobs touching the same backend beyond these counts queue up for a slot
+DEFAULT_CONCURRENCY = {"postgresql": 4, "mongodb": 4, "neo4j": 2}
+
+MigrationJob = namedtuple("MigrationJob", ["source_db", "target_db", "source_item", "target_item"])
+
+
+def result_label(total_rows, migrated_rows, failed_rows, error_message):
+    """The Result column of the migration report for one item."""
+    if failed_rows == 0 and not error_message:
+        return "OK"
+    elif migrated_rows == 0:
+        return "Fail"
+    else:
+        return f"Partially migrated ({migrated_rows}/{total_rows})"
+
+
+def failed_job_item(job, error):
+    """The report row for a job that raised before its migration counted any rows.
+
+    Records and failed are None: the row count is unknown, and 0 would
+    understate the report's totals.
+    """
+    return {'name': job.source_item, 'records': None, 'result': "Fail",
+            'migrated': 0, 'failed': None, 'time': 0, 'error': str(error)}
+
+
+class Limiter:
+    """A semaphore whose limit can change while jobs hold it.
+
+    Lowering the limit never interrupts a holder; new acquirers just wait
+    until enough holders have released.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.held = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            self.condition.wait_for(lambda: self.held < self.limit)
+            self.held += 1
+
+    def release(self):
+        with self.condition:
+            self.held -= 1
+            self.condition.notify()
+
+    def resize(self, limit):
+        with self.condition:
+            self.limit = max(1, limit)
+            self.condition.notify_all()
+
+
+class BackendLimits:
+    """Caps how many jobs may use each backend at the same time."""
+
+    def __init__(self, limits):
+        self.semaphores = {name.lower(): Limiter(limit) for name, limit in limits.items()}
+
+    def limit(self, name, fallback=1):
+        semaphore = self.semaphores.get(name.lower())
+        return fallback if semaphore is None else semaphore.limit
+
+    def resize(self, name, limit):
+        semaphore = self.semaphores.get(name.lower())
+        if semaphore is not None:
+            semaphore.resize(limit)
+
+    @contextmanager
+    def hold(self, *db_names):
+        # Acquire in a fixed order so two jobs can never wait on each other
+        names = sorted({name.lower() for name in db_names} & self.semaphores.keys())
+        acquired = []
+        try:
+            for name in names:
+                self.semaphores[name].acquire()
+                acquired.append(name)
+            yield
+        finally:
+            for name in reversed(acquired):
+                self.semaphores[name].release()
+
+
+def run_jobs(jobs, run_job, max_workers, limits):
+    """Run run_job(job) for every job on a bounded thread pool.
+
+    Yields ``(job, result, error)`` in completion order; error is the
+    exception raised by run_job, or None.
+    """
+    def guarded(job):
+        with limits.hold(job.source_db, job.target_db):
+            return run_job(job)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(guarded, job): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                yield job, future.result(), None
+            except Exception as e:
+                yield job, None, e
@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+
+from migration.adaptive import CONCURRENCY_INCREASE_AFTER, AdaptiveController
+from migration.scheduler import BackendLimits
+
+
+def controller(concurrency=4, limits=None, **kwargs):
+    adaptive = AdaptiveController("Neo4j", concurrency=concurrency, target_batch_ms=1000, limits=limits, **kwargs)
+    adaptive.start(SimpleNamespace(batch_size=1000))
+    return adaptive
+
+
+def test_start_takes_the_first_writers_batch_size():
+    adaptive = controller()
+    adaptive.start(SimpleNamespace(batch_size=50))
+    assert (adaptive.batch_size, adaptive.min_batch_size, adaptive.max_batch_size) == (1000, 100, 4000)
+
+
+def test_fast_writes_grow_the_batch_up_to_the_maximum():
+    adaptive = controller(max_batch_size=1200)
+    adaptive.record(1000, 0.1)
+    assert adaptive.batch_size == 1200
+    adaptive.record(1200, 0.1)
+    assert adaptive.batch_size == 1200
+
+
+def test_slow_writes_halve_the_batch_down_to_the_minimum():
+    adaptive = controller(min_batch_size=300)
+    adaptive.record(1000, 5.0)
+    assert adaptive.batch_size == 500
+    adaptive.record(500, 5.0)
+    assert adaptive.batch_size == 300
+
+
+def test_transient_errors_halve_batch_size_and_writers():
+    limits = BackendLimits({"neo4j": 4})
+    adaptive = controller(limits=limits)
+    adaptive.record(1000, 0.1, ConnectionError("lost"), transient=True)
+    assert (adaptive.batch_size, adaptive.concurrency) == (500, 2)
+    assert limits.limit("neo4j") == 2
+
+
+def test_data_errors_leave_the_settings_alone():
+    adaptive = controller()
+    adaptive.record(1000, 5.0, ValueError("bad row"))
+    assert (adaptive.batch_size, adaptive.concurrency) == (1000, 4)
+
+
+def test_a_run_of_on_target_writes_adds_a_writer_back():
+    limits = BackendLimits({"neo4j": 4})
+    adaptive = controller(limits=limits)
+    adaptive.record(1000, 0.1, ConnectionError("lost"), transient=True)
+    for _ in range(CONCURRENCY_INCREASE_AFTER):
+        adaptive.record(500, 0.1)
+    assert adaptive.concurrency == 3
+    assert limits.limit("neo4j") == 3
+
+
+def test_decreases_are_logged():
+    lines = []
+    adaptive = controller(log=lambda category, message, level: lines.append((category, message, level)))
+    adaptive.record(1000, 0.1)
+    adaptive.record(1250, 5.0)
+    assert lines == [("Adaptive", "neo4j: batch size 1250 -> 625, writers 4 -> 4 (1250 rows took 5.00s)", "INFO")]
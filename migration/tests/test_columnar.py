@@ -0,0 +1,75 @@
+from decimal import Decimal
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+
+from migration.batching import BatchWriter
+from migration.columnar import ColumnarWriter, batch_rows, prepare_batch, record_batch
+
+
+def test_record_batch_keeps_flat_columns():
+    batch = record_batch([(1, "a"), (None, "b")], ["id", "name"])
+    assert batch.schema.names == ["id", "name"]
+    assert batch_rows(batch) == [(1, "a"), (None, "b")]
+
+
+def test_nested_documents_stay_rows():
+    assert record_batch([({"x": 1},), ({"y": 2},)], ["doc"]) is None
+    assert record_batch([([1, 2],), ([3],)], ["items"]) is None
+
+
+def test_mixed_int_and_float_stay_rows():
+    assert record_batch([(1,), (1.5,)], ["value"]) is None
+
+
+def test_ints_beyond_int64_stay_rows():
+    assert record_batch([(2 ** 70,)], ["value"]) is None
+
+
+def test_prepare_batch_falls_back_to_the_row_path():
+    rows = [({"x": 1},), ({"y": 2},)]
+    assert prepare_batch(["doc"], lambda rows: ("rows", rows), rows) == ("rows", rows)
+
+
+def test_prepare_batch_casts_decimals_to_float():
+    batch = prepare_batch(["amount", "price"], None, [(Decimal("12"), Decimal("1.25"))])
+    assert batch.to_pylist() == [{"amount": 12.0, "price": 1.25}]
+
+
+class CopyWriter(BatchWriter):
+    # Stands in for PostgresBatchWriter: COPYs CSV unless rejecting it, else takes rows
+    def __init__(self, accept_csv=True):
+        super().__init__("target", ["id", "name", "active", "price"])
+        self.accept_csv = accept_csv
+        self.csv = []
+        self.rows = []
+
+    def prepare(self, rows):
+        return rows
+
+    def copy_csv(self, data):
+        if self.accept_csv:
+            self.csv.append(data)
+        return self.accept_csv
+
+    def write_prepared(self, rows):
+        self.rows.extend(rows)
+        return len(rows)
+
+
+ROWS = [(1, 'say "hi", then\nleave', True, Decimal("9.50")), (2, "", False, None)]
+
+
+def test_batches_are_copied_as_csv():
+    target = CopyWriter()
+    assert ColumnarWriter(target).write(ROWS) == 2
+    # Only NULLs are left unquoted, so COPY tells them from empty strings
+    assert target.csv == [b'"1","say ""hi"", then\nleave","true","9.5"\n"2","","false",\n']
+    assert target.rows == []
+
+
+def test_batches_copy_rejects_go_through_the_row_path():
+    target = CopyWriter(accept_csv=False)
+    assert ColumnarWriter(target).write(ROWS) == 2
+    assert target.rows == [(1, 'say "hi", then\nleave', True, 9.5), (2, "", False, None)]
@@ -0,0 +1,34 @@
+from decimal import Decimal
+
+from migration.conversion import ConversionPlan, documents
+
+
+def to_float(column, value_type):
+    return float if issubclass(value_type, Decimal) else None
+
+
+def test_rows_without_conversions_come_back_unchanged():
+    rows = [(1, "a"), (2, "b")]
+    assert ConversionPlan(["id", "name"], to_float).apply(rows) is rows
+
+
+def test_converts_only_the_columns_that_need_it():
+    plan = ConversionPlan(["id", "price"], to_float)
+    assert plan.apply([(1, Decimal("1.5")), (2, None)]) == [(1, 1.5), (2, None)]
+
+
+def test_type_appearing_after_nulls_recompiles_the_column():
+    plan = ConversionPlan(["id", "price"], to_float)
+    assert plan.apply([(1, None), (2, None)]) == [(1, None), (2, None)]
+    assert plan.converters[1] is None
+    assert plan.apply([(3, Decimal("2.25")), (4, None)]) == [(3, 2.25), (4, None)]
+
+
+def test_mixed_types_dispatch_per_value():
+    plan = ConversionPlan(["value"], lambda column, value_type: str if value_type is int else None)
+    assert plan.apply([(1,), ("a",), (None,)]) == [("1",), ("a",), (None,)]
+
+
+def test_documents_are_keyed_by_column():
+    plan = ConversionPlan(["id", "price"], to_float)
+    assert documents(["id", "price"], plan, [(1, Decimal("3"))]) == [{"id": 1, "price": 3.0}]
@@ -0,0 +1,65 @@
+import json
+from collections import namedtuple
+
+import pytest
+
+from migration.batching import BatchWriteError
+from migration.deadletter import DeadLetterFile, write_isolating
+
+
+def rejecting(bad, calls=None):
+    def write(rows):
+        if calls is not None:
+            calls.append(len(rows))
+        if any(row in bad for row in rows):
+            raise ValueError("bad row")
+        return len(rows)
+    return write
+
+
+def test_good_batch_is_written_in_one_call():
+    calls = []
+    assert write_isolating(rejecting(set(), calls), list(range(8))) == (8, [])
+    assert calls == [8]
+
+
+def test_bad_rows_are_isolated_with_their_index():
+    written, rejected = write_isolating(rejecting({2, 5}), list(range(8)), offset=100)
+    assert written == 6
+    assert rejected == [(102, "bad row"), (105, "bad row")]
+
+
+def test_batch_write_error_is_not_bisected():
+    calls = []
+
+    def write(rows):
+        calls.append(len(rows))
+        raise BatchWriteError("partial", written=3, errors=[(1, "duplicate")])
+
+    assert write_isolating(write, list(range(4))) == (3, [(1, "duplicate")])
+    assert calls == [4]
+
+
+def test_fatal_errors_are_raised_without_bisecting():
+    calls = []
+
+    def write(rows):
+        calls.append(len(rows))
+        raise ConnectionError("connection lost")
+
+    with pytest.raises(ConnectionError):
+        write_isolating(write, list(range(8)), fatal=(ConnectionError,))
+    assert calls == [8]
+
+
+def test_dead_letter_file_is_created_on_the_first_rejected_row(tmp_path):
+    Job = namedtuple("Job", ["source_db", "target_db", "source_item", "target_item"])
+    dead_letters = DeadLetterFile(str(tmp_path), Job("postgresql", "neo4j", "orders", "Order"))
+    dead_letters.write(["id", "name"], [(1, "a")], [])
+    assert dead_letters.file is None
+    dead_letters.write(["id", "name"], [(1, "a"), (2, "b")], [(1, "rejected")])
+    dead_letters.close()
+    with open(dead_letters.path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert records == [{"target_db": "neo4j", "target": "Order", "row": {"id": 2, "name": "b"}, "error": "rejected"}]
+    assert dead_letters.count == 1
@@ -0,0 +1,51 @@
+import neo4j.time
+
+from migration.neo4j import dump_key, load_key, stream_nodes
+
+# (node_id, key, props) for nodes of one label, in (key, id) order
+NODES = [(4, 1, {"n": "a"}), (7, 1, {"n": "b"}), (2, 2, {"n": "c"}), (9, 2, {"n": "d"}), (5, 3, {"n": "e"})]
+
+
+class FakeSession:
+    def __init__(self):
+        self.reads = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute_read(self, read_page, query, last_id, last_key, limit):
+        # Answers the key-paging queries like Neo4j would, and keeps which one was asked
+        self.reads.append((query, last_id, last_key))
+        if last_key is None:
+            rows = NODES
+        elif last_id is None:
+            rows = [node for node in NODES if node[1] > last_key]
+        else:
+            rows = [node for node in NODES if (node[1], node[0]) > (last_key, last_id)]
+        return rows[:limit]
+
+
+class FakeDriver:
+    def __init__(self):
+        self.session_ = FakeSession()
+
+    def session(self, **kwargs):
+        return self.session_
+
+
+def test_key_paging_resumes_among_nodes_sharing_the_key():
+    driver = FakeDriver()
+    pages = list(stream_nodes(driver, "Item", ["n"], 3, key="k", keyed=True))
+    assert pages[0] == ([2, 2], [{"n": "a"}, {"n": "b"}, {"n": "c"}])
+
+    resumed = list(stream_nodes(driver, "Item", ["n"], 3, key="k", keyed=True, after_key=load_key(dump_key(pages[0][0]))))
+    assert resumed == [([3, 5], [{"n": "d"}, {"n": "e"}])]
+    assert "id(n) > $last_id" in driver.session_.reads[-1][0]
+
+
+def test_temporal_keys_survive_the_checkpoint():
+    key = [neo4j.time.DateTime(2024, 5, 1, 12, 30), 42]
+    assert load_key(dump_key(key)) == key
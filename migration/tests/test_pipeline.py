@@ -0,0 +1,39 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from migration.pipeline import Pipeline
+
+
+def slow_double(batch):
+    # Later batches finish first, so ordering has to come from the pipeline
+    time.sleep(0.01 * (5 - batch[0]) if batch[0] < 5 else 0)
+    return [value * 2 for value in batch]
+
+
+def test_batches_come_out_transformed_in_source_order():
+    source = [[i, i] for i in range(20)]
+    assert list(Pipeline(source, slow_double, depth=2).batches()) == [[i * 2, i * 2] for i in range(20)]
+
+
+def test_pool_transform_keeps_source_order():
+    source = [[i] for i in range(20)]
+    with ThreadPoolExecutor(4) as pool:
+        assert list(Pipeline(source, slow_double, depth=4, pool=pool).batches()) == [[i * 2] for i in range(20)]
+
+
+def test_reader_errors_reach_the_consumer():
+    def source():
+        yield [1]
+        raise RuntimeError("read failed")
+
+    pipeline = Pipeline(source(), lambda batch: batch)
+    with pytest.raises(RuntimeError, match="read failed"):
+        list(pipeline.batches())
+
+
+def test_stats_count_every_stage():
+    pipeline = Pipeline([[1], [2], [3]], lambda batch: batch)
+    list(pipeline.batches())
+    assert pipeline.stats()['batches'] == {'read': 3, 'transform': 3, 'write': 3}
@@ -0,0 +1,65 @@
+from decimal import Decimal
+
+import psycopg2.extras
+from psycopg2.extensions import adapt
+
+from migration import postgresql
+from migration.postgresql import PostgresBatchWriter, plan_read_ranges
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def copy_expert(self, query, buffer):
+        self.conn.copied += buffer.read()
+
+
+class FakeConnection:
+    def __init__(self):
+        self.copied = ""
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+def literal_text(value):
+    # What a TEXT column holds after execute_values sends value as an SQL literal
+    literal = adapt(value).getquoted().decode()
+    if literal == 'NULL':
+        return '\\N'
+    return literal[1:-1].replace("''", "'") if literal.startswith("'") else literal
+
+
+def test_copy_and_execute_values_write_the_same_text(monkeypatch):
+    columns = ["flag", "off", "count", "price", "name", "doc", "missing"]
+    rows = [(True, False, 7, Decimal("1.50"), "it's", {"a": 1}, None)]
+    inserted = []
+    monkeypatch.setattr(psycopg2.extras, "execute_values",
+                        lambda cur, query, rows, page_size: inserted.extend(rows))
+
+    conn = FakeConnection()
+    PostgresBatchWriter(conn, "target", columns).write(rows)
+    PostgresBatchWriter(conn, "target", columns, use_copy=False).write(rows)
+
+    assert conn.copied.rstrip('\n').split('\t') == [literal_text(value) for value in inserted[0]]
+
+
+def test_planning_read_ranges_ends_its_transaction(monkeypatch):
+    monkeypatch.setattr(postgresql, "get_child_tables", lambda conn, table_name: ["orders_2023", "orders_2024"])
+    conn = FakeConnection()
+    assert plan_read_ranges(conn, "orders", 4) == [("orders_2023", None, None), ("orders_2024", None, None)]
+    assert conn.rollbacks == 1
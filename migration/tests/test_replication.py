@@ -0,0 +1,39 @@
+from migration.replication import Change, apply_changes, collapse_changes
+
+
+def test_last_change_per_key_wins():
+    changes = [Change('upsert', 1, {'id': 1, 'v': 'a'}),
+               Change('upsert', 2, {'id': 2, 'v': 'b'}),
+               Change('upsert', 1, {'id': 1, 'v': 'c'}),
+               Change('delete', 2, None)]
+    assert collapse_changes(changes) == ([{'id': 1, 'v': 'c'}], [2])
+
+
+def test_upsert_after_delete_keeps_the_row():
+    changes = [Change('delete', 1, None), Change('upsert', 1, {'id': 1})]
+    assert collapse_changes(changes) == ([{'id': 1}], [])
+
+
+class RecordingWriter:
+    batch_size = 2
+
+    def __init__(self):
+        self.written = []
+        self.deleted = []
+
+    def write(self, rows):
+        self.written.append(rows)
+        return len(rows)
+
+    def delete(self, keys):
+        self.deleted.extend(keys)
+        return len(keys)
+
+
+def test_apply_changes_maps_documents_through_the_source_columns():
+    writer = RecordingWriter()
+    changes = [Change('upsert', key, {'id': key, 'name': f"n{key}", 'extra': 0}) for key in range(3)]
+    changes.append(Change('delete', 9, None))
+    assert apply_changes(writer, changes, ['id', 'name']) == (3, 1)
+    assert writer.written == [[(0, 'n0'), (1, 'n1')], [(2, 'n2')]]
+    assert writer.deleted == [9]
@@ -0,0 +1,57 @@
+import time
+
+from migration.reporting import Reporter
+
+
+class Sink:
+    def __init__(self):
+        self.progress = []
+        self.lines = []
+
+    def reporter(self, **kwargs):
+        return Reporter(lambda done, total: self.progress.append((done, total)), self.lines.extend, **kwargs)
+
+
+def test_lines_within_the_interval_are_flushed_by_the_timer():
+    sink = Sink()
+    reporter = sink.reporter(refresh_rate=20)
+    for message in ("first", "second", "third"):
+        reporter.log("Migration", message)
+    assert [message for _, message, _ in sink.lines] == ["first"]
+    time.sleep(0.2)
+    assert [message for _, message, _ in sink.lines] == ["first", "second", "third"]
+    reporter.close()
+
+
+def test_status_keeps_only_the_latest_line_per_key():
+    sink = Sink()
+    reporter = sink.reporter(refresh_rate=1)
+    reporter.log("Migration", "start")
+    for done in range(3):
+        reporter.status("Migration", f"Migrated {done}", key="a")
+    reporter.status("Migration", "Migrated b", key="b")
+    reporter.flush()
+    assert [message for _, message, _ in sink.lines] == ["start", "Migrated 2", "Migrated b"]
+    reporter.close()
+
+
+def test_final_progress_always_gets_through():
+    sink = Sink()
+    reporter = sink.reporter(refresh_rate=1)
+    reporter.progress(1, 3)
+    reporter.progress(2, 3)
+    reporter.progress(3, 3)
+    assert sink.progress == [(1, 3), (3, 3)]
+    reporter.close()
+
+
+def test_errors_beyond_the_limit_are_only_counted():
+    sink = Sink()
+    reporter = sink.reporter(max_error_lines=2)
+    for i in range(5):
+        reporter.log("Migration", f"error {i}", "ERROR")
+    reporter.close()
+    messages = [message for _, message, _ in sink.lines]
+    assert messages[:2] == ["error 0", "error 1"]
+    assert "3 more errors were not shown (only the first 2 are logged)" in messages
+    assert messages[-1] == "Log summary: 5 ERROR, 0 WARN, 0 INFO, 0 DEBUG"
@@ -0,0 +1,187 @@
+import pytest
+from neo4j.exceptions import TransientError
+from psycopg2.extensions import TransactionRollbackError
+
+from migration import runner
+from migration.adaptive import AdaptiveController
+from migration.batching import BatchWriter, BatchWriteError
+from migration.neo4j import Neo4jBatchWriter
+from migration.postgresql import PostgresBatchWriter
+from migration.runner import Migration
+
+
+class FakeDatabases:
+    def __init__(self, rows, writer, batch_size=2, settings=None):
+        self.rows = rows
+        self.writer = writer
+        self.batch_size = batch_size
+        self.settings = settings or {}
+
+    def get_setting(self, db_name, key, fallback):
+        return self.settings.get(key, fallback)
+
+    def get_row_count(self, db_name, table_name):
+        return len(self.rows)
+
+    def create_writer(self, db_name, table_name, columns):
+        return self.writer
+
+    def create_target_table(self, db_name, table_name, columns):
+        pass
+
+    def stream_keyed(self, db_name, table_name, columns, batch_size, after_key=None):
+        for start in range(0, len(self.rows), self.batch_size):
+            batch = self.rows[start:start + self.batch_size]
+            yield batch[-1][0], batch
+
+
+class FakeCheckpoints:
+    def __init__(self):
+        self.saved = []
+        self.done = False
+
+    def clear(self, job):
+        pass
+
+    def save(self, job, last_key, rows_written):
+        self.saved.append(last_key)
+
+    def finish(self, job, rows_written):
+        self.done = True
+
+
+class ListWriter(BatchWriter):
+    def __init__(self, fail=lambda rows: None):
+        super().__init__("target", ["id", "name"], 2)
+        self.fail = fail
+        self.rows = []
+
+    def write_prepared(self, rows):
+        self.fail(rows)
+        self.rows.extend(rows)
+        return len(rows)
+
+    def write(self, rows):
+        return self.write_prepared(rows)
+
+
+ROWS = [(i, f"name {i}") for i in range(1, 7)]
+
+
+def migration(writer, tmp_path, checkpoints, controller=None, settings=None):
+    return Migration(FakeDatabases(ROWS, writer, settings=settings), "postgresql", "mongodb", "source", "target",
+                     ["id", "name"], ["id", "name"], checkpoints=checkpoints, dead_letter_dir=str(tmp_path),
+                     controller=controller)
+
+
+def test_bad_rows_are_dead_lettered_and_the_rest_migrated(tmp_path):
+    def fail(rows):
+        if (3, "name 3") in rows:
+            raise ValueError("bad row")
+
+    checkpoints = FakeCheckpoints()
+    run = migration(ListWriter(fail), tmp_path, checkpoints)
+    run.run()
+    assert (run.migrated_rows, run.failed_rows, run.dead_letters.count) == (5, 1, 1)
+    assert checkpoints.saved == [2, 4, 6]
+
+
+def test_lost_connection_fails_the_run_at_the_last_good_checkpoint(tmp_path):
+    writer = ListWriter()
+
+    def fail(rows):
+        if len(writer.rows) >= 2:
+            raise ConnectionError("connection lost")
+
+    writer.fail = fail
+    checkpoints = FakeCheckpoints()
+    run = migration(writer, tmp_path, checkpoints)
+    run.run()
+    assert run.error_message == "connection lost"
+    assert run.dead_letters.count == 0
+    assert checkpoints.saved == [2]
+    assert not checkpoints.done
+
+
+def test_unrecorded_failures_hold_the_checkpoint(tmp_path):
+    def fail(rows):
+        # Rejects a row without saying which, so it can't be dead-lettered
+        if (3, "name 3") in rows:
+            raise BatchWriteError("partial", written=len(rows) - 1)
+
+    checkpoints = FakeCheckpoints()
+    run = migration(ListWriter(fail), tmp_path, checkpoints)
+    run.run()
+    assert run.failed_rows == 1
+    assert checkpoints.saved == [2]
+
+
+def failing_first(error, times):
+    calls = []
+
+    def fail(rows):
+        calls.append(rows)
+        if len(calls) <= times:
+            raise error
+    return fail
+
+
+@pytest.mark.parametrize("backend, error", [
+    (PostgresBatchWriter, TransactionRollbackError("deadlock detected")),
+    (Neo4jBatchWriter, TransientError("Neo.TransientError.Transaction.DeadlockDetected")),
+])
+def test_deadlocks_are_retried(tmp_path, monkeypatch, backend, error):
+    monkeypatch.setattr(runner, "RETRY_BACKOFF_SECONDS", 0)
+    writer = ListWriter(failing_first(error, 2))
+    writer.connection_errors, writer.retry_errors = backend.connection_errors, backend.retry_errors
+    checkpoints = FakeCheckpoints()
+    run = migration(writer, tmp_path, checkpoints)
+    run.run()
+    assert not run.error_message
+    assert writer.rows == ROWS
+    assert checkpoints.done
+
+
+def test_retries_are_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(runner, "RETRY_BACKOFF_SECONDS", 0)
+    writer = ListWriter(failing_first(TransactionRollbackError("deadlock detected"), 100))
+    writer.connection_errors, writer.retry_errors = PostgresBatchWriter.connection_errors, PostgresBatchWriter.retry_errors
+    checkpoints = FakeCheckpoints()
+    run = migration(writer, tmp_path, checkpoints)
+    run.run()
+    assert run.error_message == "deadlock detected"
+    assert run.round_trips == 1 + runner.WRITE_RETRIES
+    assert run.dead_letters.count == 0
+    assert checkpoints.saved == []
+
+
+def test_a_deadlocked_batch_is_resent_at_the_reduced_size(tmp_path, monkeypatch):
+    monkeypatch.setattr(runner, "RETRY_BACKOFF_SECONDS", 0)
+    sizes = []
+
+    def fail(rows):
+        sizes.append(len(rows))
+        if len(rows) > 1:
+            raise TransactionRollbackError("deadlock detected")
+
+    writer = ListWriter(fail)
+    writer.connection_errors, writer.retry_errors = PostgresBatchWriter.connection_errors, PostgresBatchWriter.retry_errors
+    controller = AdaptiveController("mongodb", min_batch_size=1)
+    checkpoints = FakeCheckpoints()
+    run = migration(writer, tmp_path, checkpoints, controller)
+    run.run()
+    assert not run.error_message
+    assert writer.rows == ROWS
+    assert sizes[:3] == [2, 1, 1]
+    assert controller.transient_errors >= 1
+    assert run.dead_letters.count == 0
+    assert checkpoints.done
+
+
+def test_batches_are_converted_in_transform_processes(tmp_path):
+    writer = ListWriter()
+    writer.prepare = writer.preparer = list
+    run = migration(writer, tmp_path, FakeCheckpoints(), settings={'transform_processes': 2})
+    run.run()
+    assert not run.error_message
+    assert writer.rows == ROWS
@@ -0,0 +1,39 @@
+from functools import partial
+
+from migration.metrics import estimate_bytes, process_memory
+
+# The transform stage, in a module of its own so the transform processes import as little as possible.
+# Set once per transform process by initialize(), so batches are sent without the plan
+_transform = None
+
+
+def map_rows(source_columns, batch):
+    # Rows handed to writers are tuples ordered like target_columns; PostgreSQL rows already are
+    if batch and isinstance(batch[0], dict):
+        return [tuple(map(row.get, source_columns)) for row in batch]
+    if batch and isinstance(batch[0], tuple):
+        return batch
+    return [tuple(row) for row in batch]
+
+
+def transform_batch(source_columns, prepare, item):
+    # Map rows and convert them to the writer's payload off the writer thread
+    last_key, batch = item
+    rows = map_rows(source_columns, batch)
+    size = estimate_bytes(rows)
+    try:
+        payload, error = prepare(rows), None
+    except Exception as e:
+        # The rows go along so the writer can still isolate the ones that fail to convert
+        payload, error = rows, e
+    return last_key, len(rows), size, process_memory(), payload, error
+
+
+def initialize(source_columns, prepare):
+    # ProcessPoolExecutor initializer: receives the writer's preparer (its ConversionPlan) once per process
+    global _transform
+    _transform = partial(transform_batch, source_columns, prepare)
+
+
+def transform(item):
+    return _transform(item)
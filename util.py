@@ -1,4 +1,5 @@
 # Standard library imports
+import asyncio
 import sys
 import os
 import configparser
@@ -7,14 +8,8 @@ import urllib.parse
 import logging
 from datetime import datetime, timedelta
 import time
-
-# Third-party library imports
-import psycopg2
-from neo4j import GraphDatabase
-import neo4j.exceptions
-import pymongo
-import pandas as pd
-import networkx as nx
+from collections import deque, namedtuple
+from functools import partial
 
 # PyQt6 imports
 from PyQt6.QtWidgets import (
@@ -27,10 +22,10 @@ from PyQt6.QtWidgets import (
 )
 from PyQt6.QtWidgets import QDialog, QVBoxLayout, QLabel, QPushButton
 from PyQt6.QtGui import (
-    QAction, QColor, QBrush, QFont, QTextCharFormat, QSyntaxHighlighter
+    QAction, QColor, QBrush, QDesktopServices, QFont, QTextCharFormat, QTextCursor, QSyntaxHighlighter
 )
 from PyQt6.QtCore import (
-    Qt, QRegularExpression, QRect, QSize, QThread, pyqtSignal
+    Qt, QRegularExpression, QRect, QSize, QThread, QObject, QTimer, QUrl, pyqtSignal
 )
 
 from PyQt6.QtGui import QColor, QTextCharFormat, QFont, QSyntaxHighlighter
@@ -38,11 +33,23 @@ from PyQt6.QtCore import QRegularExpression
 from PyQt6.QtGui import QColor, QTextCharFormat, QFont, QSyntaxHighlighter, QPalette
 from PyQt6.QtCore import QRegularExpression, Qt
 
-from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
+from migration import get_backend
+from migration.adaptive import create_controllers
+from migration.databases import Databases
+from migration.runner import Migration
+from migration.replication import apply_changes
+from migration.reporting import Reporter
+from migration.scheduler import MigrationJob, failed_job_item, run_jobs
+
+DEFAULT_LOG_CAPACITY = 20000  # lines kept for the log viewer
+DEFAULT_LOG_PANEL_LINES = 1000  # lines kept by each tab's log panel
+DEFAULT_LOG_REFRESH_MS = 200
 
 
 class DraggableGraph:
     def __init__(self, fig, ax, G, pos, click_callback):
+        import networkx as nx
+
         self.fig = fig
         self.ax = ax
         self.G = G
@@ -149,57 +156,375 @@ class CypherHighlighter(QSyntaxHighlighter):
             
 
 class MigrationWorker(QThread):
+    # progress and logs go through a Reporter, so they arrive at most ten times a second
     progress = pyqtSignal(int, int)
-    log = pyqtSignal(str, str, str)  # category, message, level
+    logs = pyqtSignal(list)  # [(category, message, level), ...]
     finished = pyqtSignal()
 
-    def __init__(self, parent, source_db, target_db, source_table, target_table, source_columns, target_columns):
+    def __init__(self, parent, source_db, target_db, source_table, target_table, source_columns, target_columns, databases=None,
+                 checkpoints=None, resume=False, watermark_column=None, upsert_key=None):
         super().__init__(parent)
         self.parent = parent
+        # Workers outside the GUI thread pass their own Databases; otherwise share the window's connections
+        databases = databases if databases is not None else parent.databases()
+        self.reporter = Reporter(self.progress.emit, self.logs.emit)
+        self.migration = Migration(databases, source_db, target_db, source_table, target_table, source_columns, target_columns,
+                                   checkpoints=checkpoints, resume=resume, watermark_column=watermark_column, upsert_key=upsert_key,
+                                   progress=self.reporter.progress, log=self.reporter.log, status=self.reporter.status)
+
+    def run(self):
+        try:
+            self.migration.run()
+        finally:
+            self.reporter.close()
+            self.finished.emit()
+
+    def result(self):
+        return self.migration.result()
+
+
+class MigrateAllWorker(QThread):
+    progress = pyqtSignal(int, int)
+    logs = pyqtSignal(list)  # [(category, message, level), ...]
+    completed = pyqtSignal(dict)  # report data for MigrationReport
+
+    def __init__(self, parent, config, jobs, max_workers, limits, checkpoints=None, resume=False):
+        super().__init__(parent)
+        self.config = config
+        self.jobs = jobs
+        self.max_workers = max_workers
+        self.limits = limits
+        self.checkpoints = checkpoints
+        self.resume = resume
+        # Shared by every pool thread
+        self.reporter = Reporter(self.progress.emit, self.logs.emit)
+
+    def run(self):
+        start_time = time.time()
+        # Jobs writing to the same adaptive target tune one shared batch size and writer count
+        self.controllers = create_controllers(Databases(self.config), self.jobs, self.limits, self.reporter.log)
+        results = {}
+        for job, item, error in run_jobs(self.jobs, self.migrate_job, self.max_workers, self.limits):
+            if error is not None:
+                self.reporter.log("Migration", f"Error migrating {job.source_item}: {str(error)}", "ERROR")
+                item = failed_job_item(job, error)
+            results[job] = item
+            self.reporter.progress(len(results), len(self.jobs))
+            self.reporter.log("Migration", f"Finished {job.source_item} ({len(results)}/{len(self.jobs)}): {item['result']}", "INFO")
+
+        self.reporter.close()
+        self.completed.emit({
+            'total_items': len(self.jobs),
+            'total_time': time.time() - start_time,
+            'items': [results[job] for job in self.jobs]
+        })
+
+    def migrate_job(self, job):
+        # Runs on a pool thread, so it opens (and closes) its own connections
+        databases = Databases(self.config)
+        try:
+            self.reporter.log("Migration", f"Starting migration for {job.source_item}", "INFO")
+            item_start_time = time.time()
+            columns = [col for col, _ in databases.get_schema(job.source_db, job.source_item)]
+            migration = Migration(databases, job.source_db, job.target_db, job.source_item, job.target_item,
+                                  columns, columns, checkpoints=self.checkpoints, resume=self.resume,
+                                  log=self.reporter.log, status=partial(self.reporter.status, key=job),
+                                  controller=self.controllers.get(job.target_db.lower()))
+            migration.run()
+            return migration.report(time.time() - item_start_time)
+        finally:
+            databases.close()
+
+
+class AsyncMigrationRunner(QObject):
+    """Runs migrations on the asyncio engine from the GUI thread.
+
+    Needs the Qt event loop to be driven by qasync, so coroutines scheduled
+    here run between Qt events. Reports through the same throttled
+    progress/logs signals as the QThread workers: finished after a single
+    migration, completed with the report data after Migrate All.
+    """
+    progress = pyqtSignal(int, int)
+    logs = pyqtSignal(list)  # [(category, message, level), ...]
+    finished = pyqtSignal()
+    completed = pyqtSignal(dict)  # report data for MigrationReport
+
+    def __init__(self, parent, config):
+        super().__init__(parent)
+        self.config = config
+        self.task = None
+
+    def start_migration(self, job, source_columns, target_columns):
+        self.task = asyncio.ensure_future(self.run_migration(job, source_columns, target_columns))
+
+    def start_migrate_all(self, jobs, max_workers, limits):
+        self.task = asyncio.ensure_future(self.run_migrate_all(jobs, max_workers, limits))
+
+    async def run_migration(self, job, source_columns, target_columns):
+        # Imported here so the async drivers are only needed when this engine is used
+        from migration.aio.engine import AsyncDatabases, migrate
+        databases = AsyncDatabases(self.config)
+        reporter = Reporter(self.progress.emit, self.logs.emit)
+        try:
+            await migrate(databases, job, source_columns, target_columns, reporter.progress, reporter.log, reporter.status)
+        finally:
+            await databases.close()
+            reporter.close()
+            self.finished.emit()
+
+    async def run_migrate_all(self, jobs, max_workers, limits):
+        from migration.aio.engine import AsyncDatabases, migrate_all
+        databases = AsyncDatabases(self.config)
+        reporter = Reporter(self.progress.emit, self.logs.emit)
+        try:
+            report = await migrate_all(databases, jobs, max_workers, limits, reporter.progress, reporter.log, reporter.status)
+        except Exception as e:
+            reporter.log("Migration", f"Error during migration: {str(e)}", "ERROR")
+            report = {'total_items': len(jobs), 'total_time': 0, 'items': []}
+        finally:
+            await databases.close()
+        reporter.close()
+        self.completed.emit(report)
+
+
+class ReplicationWorker(QThread):
+    """Keeps a target in sync with a source by applying its change stream.
+
+    Sources are MongoDB change streams and PostgreSQL logical decoding
+    (wal2json); rows are mapped to the target through the columns chosen in
+    the Migrate tab.
+
+    Runs until stop() is called. The stream position is saved only after a
+    micro-batch has been applied, so a restarted job replays at most one
+    batch, which the upserting writers absorb. stop(release=True) also drops
+    what the source keeps for the job (PostgreSQL's replication slot, which
+    otherwise holds WAL until the next start) and forgets its position.
+    """
+    log = pyqtSignal(str, str, str)  # category, message, level
+    applied = pyqtSignal(int, int)  # upserted, deleted in total
+    finished = pyqtSignal()
+
+    def __init__(self, parent, config, source_db, target_db, source_table, target_table, source_columns, target_columns, checkpoints):
+        super().__init__(parent)
+        self.config = config
         self.source_db = source_db
         self.target_db = target_db
         self.source_table = source_table
         self.target_table = target_table
-        self.source_columns = source_columns
-        self.target_columns = target_columns
-        self.total_rows = 0
-        self.migrated_rows = 0
+        self.source_columns = list(source_columns)
+        self.target_columns = list(target_columns)
+        self.checkpoints = checkpoints
+        self.job = MigrationJob(source_db, target_db, source_table, target_table)
+        self.upserted = 0
+        self.deleted = 0
         self.error_message = ""
+        self.release = False
+
+    def stop(self, release=False):
+        self.release = release
+        self.requestInterruption()
 
     def run(self):
+        # Long-running, so it holds its own connections rather than the window's
+        databases = Databases(self.config)
         try:
-            self.log.emit("Migration", f"Fetching data from {self.source_db}.{self.source_table}", "INFO")
-            source_data = self.parent.get_data(self.source_db, self.source_table, self.source_columns)
-            self.total_rows = len(source_data)
-            
-            self.log.emit("Migration", f"Starting migration of {self.total_rows} rows from {self.source_db} to {self.target_db}", "INFO")
+            key = databases.get_change_key(self.source_db, self.source_table)
+            if key not in self.source_columns:
+                self.source_columns.insert(0, key)
+                self.target_columns.insert(0, key)
+            target_key = self.target_columns[self.source_columns.index(key)]
+
+            databases.create_target_table(self.target_db, self.target_table, self.target_columns)
+            databases.create_upsert_index(self.target_db, self.target_table, target_key)
+            writer = databases.create_writer(self.target_db, self.target_table, self.target_columns, upsert_key=target_key)
+
+            position = self.checkpoints.load_position(self.job)
+            if position is None:
+                self.log.emit("Replication", f"Replicating {self.source_db}.{self.source_table} to {self.target_db}.{self.target_table} from now on", "INFO")
+            else:
+                self.log.emit("Replication", f"Resuming replication of {self.source_db}.{self.source_table} from the saved position", "INFO")
+
+            changes = databases.stream_changes(self.source_db, self.source_table, position)
+            try:
+                for batch, position in changes:
+                    if batch:
+                        upserted, deleted = apply_changes(writer, batch, self.source_columns)
+                        self.upserted += upserted
+                        self.deleted += deleted
+                        self.applied.emit(self.upserted, self.deleted)
+                        self.log.emit("Replication", f"Applied {len(batch)} changes: {upserted} upserted, {deleted} deleted", "INFO")
+                    if position is not None:
+                        self.checkpoints.save_position(self.job, position)
+                    if self.isInterruptionRequested():
+                        break
+            finally:
+                changes.close()
+            self.log.emit("Replication", f"Replication of {self.source_db}.{self.source_table} stopped "
+                                         f"({self.upserted} upserted, {self.deleted} deleted)", "INFO")
+            if self.release:
+                databases.drop_change_capture(self.source_db, self.source_table)
+                self.checkpoints.clear_position(self.job)
+                self.log.emit("Replication", f"Released change capture on {self.source_db}.{self.source_table}; "
+                                             f"the next start replicates from then on", "INFO")
+        except Exception as e:
+            self.error_message = str(e)
+            self.log.emit("Replication", f"Error during replication: {self.error_message}", "ERROR")
+        finally:
+            databases.close()
+            self.finished.emit()
 
-            self.log.emit("Migration", f"Creating target {self.target_db}.{self.target_table}", "INFO")
-            self.parent.create_target_table(self.target_db, self.target_table, self.target_columns)
 
-            for i, row in enumerate(source_data):
-                try:
-                    if isinstance(row, dict):
-                        target_row = {target_col: row.get(source_col) for source_col, target_col in zip(self.source_columns, self.target_columns)}
-                    else:
-                        target_row = dict(zip(self.target_columns, row))
-                    
-                    self.parent.insert_row(self.target_db, self.target_table, self.target_columns, target_row)
-                    self.migrated_rows += 1
-                except Exception as e:
-                    self.log.emit("Migration", f"Error migrating row {i+1}: {str(e)}", "ERROR")
+class ConnectWorker(QThread):
+    """Opens one backend's connection and lists its items off the GUI thread.
 
-                self.progress.emit(i + 1, self.total_rows)
-                if (i + 1) % 100 == 0 or i + 1 == self.total_rows:
-                    self.log.emit("Migration", f"Migrated {i + 1}/{self.total_rows} rows", "INFO")
+    Importing a driver and the first round trip can take seconds (Atlas DNS
+    lookups, Neo4j routing), so the window is shown first and every backend
+    connects on its own worker. The connection is handed to the window,
+    which owns it from then on.
+    """
+    connected = pyqtSignal(str, object, list)  # db_type, connection, items
+    failed = pyqtSignal(str, str)  # db_type, error message
 
-            self.log.emit("Migration", f"Migration from {self.source_db} to {self.target_db} completed successfully", "INFO")
+    def __init__(self, parent, config, db_type):
+        super().__init__(parent)
+        self.config = config
+        self.db_type = db_type
+
+    def run(self):
+        db_name = self.db_type.lower()
+        conn = None
+        try:
+            backend = get_backend(db_name)
+            conn = backend.open_connection(self.config[db_name])
+            if db_name == "postgresql":
+                items = backend.list_tables(conn)
+            elif db_name == "mongodb":
+                items = backend.list_collections(conn[self.config['mongodb']['database']])
+            else:  # Neo4j
+                items = backend.list_labels(conn)
         except Exception as e:
-            self.error_message = str(e)
-            self.log.emit("Migration", f"Error during migration: {self.error_message}", "ERROR")
-        finally:
-            self.finished.emit()
+            if conn is not None:
+                conn.close()
+            self.failed.emit(self.db_type, str(e))
+            return
+        self.connected.emit(self.db_type, conn, items)
+
 
+LogRecord = namedtuple('LogRecord', ['seq', 'category', 'level', 'text'])
+
+LOG_LEVELS = ("ERROR", "WARN", "INFO", "DEBUG")
+
+
+class LogModel(QObject):
+    """The window's log: the last ``capacity`` lines in a ring buffer.
+
+    append() only stores the line; the lines added since the last tick go
+    out in one records_added signal per timer tick, so panels redraw a few
+    times a second however fast lines come in. Lives on the GUI thread.
+    """
+    records_added = pyqtSignal(list)  # [LogRecord, ...]
+
+    def __init__(self, parent=None, capacity=DEFAULT_LOG_CAPACITY, interval_ms=DEFAULT_LOG_REFRESH_MS):
+        super().__init__(parent)
+        self.records = deque(maxlen=capacity)
+        self.pending = []
+        self.seq = 0
+        self.categories = set()
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.flush)
+        self.timer.start()
+
+    def append(self, category, level, text):
+        self.seq += 1
+        record = LogRecord(self.seq, category, level, text)
+        self.records.append(record)
+        self.pending.append(record)
+        self.categories.add(category)
+
+    def flush(self):
+        if self.pending:
+            # Lines that already fell out of the ring buffer aren't worth drawing either
+            pending, self.pending = self.pending[-self.records.maxlen:], []
+            self.records_added.emit(pending)
+
+
+
+class LogPanel(QPlainTextEdit):
+    """Read-only view of a LogModel that keeps at most ``max_lines`` lines.
+
+    categories limits the panel to those categories; None shows them all.
+    """
+
+    def __init__(self, model, categories=None, max_lines=DEFAULT_LOG_PANEL_LINES, parent=None):
+        super().__init__(parent)
+        self.categories = categories
+        self.levels = None
+        self.setReadOnly(True)
+        self.setMaximumBlockCount(max_lines)
+        self.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+        model.records_added.connect(self.add_records)
+
+    def accepts(self, record):
+        return (self.categories is None or record.category in self.categories) and (self.levels is None or record.level in self.levels)
+
+    def add_records(self, records):
+        lines = [record.text for record in records if self.accepts(record)]
+        if lines:
+            # One append per batch; the block limit drops the oldest lines
+            self.appendPlainText("\n".join(lines))
+
+    def show_records(self, records):
+        self.setPlainText("\n".join(record.text for record in records if self.accepts(record)))
+        self.moveCursor(QTextCursor.MoveOperation.End)
+
+
+class LogViewerDialog(QDialog):
+    """The whole log kept by a LogModel, filterable by category and level."""
+
+    def __init__(self, model, parent=None):
+        super().__init__(parent)
+        self.model = model
+        self.setWindowTitle("Log")
+        self.setGeometry(200, 200, 1000, 600)
+
+        layout = QVBoxLayout()
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(QLabel("Category:"))
+        self.category_combo = QComboBox()
+        self.category_combo.addItem("All")
+        self.category_combo.addItems(sorted(model.categories))
+        filter_layout.addWidget(self.category_combo)
+        filter_layout.addWidget(QLabel("Level:"))
+        self.level_checkboxes = {}
+        for level in LOG_LEVELS:
+            checkbox = QCheckBox(level)
+            checkbox.setChecked(True)
+            checkbox.toggled.connect(self.apply_filter)
+            self.level_checkboxes[level] = checkbox
+            filter_layout.addWidget(checkbox)
+        filter_layout.addStretch()
+        layout.addLayout(filter_layout)
+
+        self.panel = LogPanel(model, max_lines=model.records.maxlen)
+        self.panel.setFont(QFont("Courier New", 9))
+        layout.addWidget(self.panel)
+        self.setLayout(layout)
+
+        self.category_combo.currentTextChanged.connect(self.apply_filter)
+        model.records_added.connect(self.add_categories)
+        self.apply_filter()
+
+    def add_categories(self, records):
+        known = {self.category_combo.itemText(i) for i in range(self.category_combo.count())}
+        for category in sorted({record.category for record in records} - known):
+            self.category_combo.addItem(category)
+
+    def apply_filter(self):
+        category = self.category_combo.currentText()
+        self.panel.categories = None if category == "All" else {category}
+        self.panel.levels = {level for level, checkbox in self.level_checkboxes.items() if checkbox.isChecked()}
+        self.panel.show_records(self.model.records)
 
 
 class CsvViewerDialog(QDialog):
@@ -369,6 +694,7 @@ class DbConfigEditor(QMainWindow):
         self.save_config()
         try:
             if db_type == 'postgresql':
+                import psycopg2
                 conn = psycopg2.connect(
                     host=self.config['postgresql']['host'],
                     port=self.config['postgresql']['port'],
@@ -383,7 +709,9 @@ class DbConfigEditor(QMainWindow):
                 uri = self.config['neo4j']['url']
                 user = self.config['neo4j']['user']
                 password = self.config['neo4j']['password']
-                
+                from neo4j import GraphDatabase
+                import neo4j.exceptions
+
                 try:
                     driver = GraphDatabase.driver(uri, auth=(user, password))
                     with driver.session() as session:
@@ -411,6 +739,7 @@ class DbConfigEditor(QMainWindow):
                     mongodb_url = f"mongodb://{self.config['mongodb']['host']}:{self.config['mongodb']['port']}/{self.config['mongodb']['database']}"
                 else:
                     mongodb_url = f"mongodb+srv://{self.config['mongodb']['user']}:{urllib.parse.quote_plus(self.config['mongodb']['password'])}@{self.config['mongodb']['host']}/{self.config['mongodb']['database']}?retryWrites=true&w=majority"
+                import pymongo
                 client = pymongo.MongoClient(mongodb_url)
                 client.server_info()
                 client.close()
@@ -443,6 +772,33 @@ if __name__ == '__main__':
     sys.exit(app.exec())
 
 
+def count_text(count):
+    # Jobs that failed before counting their rows report None
+    return "unknown" if count is None else str(count)
+
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def metric_cells(item):
+    # Throughput and stage columns of the report; empty for items that failed before they ran
+    if 'rows_per_second' not in item:
+        return [""] * 7
+    return [
+        f"{item['rows_per_second']:.0f}",
+        f"{format_bytes(item['bytes_per_second'])}/s",
+        f"{item['extract_time']:.2f}s",
+        f"{item['convert_time']:.2f}s",
+        f"{item['load_time']:.2f}s",
+        str(item['round_trips']),
+        format_bytes(item['peak_memory']) if item['peak_memory'] is not None else ""
+    ]
+
+
 class MigrationReport(QDialog):
     def __init__(self, report_data):
         super().__init__()
@@ -451,17 +807,22 @@ class MigrationReport(QDialog):
 
     def init_ui(self):
         self.setWindowTitle("Migration Report")
-        self.setGeometry(100, 100, 800, 600)
+        self.setGeometry(100, 100, 1200, 600)
 
         layout = QVBoxLayout()
 
         # Create table widget
         self.table = QTableWidget()
-        self.table.setColumnCount(7)
+        self.table.setColumnCount(16)
         self.table.setHorizontalHeaderLabels([
-            "Item", "Records", "Result", "Migrated", "Failed", "Time", "Error"
+            "Item", "Records", "Result", "Migrated", "Failed", "Time", "Rows/s", "Throughput",
+            "Extract", "Convert", "Load", "Round Trips", "Peak RSS", "Batch Size", "Writers", "Error"
         ])
+        self.table.horizontalHeaderItem(12).setToolTip(
+            "Highest resident memory of the process and its transform processes while the item ran, sampled per "
+            "batch. Items migrated at the same time share the process, so their peaks overlap.")
         self.populate_table()
+        self.table.cellClicked.connect(self.open_dead_letters)
 
         layout.addWidget(self.table)
 
@@ -476,15 +837,33 @@ class MigrationReport(QDialog):
         self.table.setRowCount(len(self.report_data['items']))
         for i, item in enumerate(self.report_data['items']):
             self.table.setItem(i, 0, QTableWidgetItem(item['name']))
-            self.table.setItem(i, 1, QTableWidgetItem(str(item['records'])))
+            self.table.setItem(i, 1, QTableWidgetItem(count_text(item['records'])))
             self.table.setItem(i, 2, QTableWidgetItem(item['result']))
             self.table.setItem(i, 3, QTableWidgetItem(str(item['migrated'])))
-            self.table.setItem(i, 4, QTableWidgetItem(str(item['failed'])))
+            failed_item = QTableWidgetItem(count_text(item['failed']))
+            if item.get('dead_letters'):
+                # Rendered as a link; clicking it opens the rejected rows
+                font = failed_item.font()
+                font.setUnderline(True)
+                failed_item.setFont(font)
+                failed_item.setForeground(QBrush(QColor("blue")))
+                failed_item.setToolTip(f"Rejected rows: {item['dead_letters']}")
+            self.table.setItem(i, 4, failed_item)
             self.table.setItem(i, 5, QTableWidgetItem(str(timedelta(seconds=item['time']))))
-            self.table.setItem(i, 6, QTableWidgetItem(item['error']))
+            for column, text in enumerate(metric_cells(item), 6):
+                self.table.setItem(i, column, QTableWidgetItem(text))
+            # Chosen by the adaptive controller; empty for fixed batch sizes
+            self.table.setItem(i, 13, QTableWidgetItem(str(item.get('batch_size') or "")))
+            self.table.setItem(i, 14, QTableWidgetItem(str(item.get('concurrency') or "")))
+            self.table.setItem(i, 15, QTableWidgetItem(item['error']))
 
         self.table.resizeColumnsToContents()
 
+    def open_dead_letters(self, row, column):
+        path = self.report_data['items'][row].get('dead_letters')
+        if column == 4 and path:
+            QDesktopServices.openUrl(QUrl.fromLocalFile(path))
+
     def download_report(self):
         file_name, _ = QFileDialog.getSaveFileName(self, "Save Report", "migration_report.csv", "CSV Files (*.csv)")
         if file_name:
@@ -494,10 +873,18 @@ class MigrationReport(QDialog):
                 writer.writerow([f"Total Items: {self.report_data['total_items']}"])
                 writer.writerow([f"Total Time: {timedelta(seconds=self.report_data['total_time'])}"])
                 writer.writerow([])
-                writer.writerow(["Item", "Records", "Result", "Migrated", "Failed", "Time", "Error"])
+                writer.writerow(["Item", "Records", "Result", "Migrated", "Failed", "Time", "Rows/s", "Bytes/s",
+                                 "Extract (s)", "Convert (s)", "Load (s)", "Round Trips", "Peak RSS (bytes)",
+                                 "Batch Size", "Writers", "Error", "Rejected Rows File"])
                 for item in self.report_data['items']:
+                    # Raw numbers here, so the CSV can be sorted and summed
                     writer.writerow([
-                        item['name'], item['records'], item['result'], 
-                        item['migrated'], item['failed'], 
-                        str(timedelta(seconds=item['time'])), item['error']
+                        item['name'], count_text(item['records']), item['result'],
+                        item['migrated'], count_text(item['failed']),
+                        str(timedelta(seconds=item['time'])),
+                        *(round(item[key], 3) if key in item else "" for key in
+                          ('rows_per_second', 'bytes_per_second', 'extract_time', 'convert_time', 'load_time')),
+                        item.get('round_trips', ""), item.get('peak_memory') or "",
+                        item.get('batch_size') or "", item.get('concurrency') or "",
+                        item['error'], item.get('dead_letters', "")
                     ])
\ No newline at end of file